@@ -0,0 +1,190 @@
+"""Local mock shop serving the recorded fixture pages.
+
+Every fixture page in ``fixtures/`` becomes one shop on its own loopback
+address (``127.0.0.2``, ``127.0.0.3``, ...), so the fetch engine and the
+rate limiter see separate domains. ``GET /p/<id>`` returns the shop's page,
+padded to ``page_bytes``, after ``latency_ms`` (+ random ``jitter_ms``).
+A share of requests fails instead: ``error_403`` / ``error_429`` answer with
+that status, ``error_timeout`` holds the connection for ``hang_s`` without
+answering. Outcomes are drawn from ``seed``, the path and how often the path
+was requested, so a rerun sees the same errors in the same places.
+
+Run standalone to poke at it by hand:
+
+    python -m project.bench.mockshop [--latency-ms 20] [--error-429 0.01]
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import multiprocessing
+import random
+import socket
+import threading
+import time
+
+from project.bench.parity import load_fixtures
+
+PAD_CHUNK = "<p class=\"pad\">" + "상품 상세 설명 " * 8 + "</p>\n"
+
+
+class ShopOptions:
+    __slots__ = ("latency_ms", "jitter_ms", "error_403", "error_429", "error_timeout", "hang_s", "page_bytes",
+                 "seed")
+
+    def __init__(self, latency_ms: float = 20.0, jitter_ms: float = 10.0, error_403: float = 0.0,
+                 error_429: float = 0.0, error_timeout: float = 0.0, hang_s: float = 3.0, page_bytes: int = 0,
+                 seed: int = 42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_403 = error_403
+        self.error_429 = error_429
+        self.error_timeout = error_timeout
+        self.hang_s = hang_s
+        self.page_bytes = page_bytes
+        self.seed = seed
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _pad(html: str, page_bytes: int) -> bytes:
+    body = html.encode("utf-8")
+    if len(body) >= page_bytes:
+        return body
+    chunk = PAD_CHUNK.encode("utf-8")
+    filler = chunk * ((page_bytes - len(body)) // len(chunk) + 1)
+    head, sep, tail = body.rpartition(b"</body>")
+    if not sep:
+        return body + filler
+    return head + filler + sep + tail
+
+
+def _handler(page: bytes, options: ShopOptions):
+    hits: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # headers and body go out in separate writes; don't let Nagle hold the body back
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_GET(self):
+            with lock:
+                hit = hits[self.path] = hits.get(self.path, 0) + 1
+            rnd = random.Random(f"{options.seed}:{self.server.server_address[0]}:{self.path}:{hit}")
+            time.sleep((options.latency_ms + rnd.random() * options.jitter_ms) / 1000.0)
+            roll = rnd.random()
+            if roll < options.error_timeout:
+                time.sleep(options.hang_s)
+                self.close_connection = True
+                return
+            roll -= options.error_timeout
+            if roll < options.error_403 + options.error_429:
+                status = 403 if roll < options.error_403 else 429
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients hanging up mid-response (timeouts, partial-body fetches) are expected
+        pass
+
+
+def _serve(options: ShopOptions, ready, stop) -> None:
+    servers = []
+    shops = []
+    for k, (name, (html, rule)) in enumerate(sorted(load_fixtures().items())):
+        host = f"127.0.0.{k + 2}"
+        server = _Server((host, 0), _handler(_pad(html, options.page_bytes), options))
+        threading.Thread(target=server.serve_forever, name=f"mockshop-{name}", daemon=True).start()
+        servers.append(server)
+        shops.append((name, f"http://{host}:{server.server_port}", rule))
+    ready.put(shops)
+    stop.wait()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class MockShop:
+    """Runs the shops in a child process so they don't share the measured CPU and GIL.
+
+    ``shops`` is a list of ``(fixture name, base URL, rule dict)`` once started.
+    """
+
+    def __init__(self, options: Optional[ShopOptions] = None):
+        self.options = options or ShopOptions()
+        self.shops: List[Tuple[str, str, Dict[str, List[str]]]] = []
+        self._process: Optional[multiprocessing.Process] = None
+        self._stop = None
+
+    def start(self) -> "MockShop":
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Queue()
+        self._stop = ctx.Event()
+        self._process = ctx.Process(target=_serve, args=(self.options, ready, self._stop),
+                                    name="mockshop", daemon=True)
+        self._process.start()
+        self.shops = ready.get(timeout=30)
+        return self
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+        self._stop.set()
+        self._process.join(timeout=10)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+    def __enter__(self) -> "MockShop":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the fixture pages as local mock shops")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-403", type=float, default=0.0)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-timeout", type=float, default=0.0)
+    parser.add_argument("--page-bytes", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    options = ShopOptions(args.latency_ms, args.jitter_ms, args.error_403, args.error_429, args.error_timeout,
+                          page_bytes=args.page_bytes, seed=args.seed)
+    with MockShop(options) as shop:
+        for name, base, _rule in shop.shops:
+            print(f"{name:16} {base}/p/1")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Parity check between extraction backends on the saved fixtures.
+
+Every fast backend that is importable must return exactly the values the
+BeautifulSoup fallback returns for each fixture page and its rule in
+``fixtures/rules.json``. Exits non-zero on any mismatch:
+
+    python -m project.bench.parity
+"""
+from typing import Dict, List
+from pathlib import Path
+import json
+import sys
+
+from project.extraction import Extractor, SoupBackend, get_backend
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def load_fixtures() -> Dict[str, tuple]:
+    rules = json.loads((FIXTURES / "rules.json").read_text(encoding="utf-8"))
+    return {name: ((FIXTURES / name).read_text(encoding="utf-8"), rule) for name, rule in rules.items()}
+
+
+def check_parity(backend_names: List[str]) -> List[str]:
+    reference = Extractor(SoupBackend())
+    mismatches = []
+    fixtures = load_fixtures()
+    for backend_name in backend_names:
+        try:
+            extractor = Extractor(get_backend(backend_name))
+        except ImportError:
+            print(f"skip {backend_name}: not installed")
+            continue
+        for name, (html, rule) in fixtures.items():
+            expected = reference.extract(html, rule)
+            got = extractor.extract(html, rule)
+            if got != expected:
+                mismatches.append(f"{backend_name} {name}: expected {expected} got {got}")
+    return mismatches
+
+
+def main() -> None:
+    mismatches = check_parity(sys.argv[1:] or ["lxml", "selectolax"])
+    for line in mismatches:
+        print("MISMATCH", line)
+    if mismatches:
+        sys.exit(1)
+    print("all backends match")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Microbenchmark: RuleIndex lookups vs. the previous substring scan.
+
+Builds 500 domain rules and resolves 10k product URLs against them:
+
+    python -m project.bench.rules_bench [n_rules] [n_urls]
+"""
+from typing import Dict, List
+import random
+import sys
+import time
+
+from project.rules.loader import Rule, RuleIndex
+
+
+def make_rules(n: int, rnd: random.Random) -> List[Rule]:
+    rules = [Rule("DEFAULT", price_css=(".price",))]
+    for i in range(n):
+        tld = rnd.choice(["com", "co.kr", "kr", "net"])
+        rules.append(Rule(f"shop{i}.{tld}", shop=f"shop{i}", price_css=(f".p{i}",)))
+        if i % 10 == 0:
+            rules.append(Rule(f"store.shop{i}.{tld}/brand{i}", shop=f"brand{i}"))
+    return rules
+
+
+def make_urls(rules: List[Rule], n: int, rnd: random.Random) -> List[str]:
+    hosts = [r.pattern.split("/")[0] for r in rules if not r.is_default]
+    urls = []
+    for i in range(n):
+        host = rnd.choice(hosts) if rnd.random() < 0.9 else f"unknown{i % 50}.com"
+        sub = rnd.choice(["", "www.", "m.", "store."])
+        urls.append(f"https://{sub}{host}/brand{rnd.randint(0, 60)}/products/{i}?NaPm=ct%3D{i}")
+    return urls
+
+
+def naive_lookup(patterns: Dict[str, Rule], url: str) -> Rule:
+    # the former RulesStore.get_rule_for_domain scan
+    candidates = [d for d in patterns.keys() if d in url]
+    if candidates:
+        candidates.sort(key=len, reverse=True)
+        return patterns[candidates[0]]
+    return patterns["DEFAULT"]
+
+
+def main() -> None:
+    n_rules = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_urls = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    rnd = random.Random(42)
+    rules = make_rules(n_rules, rnd)
+    urls = make_urls(rules, n_urls, rnd)
+
+    t0 = time.perf_counter()
+    index = RuleIndex(rules)
+    t1 = time.perf_counter()
+    for url in urls:
+        index.match(url)
+    t2 = time.perf_counter()
+    patterns = {r.pattern: r for r in rules}
+    for url in urls:
+        naive_lookup(patterns, url)
+    t3 = time.perf_counter()
+
+    print(f"rules={len(rules)} urls={n_urls}")
+    print(f"index build      {1000 * (t1 - t0):8.2f} ms")
+    print(f"index lookups    {1000 * (t2 - t1):8.2f} ms ({1e6 * (t2 - t1) / n_urls:.2f} us/url)")
+    print(f"substring scan   {1000 * (t3 - t2):8.2f} ms ({1e6 * (t3 - t2) / n_urls:.2f} us/url)")
+
+
+if __name__ == "__main__":
+    main()
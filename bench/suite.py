@@ -0,0 +1,345 @@
+"""Offline benchmark suite: full runs and parser functions against mock shops.
+
+Cases, each run for every catalogue size:
+
+* ``run_once`` - a complete run over an in-memory catalogue whose URLs
+  point at the local mock shops (``bench/mockshop.py``);
+* ``fetch`` - the fetch stage alone (engine, limiter, HTTP backend; no
+  extraction or sheet I/O), to compare ``--env HTTP_BACKEND=async`` with
+  the default ``requests`` backend;
+* ``catalogue`` - loading a synthetic product sheet into the runner's
+  ``Catalogue``; also reports the memory held by the loaded catalogue
+  next to the raw sheet rows and one entry dict per row (``tracemalloc``),
+  e.g. ``--cases catalogue --sizes 10000,100000,1000000``;
+* ``parsers`` - ``extract_price_with_coupon`` / ``parse_shipping`` /
+  ``determine_stock`` over the fixture pages, one soup per product.
+
+Every case runs in a fresh interpreter so peak memory and CPU time belong
+to that case alone (the mock shops run in yet another process). Reported
+per case: wall time, throughput (products/s), p50/p95/p99 latency per
+product, CPU time and peak RSS. Results are written as JSON and compared
+with a stored baseline; a metric that is worse than the baseline by more
+than ``--tolerance`` fails the run (exit status 1):
+
+    python -m project.bench.suite [--sizes 1000,10000,100000] [--cases run_once,parsers]
+        [--latency-ms 20] [--error-429 0.01] [--page-bytes 200000]
+        [--output bench-results.json] [--baseline bench/baseline.json] [--save-baseline]
+
+Runs use a throwaway state directory with the response cache and history
+off and the rate limiter opened up, so they measure the pipeline rather
+than politeness settings; ``--env KEY=VALUE`` overrides any setting.
+"""
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+CASES = ("run_once", "fetch", "catalogue", "parsers")
+# metric -> True when higher is better
+COMPARED = {"throughput": True, "p95_ms": False, "cpu_s": False, "peak_rss_mb": False}
+BENCH_ENV = {
+    "RESPONSE_CACHE_ENABLED": "0",
+    "HISTORY_ENABLED": "0",
+    "RATE_INITIAL_RPS": "1000",
+    "RATE_MAX_RPS": "1000",
+    "PER_DOMAIN_CONCURRENCY": "4",
+    "MAX_CONCURRENCY": "16",
+}
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def _latency_stats(latencies: List[float]) -> Dict[str, float]:
+    from project.metrics import PERCENTILES, percentile
+
+    latencies = sorted(latencies)
+    return {f"p{q}_ms": round(percentile(latencies, q), 3) for q in PERCENTILES}
+
+
+def build_catalogue(shops, size: int, change_every: int = 10):
+    """Product rows (sheet layout from row 1) and settings rows for ``size`` products over ``shops``."""
+    from project.extraction import Extractor, SoupBackend
+    from project.bench.parity import load_fixtures
+    from project.runner import START_ROW
+
+    fixtures = load_fixtures()
+    reference = Extractor(SoupBackend())
+    fields = ("coupon_css", "price_css", "ship_css", "stock_css", "coupon_json", "price_json", "ship_json",
+              "stock_json")
+    settings_rows = [["도메인", "판매처"] + list(fields) + ["timeout", "retry", "backoff_ms"],
+                     ["DEFAULT", ""] + [""] * len(fields) + ["1", "1", "50"]]
+    expected = []
+    for name, base, rule in shops:
+        host = base.split("://", 1)[1].split(":", 1)[0]
+        settings_rows.append([host, name.split(".")[0]] + ["\n".join(rule.get(field, ())) for field in fields] +
+                             ["", "", ""])
+        expected.append(reference.extract(fixtures[name][0], rule)["price_val"])
+    products = [[""] * 11 for _ in range(START_ROW - 1)]
+    for i in range(size):
+        k = i % len(shops)
+        price = expected[k]
+        prev = price if price is None or i % change_every else price + 1000
+        products.append(["", "", "", "", f"B{i:07d}", f"벤치상품{i}", "", "", "" if prev is None else str(prev),
+                         shops[k][0].split(".")[0], f"{shops[k][1]}/p/{i}"])
+    return products, settings_rows
+
+
+def _case_run_once(spec: Dict[str, Any]) -> Dict[str, Any]:
+    from project.bench.mockshop import MockShop, ShopOptions
+    from project.config.settings import settings
+    from project.runner import run_once
+    from project.storage import MemoryStorage
+
+    with MockShop(ShopOptions(**spec["shop"])) as shop:
+        products, settings_rows = build_catalogue(shop.shops, spec["size"])
+        storage = MemoryStorage(products, settings_rows)
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        entry = run_once(storage=storage)
+        wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    summary = json.loads((Path(settings.METRICS_DIR) / f"{entry['batch_id']}.json").read_text(encoding="utf-8"))
+    result = {"products": entry["total"], "success": entry["success"], "fail": entry["fail"],
+              "http_calls": entry["http_calls"], "changes": sum(1 for row in storage.changes if any(row)),
+              "errors": summary["errors"], "stage_ms": summary["stage_ms"]}
+    result.update(summary["latency_ms"])
+    result.update(wall_s=round(wall, 3), cpu_s=round(cpu, 3), throughput=round(entry["total"] / wall, 1))
+    return result
+
+
+def _case_fetch(spec: Dict[str, Any]) -> Dict[str, Any]:
+    from project.bench.mockshop import MockShop, ShopOptions
+    from project.config.settings import settings
+    from project.rules import load_rules_from_rows, select_rule
+    from project.runner import START_ROW, _fetch, _timed
+    from project.scraper.async_http import get_async_backend
+    from project.scraper.engine import FetchEngine, domain_of
+    from project.scraper.ratelimit import AdaptiveRateLimiter
+
+    with MockShop(ShopOptions(**spec["shop"])) as shop:
+        products, settings_rows = build_catalogue(shop.shops, spec["size"])
+        rules, _header = load_rules_from_rows(settings_rows)
+        entries = [{"url": row[10], "rule": select_rule(rules, row[10])} for row in products[START_ROW - 1:]]
+        limiter = AdaptiveRateLimiter()
+        engine = FetchEngine(limiter=limiter)
+        ok = failed = 0
+        cpu0, t0 = time.process_time(), time.perf_counter()
+        for _entry, fetched, error in engine.run(_timed(partial(_fetch, limiter=limiter)), entries,
+                                                 domain_fn=lambda e: domain_of(e["url"]), gap_fn=lambda e: 0):
+            if error is None and fetched is not None:
+                ok += 1
+            else:
+                failed += 1
+        wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    result = {"products": len(entries), "success": ok, "fail": failed, "backend": settings.HTTP_BACKEND}
+    if settings.HTTP_BACKEND == "async":
+        result.update(get_async_backend().stats())
+    result.update(_latency_stats([entry["elapsed_ms"] for entry in entries if "elapsed_ms" in entry]))
+    result.update(wall_s=round(wall, 3), cpu_s=round(cpu, 3), throughput=round(len(entries) / wall, 1))
+    return result
+
+
+def _synthetic_rows(size: int) -> List[List[str]]:
+    """``size`` product rows in sheet layout (all 11 columns, as the sheet API returns them)."""
+    from project.runner import START_ROW
+
+    sellers = ("쿠팡", "11번가", "G마켓", "옥션", "위메프", "티몬", "네이버", "SSG")
+    rows = [[""] * 11 for _ in range(START_ROW - 1)]
+    for i in range(size):
+        k = i % 40
+        rows.append([str(i + 1), "", "", "", f"B{i:07d}", f"벤치상품 {i} 옵션 {i % 7}", "", "",
+                     f"{10000 + (i * 37) % 90000:,}", sellers[k % len(sellers)],
+                     f"https://shop{k}.example.com/goods/view?goodsNo={i}&utm_source=bench"])
+    return rows
+
+
+def _case_catalogue(spec: Dict[str, Any]) -> Dict[str, Any]:
+    import gc
+    import tracemalloc
+
+    from project.pipeline import ListRowSource
+    from project.runner import START_ROW, load_catalogue
+
+    rows = _synthetic_rows(spec["size"])
+    gc.collect()
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    catalogue = load_catalogue(ListRowSource(rows, START_ROW))
+    wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    del catalogue
+    gc.collect()
+
+    def held_mb(build) -> float:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        value = build()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del value
+        gc.collect()
+        return round((after - before) / (1024.0 * 1024.0), 1)
+
+    rows_mb = held_mb(lambda: _synthetic_rows(spec["size"]))
+    catalogue_mb = held_mb(lambda: load_catalogue(ListRowSource(rows, START_ROW)))
+    catalogue = load_catalogue(ListRowSource(rows, START_ROW))
+    entries_mb = held_mb(lambda: [catalogue.entry(pos) for pos in range(len(catalogue))])
+    # time to build one row's entry dict (what each pipeline stage gets)
+    latencies = []
+    for pos in range(0, len(catalogue), max(1, len(catalogue) // 1000)):
+        t1 = time.perf_counter()
+        catalogue.entry(pos)
+        latencies.append((time.perf_counter() - t1) * 1000.0)
+    result = {"products": len(catalogue), "rows_mb": rows_mb, "catalogue_mb": catalogue_mb, "entries_mb": entries_mb}
+    result.update(_latency_stats(latencies))
+    result.update(wall_s=round(wall, 3), cpu_s=round(cpu, 3), throughput=round(len(catalogue) / wall, 1))
+    return result
+
+
+def _case_parsers(spec: Dict[str, Any]) -> Dict[str, Any]:
+    from bs4 import BeautifulSoup
+
+    from project.bench.mockshop import _pad
+    from project.bench.parity import load_fixtures
+    from project.parsers import determine_stock, extract_price_with_coupon, extract_text, parse_shipping
+
+    pages = [(_pad(html, spec["shop"]["page_bytes"]).decode("utf-8"), rule)
+             for _name, (html, rule) in sorted(load_fixtures().items())]
+    latencies = []
+    in_stock = 0
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    for i in range(spec["size"]):
+        html, rule = pages[i % len(pages)]
+        t1 = time.perf_counter()
+        soup = BeautifulSoup(html, "html.parser")
+        price = extract_price_with_coupon(soup, rule["coupon_css"], rule["price_css"])
+        parse_shipping(extract_text(soup, rule["ship_css"]))
+        if determine_stock(price, extract_text(soup, rule["stock_css"])) == "InStock":
+            in_stock += 1
+        latencies.append((time.perf_counter() - t1) * 1000.0)
+    wall, cpu = time.perf_counter() - t0, time.process_time() - cpu0
+    result = {"products": spec["size"], "in_stock": in_stock}
+    result.update(_latency_stats(latencies))
+    result.update(wall_s=round(wall, 3), cpu_s=round(cpu, 3), throughput=round(spec["size"] / wall, 1))
+    return result
+
+
+def run_worker(spec: Dict[str, Any]) -> Dict[str, Any]:
+    result = {"run_once": _case_run_once, "fetch": _case_fetch, "catalogue": _case_catalogue,
+              "parsers": _case_parsers}[spec["case"]](spec)
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def run_case(case: str, size: int, shop: Dict[str, Any], env: Dict[str, str]) -> Dict[str, Any]:
+    """Run one case in a fresh interpreter with its own state directory."""
+    spec = {"case": case, "size": size, "shop": shop}
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        child_env = dict(os.environ, **BENCH_ENV)
+        child_env.update(STATE_DB_PATH=str(Path(tmp) / "state.sqlite3"), METRICS_DIR=str(Path(tmp) / "metrics"),
+                         HISTORY_DIR=str(Path(tmp) / "history"),
+                         RESPONSE_CACHE_PATH=str(Path(tmp) / "responses.sqlite3"),
+                         ARCHIVE_DIR=str(Path(tmp) / "archive"))
+        child_env.update(env)
+        proc = subprocess.run([sys.executable, "-m", __spec__.name, "--worker", json.dumps(spec)],
+                              env=child_env, stdout=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"benchmark case {case}[{size}] failed with exit status {proc.returncode}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float) -> List[str]:
+    """Print current vs. baseline per compared metric; returns the regressions."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:22} no baseline")
+            continue
+        for metric, higher_is_better in COMPARED.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = "REGRESSION" if worse > tolerance else ""
+            print(f"{name:22} {metric:12} {old:12.2f} -> {new:12.2f} {change:+8.1%} {flag}")
+            if flag:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmark suite against local mock shops")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated catalogue sizes")
+    parser.add_argument("--cases", default=",".join(CASES), help="comma-separated cases")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-403", type=float, default=0.0, help="share of requests answered with 403")
+    parser.add_argument("--error-429", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--error-timeout", type=float, default=0.0, help="share of requests left hanging")
+    parser.add_argument("--page-bytes", type=int, default=0, help="pad pages to at least this size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="override a setting")
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return
+
+    from project.bench.mockshop import ShopOptions
+
+    shop = ShopOptions(args.latency_ms, args.jitter_ms, args.error_403, args.error_429, args.error_timeout,
+                       page_bytes=args.page_bytes, seed=args.seed).as_dict()
+    env = dict(item.split("=", 1) for item in args.env)
+    results = {}
+    for case in [c.strip() for c in args.cases.split(",") if c.strip()]:
+        if case not in CASES:
+            parser.error(f"unknown case: {case}")
+        for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            name = f"{case}[{size}]"
+            result = results[name] = run_case(case, size, shop, env)
+            print(f"{name:22} {result['throughput']:10.1f}/s p95={result['p95_ms']:.1f}ms "
+                  f"cpu={result['cpu_s']:.2f}s rss={result['peak_rss_mb']}MB wall={result['wall_s']:.2f}s")
+
+    report = {"created": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+              "platform": platform.platform(), "shop": shop, "env": dict(BENCH_ENV, **env), "results": results}
+    Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"baseline saved to {baseline_path}")
+        return
+    if not baseline_path.exists():
+        print(f"no baseline at {baseline_path}; store one with --save-baseline")
+        return
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    regressions = compare(results, baseline.get("results", {}), args.tolerance)
+    for line in regressions:
+        print("REGRESSION", line)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,20 +8,99 @@ from project.config.settings import settings
 
 def main():
     parser = argparse.ArgumentParser(description="Project CLI")
-    parser.add_argument("command", nargs="?", default="info", choices=["info", "run"])
+    parser.add_argument("command", nargs="?", default="info", choices=["info", "run", "merge", "report", "daemon", "replay"])
+    parser.add_argument("--incremental", action="store_true", help="only re-check products that are due")
+    parser.add_argument("--budget", type=int, default=None, help="max products fetched in an incremental run")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="minutes a run may take; most overdue products first, the rest are deferred")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="discard an interrupted batch instead of resuming it")
+    parser.add_argument("--days", type=float, default=None, help="report: only observations from the last N days")
+    parser.add_argument("--shards", type=int, default=None, help="split the run into N shards by domain")
+    parser.add_argument("--shard-index", type=int, default=None,
+                        help="run only this shard and save its result for `merge` (multi-node mode)")
+    parser.add_argument("--batch-id", "--batch", dest="batch_id", default=None,
+                        help="batch id shared by all shards of a multi-node run; replay: the batch to replay")
+    parser.add_argument("--processes", type=int, default=None, help="replay: worker processes")
+    parser.add_argument("--output", default=None, help="replay: write change rows and differences as JSON")
+    parser.add_argument("--interval", type=float, default=None, help="daemon: minutes between runs")
+    parser.add_argument("--health-port", type=int, default=None, help="daemon: local health/metrics port (0 = off)")
     args = parser.parse_args()
     if args.command == "info":
         print("SPREADSHEET_ID:", settings.SPREADSHEET_ID)
         print("SERVICE_ACCOUNT_FILE:", settings.SERVICE_ACCOUNT_FILE)
+    elif args.command == "run" and args.shards and args.shard_index is not None:
+        from project.jobs.shards import run_shard, save_result
+        from project.runner import new_batch_id
+
+        batch_id = args.batch_id or new_batch_id()
+        result = run_shard(args.shard_index, args.shards, batch_id, incremental=args.incremental, budget=args.budget,
+                           time_budget=args.time_budget)
+        print("Shard result:", save_result(result))
+        print(f"Merge with: python -m project.cli merge --batch-id {batch_id} --shards {args.shards}")
+    elif args.command == "run" and args.shards:
+        from project.jobs.shards import run_sharded
+
+        print(f"Starting {args.shards} shards...")
+        run_sharded(args.shards, incremental=args.incremental, budget=args.budget, time_budget=args.time_budget)
+        print("Run finished.")
     elif args.command == "run":
         try:
             from project.runner import run_once
 
             print("Starting run_once()...")
-            run_once()
-            print("Run finished.")
+            entry = run_once(incremental=args.incremental, budget=args.budget, time_budget=args.time_budget,
+                             resume=not args.no_resume)
+            print("Run finished.", entry["memo"])
         except Exception as e:
             print("Error running project.runner.run_once:", e)
+    elif args.command == "merge":
+        from project.jobs.shards import load_results, write_merged
+        from project.storage import get_storage
+
+        if not (args.batch_id and args.shards):
+            parser.error("merge needs --batch-id and --shards")
+        entry = write_merged(get_storage(), load_results(args.batch_id, args.shards))
+        print("Merged batch", entry["batch_id"], "rows:", entry["total"])
+    elif args.command == "daemon":
+        from project.jobs.scheduler import Daemon
+
+        daemon = Daemon(args.interval, args.health_port, incremental=args.incremental, budget=args.budget)
+        print(f"Daemon running every {daemon.interval_s / 60:g} min"
+              + (f", health on http://127.0.0.1:{daemon.health_port}/health" if daemon.health_port else ""))
+        daemon.run_forever()
+        print("Daemon stopped.")
+    elif args.command == "replay":
+        import json
+        from project.jobs.replay import replay_batch
+
+        if not args.batch_id:
+            from project.history import PageArchive
+
+            archive = PageArchive()
+            for batch_id, pages in archive.batches():
+                print(batch_id, pages)
+            archive.close()
+            parser.error("replay needs --batch (archived batches are listed above)")
+        result = replay_batch(args.batch_id, processes=args.processes)
+        print(f"Replayed {result['pages']} pages in {result['elapsed_s']}s ({result['pages_per_s']}/s): "
+              f"changes {len(result['changes'])}, extraction differs on {len(result['differs'])} rows, "
+              f"failed {result['counts']['fail']}, {len(result['missing'])} batch rows have no archived page")
+        for row in result["differs"][:20]:
+            print(f"  row {row['row']} {row['product_id']}: {row['original']} -> {row['replayed']}"
+                  + (f" ({row['error']})" if row["error"] else ""))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as fh:
+                json.dump(result, fh, ensure_ascii=False, indent=2)
+    elif args.command == "report":
+        import time
+        from project.history import HistoryStore
+        from project.history.analytics import price_stats, to_frame
+
+        since = time.time() - args.days * 86400 if args.days else None
+        store = HistoryStore()
+        print(to_frame(price_stats(store, since=since)).to_string())
+        store.close()
 
 
 if __name__ == "__main__":
@@ -24,6 +24,82 @@ _settings = {
     "DEFAULT_BACKOFF_MS": int(os.getenv("DEFAULT_BACKOFF_MS", "600")),
     "DEFAULT_SPREAD_DIFF": int(os.getenv("DEFAULT_SPREAD_DIFF", "500")),
     "DEFAULT_HEADERS": {"User-Agent": os.getenv("DEFAULT_USER_AGENT", DEFAULT_USER_AGENT)},
+    # Fetch engine: global in-flight cap, per-domain cap and read-ahead window
+    "MAX_CONCURRENCY": int(os.getenv("MAX_CONCURRENCY", "8")),
+    "PER_DOMAIN_CONCURRENCY": int(os.getenv("PER_DOMAIN_CONCURRENCY", "1")),
+    "FETCH_MAX_PENDING": int(os.getenv("FETCH_MAX_PENDING", "1000")),
+    # Shared HTTP session: number of per-host pools kept alive
+    "HTTP_POOL_HOSTS": int(os.getenv("HTTP_POOL_HOSTS", "100")),
+    # Default fetch backend: "requests" (blocking session) or "async" (httpx, HTTP/2); per rule: http_backend
+    "HTTP_BACKEND": os.getenv("HTTP_BACKEND", "requests"),
+    # Conditional-request response cache; CACHE_MAX_AGE_S is overridable per rule (cache_max_age)
+    "RESPONSE_CACHE_ENABLED": os.getenv("RESPONSE_CACHE_ENABLED", "1") not in ("0", "false", "False", ""),
+    "RESPONSE_CACHE_PATH": os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3"),
+    "RESPONSE_CACHE_MAX_MB": int(os.getenv("RESPONSE_CACHE_MAX_MB", "256")),
+    "CACHE_MAX_AGE_S": int(os.getenv("CACHE_MAX_AGE_S", "0")),
+    # Partial-body fetches (rules with max_bytes): read size; the "price found yet?" check runs whenever
+    # the body read has doubled
+    "STREAM_CHUNK_BYTES": int(os.getenv("STREAM_CHUNK_BYTES", "16384")),
+    # Skip unchanged pages by fingerprint (overridable per rule with the fingerprint column)
+    "FINGERPRINT_ENABLED": os.getenv("FINGERPRINT_ENABLED", "0") not in ("0", "false", "False", ""),
+    # HTML extraction backend: auto (selectolax > lxml > soup), selectolax, lxml or soup
+    "EXTRACT_BACKEND": os.getenv("EXTRACT_BACKEND", "auto"),
+    # Incremental runs: per-product state store and re-check interval bounds (minutes)
+    "STATE_DB_PATH": os.getenv("STATE_DB_PATH", ".cache/state.sqlite3"),
+    "INCREMENTAL_MIN_INTERVAL_MIN": int(os.getenv("INCREMENTAL_MIN_INTERVAL_MIN", "60")),
+    "INCREMENTAL_MAX_INTERVAL_MIN": int(os.getenv("INCREMENTAL_MAX_INTERVAL_MIN", "1440")),
+    "RUN_BUDGET": int(os.getenv("RUN_BUDGET", "0")),
+    # Wall-clock budget per run in minutes (0 = none): most overdue products first, the rest deferred
+    "RUN_TIME_BUDGET_MIN": float(os.getenv("RUN_TIME_BUDGET_MIN", "0")),
+    # Checkpoint journal (in STATE_DB_PATH) so an interrupted run resumes its batch; a journaled run's
+    # change-log writer only writes at checkpoints, so these replace the sheet batch size / flush interval
+    "JOURNAL_ENABLED": os.getenv("JOURNAL_ENABLED", "1") not in ("0", "false", "False", ""),
+    "JOURNAL_CHECKPOINT_ROWS": int(os.getenv("JOURNAL_CHECKPOINT_ROWS", "1000")),
+    "JOURNAL_CHECKPOINT_S": float(os.getenv("JOURNAL_CHECKPOINT_S", "30")),
+    # Local observation history (SQLite rows + NumPy column segments)
+    "HISTORY_ENABLED": os.getenv("HISTORY_ENABLED", "1") not in ("0", "false", "False", ""),
+    "HISTORY_DIR": os.getenv("HISTORY_DIR", ".cache/history"),
+    # Page archive for offline replay (`cli.py replay`): zstd packs (zlib when zstandard is missing) + SQLite
+    # index, pack roll-over size, and how many of the newest batches to keep (0 = all; older ones are pruned
+    # after every batch)
+    "ARCHIVE_ENABLED": os.getenv("ARCHIVE_ENABLED", "1") not in ("0", "false", "False", ""),
+    "ARCHIVE_DIR": os.getenv("ARCHIVE_DIR", ".cache/archive"),
+    "ARCHIVE_PACK_MB": int(os.getenv("ARCHIVE_PACK_MB", "256")),
+    "ARCHIVE_KEEP_BATCHES": int(os.getenv("ARCHIVE_KEEP_BATCHES", "168")),
+    "ARCHIVE_ZSTD_LEVEL": int(os.getenv("ARCHIVE_ZSTD_LEVEL", "3")),
+    # Playwright pool for rules flagged render: number of concurrently rendered pages
+    "BROWSER_POOL_SIZE": int(os.getenv("BROWSER_POOL_SIZE", "4")),
+    # Adaptive per-domain rate limiter (token bucket + circuit breaker); learned rates persist in STATE_DB_PATH
+    "RATE_LIMIT_ENABLED": os.getenv("RATE_LIMIT_ENABLED", "1") not in ("0", "false", "False", ""),
+    "RATE_INITIAL_RPS": float(os.getenv("RATE_INITIAL_RPS", "2")),
+    "RATE_MIN_RPS": float(os.getenv("RATE_MIN_RPS", "0.2")),
+    "RATE_MAX_RPS": float(os.getenv("RATE_MAX_RPS", "20")),
+    "RATE_INCREASE_RPS": float(os.getenv("RATE_INCREASE_RPS", "0.25")),
+    "RATE_MAX_RETRY_AFTER_S": float(os.getenv("RATE_MAX_RETRY_AFTER_S", "120")),
+    "RATE_BREAKER_FAILURES": int(os.getenv("RATE_BREAKER_FAILURES", "5")),
+    "RATE_BREAKER_COOLDOWN_S": float(os.getenv("RATE_BREAKER_COOLDOWN_S", "300")),
+    # Storage backend for products/settings/change log/runlog: sheets, local (CSV + SQLite) or memory
+    "STORAGE_BACKEND": os.getenv("STORAGE_BACKEND", "sheets"),
+    "LOCAL_STORAGE_DIR": os.getenv("LOCAL_STORAGE_DIR", "data"),
+    # Run pipeline: items buffered between stages, product rows per ranged sheet read
+    "PIPELINE_QUEUE_SIZE": int(os.getenv("PIPELINE_QUEUE_SIZE", "256")),
+    "PIPELINE_SOURCE_CHUNK_ROWS": int(os.getenv("PIPELINE_SOURCE_CHUNK_ROWS", "1000")),
+    # Shard results of sharded runs (shared between nodes for `cli.py merge`)
+    "SHARD_DIR": os.getenv("SHARD_DIR", ".cache/shards"),
+    # Per-batch JSON metrics files (empty disables them)
+    "METRICS_DIR": os.getenv("METRICS_DIR", ".cache/metrics"),
+    # Buffered sheet writes: rows per values.append, time-based flush, write calls/minute
+    "SHEETS_BATCH_ROWS": int(os.getenv("SHEETS_BATCH_ROWS", "500")),
+    "SHEETS_FLUSH_INTERVAL_S": float(os.getenv("SHEETS_FLUSH_INTERVAL_S", "30")),
+    "SHEETS_WRITE_QUOTA_PER_MIN": int(os.getenv("SHEETS_WRITE_QUOTA_PER_MIN", "50")),
+    # Fetch dedup: rows sharing a canonical URL are fetched once (distinct pages remembered, redirect memo age)
+    "DEDUP_ENABLED": os.getenv("DEDUP_ENABLED", "1") not in ("0", "false", "False", ""),
+    "DEDUP_MEMO_SIZE": int(os.getenv("DEDUP_MEMO_SIZE", "10000")),
+    "REDIRECT_MEMO_TTL_S": float(os.getenv("REDIRECT_MEMO_TTL_S", "604800")),
+    # Daemon mode (`cli.py daemon`): minutes between runs, local health port (0 disables), cross-process run lock
+    "DAEMON_INTERVAL_MIN": float(os.getenv("DAEMON_INTERVAL_MIN", "60")),
+    "DAEMON_HEALTH_PORT": int(os.getenv("DAEMON_HEALTH_PORT", "8765")),
+    "DAEMON_LOCK_PATH": os.getenv("DAEMON_LOCK_PATH", ".cache/run.lock"),
 }
 
 settings = SimpleNamespace(**_settings)
@@ -0,0 +1,305 @@
+"""Pluggable HTML extraction backends.
+
+``run_once`` used to build a full ``BeautifulSoup(html, "html.parser")`` tree
+per page, which dominates CPU on large shop pages. The backends here parse
+the document once with a C parser (selectolax/lexbor or lxml), compile each
+rule's coupon/price/ship/stock selectors once per run and evaluate them all
+against that single parsed document. The original BeautifulSoup path is
+kept as ``SoupBackend`` and used as a fallback whenever a fast backend is
+unavailable or cannot compile one of a rule's selectors.
+
+Rules with JSON paths (``price_json`` etc.) are first read from the page's
+embedded JSON-LD / ``__NEXT_DATA__`` / state blobs (``project.structured``);
+the document is only parsed for the fields those paths did not resolve.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import time
+
+from bs4 import BeautifulSoup
+
+from project import parsers, structured
+from project.config.settings import settings
+
+SELECTOR_FIELDS = ("coupon_css", "price_css", "ship_css", "stock_css")
+JSON_FIELDS = ("coupon_json", "price_json", "ship_json", "stock_json")
+RAW_FIELDS = ("price_val", "ship_text", "stock_text")
+# raw field -> (selector fields, JSON path fields) that can supply it
+_SOURCES = (("price_val", ("coupon_css", "price_css"), ("coupon_json", "price_json")),
+            ("ship_text", ("ship_css",), ("ship_json",)),
+            ("stock_text", ("stock_css",), ("stock_json",)))
+# sources of price_val, highest priority first: JSON paths win over selectors, coupons over list prices
+_PRICE_SOURCES = ("coupon_json", "price_json", "coupon_css", "price_css")
+
+# Text under these tags is not part of BeautifulSoup's get_text()
+_SKIP_TEXT_TAGS = frozenset(("script", "style", "template"))
+
+
+def selector_key(rule: Dict[str, Any]) -> str:
+    """Identifies the selector set an extracted tuple was produced with."""
+    parts = [list(rule.get(k, []) or []) for k in SELECTOR_FIELDS]
+    json_parts = [list(rule.get(k, []) or []) for k in JSON_FIELDS]
+    if any(json_parts):
+        parts += json_parts
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def _values(price_val: Optional[int], ship_text: Optional[str], stock_text: Optional[str]) -> Dict[str, Any]:
+    return {
+        "price_val": price_val,
+        "ship_text": ship_text,
+        "ship_val": parsers.parse_shipping(ship_text),
+        "curr_stock": parsers.determine_stock(price_val, stock_text),
+    }
+
+
+def _record(timings: Optional[Dict[str, float]], t0: float, t1: float) -> None:
+    if timings is not None:
+        timings["parse_ms"] = timings.get("parse_ms", 0.0) + (t1 - t0) * 1000.0
+        timings["extract_ms"] = timings.get("extract_ms", 0.0) + (time.perf_counter() - t1) * 1000.0
+
+
+class UnsupportedSelector(ValueError):
+    pass
+
+
+class SoupBackend:
+    """The original html.parser + soupsieve path."""
+
+    name = "soup"
+
+    def compile(self, rule: Dict[str, Any]) -> Dict[str, List[str]]:
+        return {k: list(rule.get(k, []) or []) for k in SELECTOR_FIELDS}
+
+    def extract_raw(self, html: str, compiled: Dict[str, List[str]],
+                    timings: Optional[Dict[str, float]] = None) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+        t0 = time.perf_counter()
+        soup = BeautifulSoup(html, "html.parser")
+        t1 = time.perf_counter()
+        price_val = parsers.extract_price_with_coupon(soup, compiled["coupon_css"], compiled["price_css"])
+        ship_text = parsers.extract_text(soup, compiled["ship_css"])
+        stock_text = parsers.extract_text(soup, compiled["stock_css"])
+        _record(timings, t0, t1)
+        return price_val, ship_text, stock_text
+
+    def extract(self, html: str, compiled: Dict[str, List[str]],
+                timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        return _values(*self.extract_raw(html, compiled, timings))
+
+
+class _FastBackend:
+    """Shared selection logic; subclasses provide parse/compile/first_text."""
+
+    name = ""
+
+    def compile_selector(self, css: str) -> Any:
+        raise NotImplementedError
+
+    def parse(self, html: str) -> Any:
+        raise NotImplementedError
+
+    def first_text(self, doc: Any, compiled_selector: Any) -> Optional[str]:
+        raise NotImplementedError
+
+    def compile(self, rule: Dict[str, Any]) -> Dict[str, List[Any]]:
+        compiled = {}
+        for field in SELECTOR_FIELDS:
+            compiled[field] = [self.compile_selector(css) for css in (rule.get(field, []) or []) if css]
+        return compiled
+
+    def _text(self, doc: Any, selectors: List[Any]) -> Optional[str]:
+        for sel in selectors:
+            text = self.first_text(doc, sel)
+            if text:
+                return text
+        return None
+
+    def extract_raw(self, html: str, compiled: Dict[str, List[Any]],
+                    timings: Optional[Dict[str, float]] = None) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+        t0 = time.perf_counter()
+        doc = self.parse(html)
+        t1 = time.perf_counter()
+        price_val = None
+        if doc is not None:
+            for sel in compiled["coupon_css"] + compiled["price_css"]:
+                price_val = parsers.parse_price(self.first_text(doc, sel))
+                if price_val is not None:
+                    break
+        ship_text = self._text(doc, compiled["ship_css"]) if doc is not None else None
+        stock_text = self._text(doc, compiled["stock_css"]) if doc is not None else None
+        _record(timings, t0, t1)
+        return price_val, ship_text, stock_text
+
+    def extract(self, html: str, compiled: Dict[str, List[Any]],
+                timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        return _values(*self.extract_raw(html, compiled, timings))
+
+
+class LxmlBackend(_FastBackend):
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml import etree
+        from cssselect import HTMLTranslator
+
+        self._html = lxml.html
+        self._etree = etree
+        self._translator = HTMLTranslator()
+
+    def compile_selector(self, css: str) -> Any:
+        try:
+            return self._etree.XPath(self._translator.css_to_xpath(css))
+        except Exception as exc:
+            raise UnsupportedSelector(css) from exc
+
+    def parse(self, html: str) -> Any:
+        if not html or not html.strip():
+            return None
+        try:
+            return self._html.document_fromstring(html)
+        except (self._etree.ParserError, ValueError):
+            return None
+
+    def first_text(self, doc: Any, xpath: Any) -> Optional[str]:
+        found = xpath(doc)
+        if not found:
+            return None
+        parts: List[str] = []
+        _lxml_strings(found[0], parts)
+        return "".join(parts)
+
+
+def _lxml_strings(node: Any, out: List[str]) -> None:
+    if node.tag in _SKIP_TEXT_TAGS:
+        return
+    if node.text:
+        text = node.text.strip()
+        if text:
+            out.append(text)
+    for child in node:
+        # comments / processing instructions have a non-string tag
+        if isinstance(child.tag, str):
+            _lxml_strings(child, out)
+        if child.tail:
+            tail = child.tail.strip()
+            if tail:
+                out.append(tail)
+
+
+class SelectolaxBackend(_FastBackend):
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self._parser_cls = LexborHTMLParser
+        self._probe = LexborHTMLParser("<html></html>")
+
+    def compile_selector(self, css: str) -> Any:
+        try:
+            self._probe.css_first(css)
+        except Exception as exc:
+            raise UnsupportedSelector(css) from exc
+        return css
+
+    def parse(self, html: str) -> Any:
+        if not html or not html.strip():
+            return None
+        return self._parser_cls(html)
+
+    def first_text(self, doc: Any, css: str) -> Optional[str]:
+        node = doc.css_first(css)
+        if node is None:
+            return None
+        parts = []
+        for child in node.traverse(include_text=True):
+            if child.tag == "-text" and child.parent.tag not in _SKIP_TEXT_TAGS:
+                text = child.text_content.strip()
+                if text:
+                    parts.append(text)
+        return "".join(parts)
+
+
+_BACKENDS = {"soup": SoupBackend, "lxml": LxmlBackend, "selectolax": SelectolaxBackend}
+
+
+def get_backend(name: Optional[str] = None):
+    """Instantiate an extraction backend; ``auto`` picks the fastest available."""
+    name = (name or settings.EXTRACT_BACKEND or "auto").lower()
+    if name == "auto":
+        for candidate in ("selectolax", "lxml"):
+            try:
+                return _BACKENDS[candidate]()
+            except ImportError:
+                continue
+        return SoupBackend()
+    if name not in _BACKENDS:
+        raise ValueError(f"unknown extraction backend: {name}")
+    return _BACKENDS[name]()
+
+
+class Extractor:
+    """Per-run extractor that compiles each rule's selectors once.
+
+    Rules whose selectors the fast backend cannot compile are served by
+    ``SoupBackend`` so behaviour never regresses.
+    """
+
+    def __init__(self, backend: Any = None):
+        self.backend = backend if backend is not None else get_backend()
+        self.fallback = self.backend if isinstance(self.backend, SoupBackend) else SoupBackend()
+        self._compiled: Dict[str, Tuple[Any, Any]] = {}
+
+    def _compiled_for(self, rule: Dict[str, Any]) -> Tuple[Any, Any]:
+        key = selector_key(rule)
+        hit = self._compiled.get(key)
+        if hit is None:
+            try:
+                hit = (self.backend, self.backend.compile(rule))
+            except UnsupportedSelector:
+                hit = (self.fallback, self.fallback.compile(rule))
+            self._compiled[key] = hit
+        return hit
+
+    def extract_raw(self, html: str, rule: Dict[str, Any],
+                    timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """``price_val`` / ``ship_text`` / ``stock_text`` before shipping and stock are interpreted.
+
+        Fields found through the rule's JSON paths win; CSS selectors are
+        only evaluated (and the document only parsed) for the rest.
+        """
+        backend, compiled = self._compiled_for(rule)
+        paths = {field: rule.get(field) for field in JSON_FIELDS if rule.get(field)}
+        found: Dict[str, Any] = {}
+        if paths:
+            t0 = time.perf_counter()
+            found = structured.extract(html, paths)
+            if timings is not None:
+                timings["parse_ms"] = timings.get("parse_ms", 0.0) + (time.perf_counter() - t0) * 1000.0
+        if any(name not in found and any(compiled[f] for f in css) for name, css, _json in _SOURCES):
+            found = dict(zip(RAW_FIELDS, backend.extract_raw(html, compiled, timings)), **found)
+        return {name: found.get(name) for name in RAW_FIELDS}
+
+    def extract(self, html: str, rule: Dict[str, Any],
+                timings: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """Extract price/ship/stock; ``timings`` receives ``parse_ms``/``extract_ms``."""
+        raw = self.extract_raw(html, rule, timings)
+        return _values(raw["price_val"], raw["ship_text"], raw["stock_text"])
+
+    def located(self, html: str, rule: Dict[str, Any]) -> bool:
+        """True once the price in ``html`` (a partial body) is final: the rule's first price source matched.
+
+        A lower-priority match is not enough - the list price often comes
+        before the coupon price. Only the price is waited for; shipping and
+        stock come from what has been read by then.
+        """
+        for field in _PRICE_SOURCES:
+            first = next((source for source in rule.get(field) or () if source), None)
+            if first is None:
+                continue
+            if field in JSON_FIELDS:
+                return structured.extract(html, {field: [first]}).get("price_val") is not None
+            backend, compiled = self._compiled_for({field: [first]})
+            return backend.extract_raw(html, compiled)[0] is not None
+        return False
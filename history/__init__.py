@@ -0,0 +1,6 @@
+# history package
+# Local price observation store and analytics.
+from .store import HistoryStore
+from .archive import PageArchive
+
+__all__ = ["HistoryStore", "PageArchive"]
@@ -0,0 +1,129 @@
+"""Vectorized price analytics over the local observation history.
+
+All statistics are computed with NumPy over the column segments written by
+``HistoryStore`` (no Sheets reads, no per-row Python loops). Prices are the
+delivered totals (price + shipping) that the change sheet compares.
+
+``price_stats`` returns a dict of equal-length columns, one row per
+product; ``to_frame`` wraps it in a pandas DataFrame when pandas is
+installed.
+"""
+from typing import Dict, Optional, Sequence
+
+from project.history.store import HistoryStore, MISSING, STATUS_CODES
+
+
+def _np():
+    try:
+        import numpy as np
+    except Exception:
+        raise RuntimeError("numpy is not installed; pip install numpy")
+    return np
+
+
+def load_observations(store: HistoryStore, since: Optional[float] = None) -> Dict[str, "object"]:
+    """Concatenate all column segments (optionally only ``ts >= since``)."""
+    np = _np()
+    parts = []
+    for path in store.segment_paths():
+        # copy the columns out so no zip handle stays open per segment
+        with np.load(path) as segment:
+            parts.append({name: segment[name] for name in segment.files})
+    if not parts:
+        return {
+            "pid": np.empty(0, np.int64), "ts": np.empty(0, np.float64), "price": np.empty(0, np.int64),
+            "ship": np.empty(0, np.int64), "stock": np.empty(0, np.int8), "status": np.empty(0, np.int8),
+            "latency_ms": np.empty(0, np.float32),
+        }
+    cols = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+    if since is not None:
+        keep = cols["ts"] >= since
+        cols = {name: col[keep] for name, col in cols.items()}
+    return cols
+
+
+def price_stats(store: HistoryStore, since: Optional[float] = None,
+                percentiles: Sequence[float] = (10, 50, 90)) -> Dict[str, "object"]:
+    """Per-product count/min/mean/percentiles/volatility/lowest-ever/last price.
+
+    ``volatility`` is the standard deviation of log price changes between
+    consecutive observations; ``lowest_ts`` is the first time the lowest
+    price was seen.
+    """
+    np = _np()
+    cols = load_observations(store, since)
+    ok = (cols["status"] == STATUS_CODES["ok"]) & (cols["price"] != MISSING)
+    pid = cols["pid"][ok]
+    ts = cols["ts"][ok]
+    total = cols["price"][ok] + np.where(cols["ship"][ok] == MISSING, 0, cols["ship"][ok])
+    if ts.size and np.any(ts[1:] < ts[:-1]):
+        chrono = np.argsort(ts, kind="stable")
+        pid, ts, total = pid[chrono], ts[chrono], total[chrono]
+
+    # input is chronological, so stable sorts keep time order within each key
+    order = np.argsort(pid, kind="stable")
+    pid_t, val_t = pid[order], total[order].astype(np.float64)
+    # pid_t is sorted: group boundaries without np.unique's extra sort
+    boundary = np.ones(pid_t.size, dtype=bool)
+    boundary[1:] = pid_t[1:] != pid_t[:-1]
+    start = np.flatnonzero(boundary)
+    products = pid_t[start]
+    counts = np.diff(np.append(start, pid_t.size))
+    if products.size == 0:
+        empty = np.empty(0)
+        out = {"pid": products, "product_id": np.empty(0, dtype=object), "count": counts,
+               "min": empty, "mean": empty, "volatility": empty, "lowest_ever": empty,
+               "lowest_ts": empty, "last": empty}
+        for q in percentiles:
+            out[f"p{q:g}"] = empty
+        return out
+    last_idx = start + counts - 1
+
+    # value order within product (earliest first among equal prices):
+    # min, lowest timestamp and percentiles
+    vorder = np.argsort((pid << 32) | total, kind="stable")
+    val_v, ts_v = total[vorder].astype(np.float64), ts[vorder]
+
+    out = {
+        "pid": products,
+        "count": counts,
+        "min": val_v[start],
+        "mean": np.add.reduceat(val_t, start) / counts,
+        "lowest_ever": val_v[start],
+        "lowest_ts": ts_v[start],
+        "last": val_t[last_idx],
+    }
+    for q in percentiles:
+        pos = start + (q / 100.0) * (counts - 1)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.ceil(pos).astype(np.int64)
+        frac = pos - lo
+        out[f"p{q:g}"] = val_v[lo] + (val_v[hi] - val_v[lo]) * frac
+
+    # log returns between consecutive observations of the same product
+    group = np.repeat(np.arange(products.size), counts)
+    same = group[1:] == group[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(np.maximum(val_t, 1.0)))
+    g = group[1:][same]
+    r = returns[same]
+    n = np.bincount(g, minlength=products.size).astype(np.float64)
+    s1 = np.bincount(g, weights=r, minlength=products.size)
+    s2 = np.bincount(g, weights=r * r, minlength=products.size)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_r = s1 / n
+        out["volatility"] = np.where(n > 0, np.sqrt(np.maximum(s2 / n - mean_r * mean_r, 0.0)), 0.0)
+
+    names = store.product_names()
+    out["product_id"] = np.array([names.get(int(p), "") for p in products], dtype=object)
+    return out
+
+
+def to_frame(stats: Dict[str, "object"]):
+    """Wrap ``price_stats`` output in a pandas DataFrame indexed by product id."""
+    try:
+        import pandas as pd
+    except Exception:
+        raise RuntimeError("pandas is not installed; pip install pandas")
+    frame = pd.DataFrame(stats)
+    return frame.set_index("product_id")
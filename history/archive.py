@@ -0,0 +1,287 @@
+"""Content-addressed archive of fetched pages for offline replay.
+
+Every page a run downloads (or renders) is stored once per distinct body:
+the body is hashed (BLAKE2b-128 of its UTF-8 bytes), compressed with zstd
+(zlib when ``zstandard`` is not installed; the codec is kept per blob) and
+appended to a pack file. ``index.sqlite3`` maps hashes to
+``(pack, offset, length)`` and records, per batch, which product row saw
+which page together with the sheet values and the extracted values of
+that run - everything ``jobs.replay`` needs to re-run extraction and
+diffing without the network. Rows of a batch without a page (no URL, or
+the fetch failed) are recorded in ``missing`` with the reason, so a replay
+can say how much of the batch it covers.
+
+Each writing process appends to its own pack (``packs/<time>-<pid>.pack``),
+rolled over at ``ARCHIVE_PACK_MB``, so parallel shards never interleave
+writes. Readers memory-map the packs, so replaying a batch costs one map
+per pack rather than one open per page.
+
+``prune()`` keeps the newest ``ARCHIVE_KEEP_BATCHES`` batches: older
+batches' rows go, then the blobs no remaining page uses. Packs left empty
+are deleted and packs that are mostly dead are compacted (their live blobs
+are copied to the current pack), so a page that never changes does not pin
+an old pack forever. Packs written in the last ``PRUNE_MIN_PACK_AGE_S``
+are left alone, as another process may still be writing them.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import itertools
+import json
+import mmap
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from project.config.settings import settings
+
+# packs younger than this may belong to a process still writing (and indexing) them
+PRUNE_MIN_PACK_AGE_S = 3600.0
+
+# pack names are unique per process, even for archives opened within the same second
+_pack_serial = itertools.count()
+
+PAGE_FIELDS = ("batch_id", "row", "product_id", "product_name", "prev_price", "prev_seller", "url", "hash",
+               "extracted", "fetched_at")
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def page_hash(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class PageArchive:
+    def __init__(self, root: Optional[str] = None, pack_bytes: Optional[int] = None):
+        self.root = Path(root or settings.ARCHIVE_DIR)
+        self.packs_dir = self.root / "packs"
+        self.packs_dir.mkdir(parents=True, exist_ok=True)
+        self.pack_bytes = pack_bytes if pack_bytes is not None else settings.ARCHIVE_PACK_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "index.sqlite3"), check_same_thread=False, timeout=30)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " hash TEXT PRIMARY KEY, pack TEXT NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL,"
+            " codec TEXT NOT NULL, size INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " batch_id TEXT NOT NULL, row INTEGER, product_id TEXT, product_name TEXT, prev_price TEXT,"
+            " prev_seller TEXT, url TEXT, hash TEXT NOT NULL, extracted TEXT, fetched_at REAL);"
+            "CREATE INDEX IF NOT EXISTS pages_batch ON pages (batch_id, row);"
+            "CREATE INDEX IF NOT EXISTS pages_product ON pages (product_id);"
+            "CREATE TABLE IF NOT EXISTS missing ("
+            " batch_id TEXT NOT NULL, row INTEGER, product_id TEXT, url TEXT, reason TEXT);"
+            "CREATE INDEX IF NOT EXISTS missing_batch ON missing (batch_id, row);"
+        )
+        self._fh = None
+        self._pack: Optional[str] = None
+        self._known: set = set()
+        self._blobs: List[Tuple[Any, ...]] = []
+        self._pages: List[Tuple[Any, ...]] = []
+        self._missing: List[Tuple[Any, ...]] = []
+        self._maps: Dict[str, mmap.mmap] = {}
+        self.stored = 0
+        self.deduped = 0
+
+    # -- writing
+
+    def _compress(self, body: bytes) -> Tuple[bytes, str]:
+        zstd = _zstd()
+        if zstd is not None:
+            return zstd.ZstdCompressor(level=settings.ARCHIVE_ZSTD_LEVEL).compress(body), "zstd"
+        return zlib.compress(body, 6), "zlib"
+
+    def _has(self, digest: str) -> bool:
+        if digest in self._known:
+            return True
+        row = self._db.execute("SELECT 1 FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is not None:
+            self._known.add(digest)
+        return row is not None
+
+    def _pack_handle(self):
+        if self._fh is None or self._fh.tell() >= self.pack_bytes:
+            if self._fh is not None:
+                self._fh.close()
+            self._pack = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_pack_serial)}.pack"
+            self._fh = open(self.packs_dir / self._pack, "ab")
+            self._fh.seek(0, os.SEEK_END)
+        return self._fh
+
+    def put_body(self, html: str) -> str:
+        """Store ``html`` unless an identical page is archived already; returns its hash."""
+        body = html.encode("utf-8")
+        digest = page_hash(body)
+        with self._lock:
+            if self._has(digest):
+                self.deduped += 1
+                return digest
+            data, codec = self._compress(body)
+            fh = self._pack_handle()
+            offset = fh.tell()
+            fh.write(data)
+            self._blobs.append((digest, self._pack, offset, len(data), codec, len(body)))
+            self._known.add(digest)
+            self.stored += 1
+        return digest
+
+    def add_page(self, batch_id: str, entry: Dict[str, Any], digest: str,
+                 extracted: Optional[Dict[str, Any]]) -> None:
+        """Record that ``entry`` (a runner product entry) saw page ``digest`` in ``batch_id``."""
+        with self._lock:
+            self._pages.append((
+                batch_id, entry.get("row"), entry["product_id"], entry["product_name"], entry["prev_price_str"],
+                entry["prev_seller"], entry["url"], digest,
+                json.dumps(extracted, ensure_ascii=False) if extracted is not None else None, time.time(),
+            ))
+
+    def add_missing(self, batch_id: str, entry: Dict[str, Any], reason: str) -> None:
+        """Record that ``entry`` was checked in ``batch_id`` without a page to archive."""
+        with self._lock:
+            self._missing.append((batch_id, entry.get("row"), entry["product_id"], entry["url"], reason))
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                # bodies reach the disk before the index points at them
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+            blobs, self._blobs = self._blobs, []
+            pages, self._pages = self._pages, []
+            missing, self._missing = self._missing, []
+            if blobs:
+                self._db.executemany("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+            if pages:
+                self._db.executemany(f"INSERT INTO pages ({', '.join(PAGE_FIELDS)}) VALUES "
+                                     f"({', '.join('?' for _ in PAGE_FIELDS)})", pages)
+            if missing:
+                self._db.executemany("INSERT INTO missing VALUES (?, ?, ?, ?, ?)", missing)
+            self._db.commit()
+
+    def prune(self, keep_batches: Optional[int] = None) -> Dict[str, int]:
+        """Keep the newest ``keep_batches`` batches (``ARCHIVE_KEEP_BATCHES``; 0 keeps all), drop the rest."""
+        keep_batches = settings.ARCHIVE_KEEP_BATCHES if keep_batches is None else keep_batches
+        removed = {"batches": 0, "blobs": 0, "packs": 0}
+        if keep_batches <= 0:
+            return removed
+        self.flush()
+        cutoff = time.time() - PRUNE_MIN_PACK_AGE_S
+        with self._lock:
+            batches = [b for (b,) in self._db.execute(
+                "SELECT batch_id FROM pages GROUP BY batch_id ORDER BY MAX(fetched_at) DESC")]
+            dropped = [(b,) for b in batches[keep_batches:]]
+            self._db.executemany("DELETE FROM pages WHERE batch_id = ?", dropped)
+            self._db.executemany("DELETE FROM missing WHERE batch_id = ?", dropped)
+            removed["batches"] = len(dropped)
+            packs = [p.name for p in self.packs_dir.glob("*.pack")
+                     if p.name != self._pack and p.stat().st_mtime < cutoff]
+            for pack in packs:
+                dead = [h for (h,) in self._db.execute(
+                    "SELECT hash FROM blobs WHERE pack = ? AND hash NOT IN (SELECT hash FROM pages)", (pack,))]
+                self._db.executemany("DELETE FROM blobs WHERE hash = ?", [(h,) for h in dead])
+                self._known.difference_update(dead)
+                removed["blobs"] += len(dead)
+            self._db.commit()
+            for pack in packs:
+                live = self._db.execute("SELECT hash, offset, length FROM blobs WHERE pack = ?", (pack,)).fetchall()
+                path = self.packs_dir / pack
+                if live and sum(length for _h, _o, length in live) * 2 >= path.stat().st_size:
+                    continue
+                if live:
+                    self._move_blobs(pack, live)
+                mapped = self._maps.pop(pack, None)
+                if mapped is not None:
+                    mapped.close()
+                path.unlink()
+                removed["packs"] += 1
+        return removed
+
+    def _move_blobs(self, pack: str, live: List[Tuple[str, int, int]]) -> None:
+        # copy the live blobs of a mostly dead pack to the current one, then point the index at the copies
+        moved = []
+        with open(self.packs_dir / pack, "rb") as src:
+            for digest, offset, length in live:
+                src.seek(offset)
+                data = src.read(length)
+                fh = self._pack_handle()
+                moved.append((self._pack, fh.tell(), digest))
+                fh.write(data)
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._db.executemany("UPDATE blobs SET pack = ?, offset = ? WHERE hash = ?", moved)
+        self._db.commit()
+
+    # -- reading
+
+    def _map(self, pack: str, end: int) -> mmap.mmap:
+        mapped = self._maps.get(pack)
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self.packs_dir / pack, "rb") as fh:
+                mapped = self._maps[pack] = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return mapped
+
+    def get_body(self, digest: str) -> str:
+        row = self._db.execute("SELECT pack, offset, length, codec FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(digest)
+        pack, offset, length, codec = row
+        with self._lock:
+            data = self._map(pack, offset + length)[offset:offset + length]
+        if codec == "zstd":
+            zstd = _zstd()
+            if zstd is None:
+                raise RuntimeError("zstandard is not installed; pip install zstandard")
+            body = zstd.ZstdDecompressor().decompress(data)
+        else:
+            body = zlib.decompress(data)
+        return body.decode("utf-8")
+
+    def pages(self, batch_id: str) -> Iterator[Dict[str, Any]]:
+        """Archived pages of a batch in sheet-row order (one dict per product row).
+
+        A resumed batch may have checked a row twice; the later page wins.
+        """
+        cursor = self._db.execute(
+            f"SELECT {', '.join(PAGE_FIELDS)} FROM pages WHERE batch_id = ? ORDER BY row, fetched_at", (batch_id,)
+        )
+        page = None
+        for values in cursor:
+            if page is not None and page["row"] != values[1]:
+                yield page
+            page = dict(zip(PAGE_FIELDS, values))
+            page["extracted"] = json.loads(page["extracted"]) if page["extracted"] else None
+        if page is not None:
+            yield page
+
+    def missing(self, batch_id: str) -> List[Dict[str, Any]]:
+        """Rows of a batch that have no archived page, with the reason, in sheet-row order."""
+        cursor = self._db.execute(
+            "SELECT DISTINCT row, product_id, url, reason FROM missing WHERE batch_id = ?"
+            " AND row NOT IN (SELECT row FROM pages WHERE batch_id = ?) ORDER BY row", (batch_id, batch_id)
+        )
+        return [dict(zip(("row", "product_id", "url", "reason"), values)) for values in cursor]
+
+    def batches(self) -> List[Tuple[str, int]]:
+        return self._db.execute(
+            "SELECT batch_id, COUNT(*) FROM pages GROUP BY batch_id ORDER BY batch_id"
+        ).fetchall()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps = {}
+            self._db.close()
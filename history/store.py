@@ -0,0 +1,174 @@
+"""Local price observation history.
+
+Every product check of a run is buffered and written in bulk at the end of
+the run to two places:
+
+* ``history.sqlite3`` - the durable row store, indexed on product and on
+  time, for per-product / time-window lookups;
+* ``segments/<batch_id>.npz`` - the same observations as compact NumPy
+  columns, one file per run, which the analytics module loads in
+  milliseconds instead of pulling millions of rows through sqlite3.
+
+A run may flush more than once (journaled runs flush at every checkpoint,
+and a resumed batch keeps flushing into the same batch id). Each flush
+writes only its own rows, as a part file ``<batch_id>.partNNNN.npz``;
+``compact()`` merges the parts into the batch's segment once the batch is
+done, so a long batch is not rewritten at every checkpoint.
+
+Segments are skipped when NumPy is not installed and can be rebuilt from
+SQLite later with ``rebuild_segments()``.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import glob
+import sqlite3
+import threading
+
+from project.config.settings import settings
+
+STOCK_CODES = {"OutOfStock": 0, "InStock": 1}
+STATUS_CODES = {"ok": 0, "error": 1, "no_url": 2}
+# integer columns use -1 for "missing"
+MISSING = -1
+
+_SEGMENT_COLUMNS = ("pid", "ts", "price", "ship", "stock", "status", "latency_ms")
+
+
+class HistoryStore:
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.HISTORY_DIR)
+        self.segments_dir = self.root / "segments"
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # shared by parallel shard processes: WAL, and wait for a writer instead of failing
+        self._db = sqlite3.connect(str(self.root / "history.sqlite3"), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS products ("
+            " pid INTEGER PRIMARY KEY, product_id TEXT UNIQUE NOT NULL, url TEXT);"
+            "CREATE TABLE IF NOT EXISTS observations ("
+            " pid INTEGER NOT NULL, ts REAL NOT NULL, price INTEGER, ship INTEGER, stock INTEGER,"
+            " status INTEGER, latency_ms REAL, batch_id TEXT);"
+            "CREATE INDEX IF NOT EXISTS observations_pid_ts ON observations (pid, ts);"
+            "CREATE INDEX IF NOT EXISTS observations_ts ON observations (ts);"
+            "CREATE INDEX IF NOT EXISTS observations_batch ON observations (batch_id);"
+        )
+        self._pids: Dict[str, int] = dict(self._db.execute("SELECT product_id, pid FROM products"))
+        self._pending: List[Tuple[Any, ...]] = []
+
+    def add(self, product_id: str, url: str, ts: float, price: Optional[int], ship: Optional[int],
+            stock: Optional[str], status: str, latency_ms: Optional[float]) -> None:
+        """Buffer one observation; nothing (not even a new product) is written until ``flush()``."""
+        key = product_id or url
+        if not key:
+            return
+        with self._lock:
+            self._pending.append((
+                key, url, ts,
+                price if price is not None else MISSING,
+                ship if ship is not None else MISSING,
+                STOCK_CODES.get(stock or "", MISSING),
+                STATUS_CODES.get(status, MISSING),
+                latency_ms if latency_ms is not None else float("nan"),
+            ))
+
+    def flush(self, batch_id: str) -> int:
+        """Write buffered observations in one transaction and as a new part of the batch's column segment."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return 0
+            # products first seen since the last flush get their pid here, in the same (single) write
+            # transaction; another process (e.g. a parallel shard) may have added them since we loaded
+            new = {key: url for key, url, *_ in pending if key not in self._pids}
+            if new:
+                self._db.executemany("INSERT OR IGNORE INTO products (product_id, url) VALUES (?, ?)", new.items())
+                for key in new:
+                    (self._pids[key],) = self._db.execute("SELECT pid FROM products WHERE product_id = ?",
+                                                          (key,)).fetchone()
+            rows = [(self._pids[row[0]],) + row[2:] for row in pending]
+            self._db.executemany(
+                "INSERT INTO observations (pid, ts, price, ship, stock, status, latency_ms, batch_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [row + (batch_id,) for row in rows],
+            )
+            self._db.commit()
+        self._write_segment(f"{batch_id}.part{len(self._parts(batch_id)):04d}", rows)
+        return len(rows)
+
+    def _parts(self, batch_id: str) -> List[Path]:
+        return sorted(self.segments_dir.glob(f"{glob.escape(batch_id)}.part[0-9][0-9][0-9][0-9].npz"))
+
+    def compact(self, batch_id: str) -> None:
+        """Merge the batch's part files (and its segment, if any) into ``<batch_id>.npz``."""
+        try:
+            import numpy as np
+        except ImportError:
+            return
+        parts = self._parts(batch_id)
+        if not parts:
+            return
+        path = self.segments_dir / f"{batch_id}.npz"
+        chunks = []
+        for source in ([path] if path.exists() else []) + parts:
+            with np.load(source) as segment:
+                chunks.append({key: segment[key] for key in _SEGMENT_COLUMNS})
+        self._save_segment(path, {key: np.concatenate([chunk[key] for chunk in chunks]) for key in _SEGMENT_COLUMNS})
+        for part in parts:
+            part.unlink()
+
+    def _write_segment(self, name: str, rows: List[Tuple[Any, ...]]) -> None:
+        try:
+            import numpy as np
+        except ImportError:
+            return
+        cols = list(zip(*rows))
+        self._save_segment(self.segments_dir / f"{name}.npz", {
+            "pid": np.asarray(cols[0], dtype=np.int64),
+            "ts": np.asarray(cols[1], dtype=np.float64),
+            "price": np.asarray(cols[2], dtype=np.int64),
+            "ship": np.asarray(cols[3], dtype=np.int64),
+            "stock": np.asarray(cols[4], dtype=np.int8),
+            "status": np.asarray(cols[5], dtype=np.int8),
+            "latency_ms": np.asarray(cols[6], dtype=np.float32),
+        })
+
+    def _save_segment(self, path: Path, arrays: Dict[str, Any]) -> None:
+        import numpy as np
+
+        tmp = path.with_name(path.name[:-len(".npz")] + ".tmp.npz")
+        np.savez(tmp, **arrays)
+        tmp.replace(path)
+
+    def segment_paths(self) -> List[Path]:
+        return sorted(p for p in self.segments_dir.glob("*.npz") if not p.name.endswith(".tmp.npz"))
+
+    def rebuild_segments(self) -> None:
+        """Regenerate the column segments (one per batch) from the SQLite rows."""
+        for path in self.segment_paths():
+            path.unlink()
+        batches = [b for (b,) in self._db.execute("SELECT DISTINCT batch_id FROM observations")]
+        for batch_id in batches:
+            rows = self._db.execute(
+                "SELECT pid, ts, price, ship, stock, status, COALESCE(latency_ms, 'NaN') FROM observations"
+                " WHERE batch_id = ?", (batch_id,),
+            ).fetchall()
+            self._write_segment(batch_id, rows)
+
+    def product_names(self) -> Dict[int, str]:
+        return {pid: product_id for product_id, pid in self._pids.items()}
+
+    def product_history(self, product_id: str, since: Optional[float] = None) -> List[Tuple[Any, ...]]:
+        """``(ts, price, ship, stock, status, latency_ms)`` rows for one product, oldest first."""
+        pid = self._pids.get(product_id)
+        if pid is None:
+            return []
+        return self._db.execute(
+            "SELECT ts, price, ship, stock, status, latency_ms FROM observations"
+            " WHERE pid = ? AND ts >= ? ORDER BY ts",
+            (pid, since or 0.0),
+        ).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
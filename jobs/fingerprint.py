@@ -0,0 +1,117 @@
+"""Page fingerprints for skipping unchanged products.
+
+Many shops don't send validators, and their pages differ between runs only
+in ads, timestamps, nonces or recommendation widgets. For rules with
+``fingerprint`` on (or ``FINGERPRINT_ENABLED``), the fetched page is
+normalized - comments, whitespace, nonce/CSRF values and the rule's
+``volatile_re`` regexes removed - and hashed. When the hash, the rule's
+selectors and the sheet's previous price all match the last check, the
+stored values are reused without parsing and the product is not diffed.
+
+Fingerprints live in the ``product_fingerprint`` table of the state
+database, keyed like ``ProductStateStore`` (``product_key``).
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from pathlib import Path
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+from project.config.settings import settings
+
+# always stripped: they change on every request without the product changing
+DEFAULT_VOLATILE = (
+    r"<!--.*?-->",
+    r"\snonce=\"[^\"]*\"",
+    r"<(?:meta|input)[^>]+(?:csrf|_token|authenticity)[^>]*>",
+)
+_WS_RE = re.compile(r"\s+")
+
+_compiled: Dict[Tuple[str, ...], List[re.Pattern]] = {}
+_compiled_lock = threading.Lock()
+
+
+def _patterns(volatile: Sequence[str]) -> List[re.Pattern]:
+    key = tuple(volatile)
+    patterns = _compiled.get(key)
+    if patterns is None:
+        patterns = []
+        for pattern in DEFAULT_VOLATILE + key:
+            try:
+                patterns.append(re.compile(pattern, re.S | re.I))
+            except re.error:
+                # a sheet cell that is not a valid regex is taken literally
+                patterns.append(re.compile(re.escape(pattern)))
+        with _compiled_lock:
+            _compiled[key] = patterns
+    return patterns
+
+
+def page_fingerprint(html: str, volatile: Sequence[str] = ()) -> str:
+    """Hash of ``html`` with volatile parts and whitespace differences removed."""
+    for pattern in _patterns(volatile):
+        html = pattern.sub("", html)
+    text = _WS_RE.sub(" ", html).strip()
+    return hashlib.blake2b(text.encode("utf-8", "replace"), digest_size=16).hexdigest()
+
+
+def enabled_for(rule: Any) -> bool:
+    flag = rule.get("fingerprint")
+    return settings.FINGERPRINT_ENABLED if flag is None else bool(flag)
+
+
+class Fingerprint:
+    __slots__ = ("fingerprint", "rule_key", "prev_price", "extracted")
+
+    def __init__(self, fingerprint: str, rule_key: str, prev_price: str, extracted: Dict[str, Any]):
+        self.fingerprint = fingerprint
+        self.rule_key = rule_key
+        self.prev_price = prev_price
+        self.extracted = extracted
+
+
+class FingerprintStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or settings.STATE_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # shared by parallel shard processes: WAL, and wait for a writer instead of failing
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS product_fingerprint ("
+            " key TEXT PRIMARY KEY, fingerprint TEXT, rule_key TEXT, prev_price TEXT, extracted TEXT,"
+            " updated_at REAL)"
+        )
+        self._db.commit()
+        self._pending: Dict[str, Tuple[str, str, str, str, float]] = {}
+
+    def get(self, key: str) -> Optional[Fingerprint]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fingerprint, rule_key, prev_price, extracted FROM product_fingerprint WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return Fingerprint(row[0], row[1] or "", row[2] or "", json.loads(row[3]))
+
+    def put(self, key: str, fingerprint: str, rule_key: str, prev_price: str, extracted: Dict[str, Any]) -> None:
+        """Queue a fingerprint; written by ``flush``."""
+        with self._lock:
+            self._pending[key] = (fingerprint, rule_key, prev_price, json.dumps(extracted), time.time())
+
+    def flush(self) -> None:
+        with self._lock:
+            rows = [(key,) + values for key, values in self._pending.items()]
+            self._pending = {}
+            if rows:
+                self._db.executemany("INSERT OR REPLACE INTO product_fingerprint VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._db.commit()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._db.close()
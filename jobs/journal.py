@@ -0,0 +1,157 @@
+"""Checkpoint journal for resumable runs.
+
+A run that writes to the storage's change log journals its progress in the
+state database: which product rows are done, the change rows they produced
+and whether those reached the change log yet, and the runlog counters.
+The run's sink does not flush on its own (``change_sink(auto_flush=False)``);
+it is flushed only by the checkpoints, taken every
+``JOURNAL_CHECKPOINT_ROWS`` rows or ``JOURNAL_CHECKPOINT_S`` seconds in
+two steps - the rows and their change rows are committed as unwritten,
+the sink is flushed, then they are marked written. When a run is killed,
+the next run picks up the same batch: it re-sends the change rows that
+were not marked written, skips the rows already done and continues the
+counters. Rows done after the last checkpoint had nothing in the log yet
+and are checked again. Only a kill in the middle of a checkpoint's flush
+can repeat change rows: those of that one checkpoint that had already
+reached the log.
+
+When the batch finishes, its rows are dropped and only the summary - the
+counters and the rows deferred by a time budget - is kept.
+"""
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from pathlib import Path
+import json
+import sqlite3
+import threading
+import time
+
+from project.config.settings import settings
+
+
+class JournalState:
+    """An unfinished batch as found in the journal."""
+
+    __slots__ = ("batch_id", "started_at", "counts", "done", "unwritten")
+
+    def __init__(self, batch_id: str, started_at: float, counts: Dict[str, int], done: Set[Tuple[int, str]],
+                 unwritten: List[Dict[str, Any]]):
+        self.batch_id = batch_id
+        self.started_at = started_at
+        self.counts = counts
+        # (sheet row, product id) pairs already processed
+        self.done = done
+        # change rows journaled but not confirmed written to the change log
+        self.unwritten = unwritten
+
+
+class RunJournal:
+    def __init__(self, scope: str = "", path: Optional[str] = None, checkpoint_rows: Optional[int] = None,
+                 checkpoint_s: Optional[float] = None):
+        self.scope = scope
+        self.path = Path(path or settings.STATE_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_rows = max(1, checkpoint_rows or settings.JOURNAL_CHECKPOINT_ROWS)
+        self.checkpoint_s = settings.JOURNAL_CHECKPOINT_S if checkpoint_s is None else checkpoint_s
+        self._lock = threading.Lock()
+        # shared by parallel shard processes: WAL, and wait for a writer instead of failing
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS run_journal ("
+            " batch_id TEXT, scope TEXT, status TEXT, started_at REAL, updated_at REAL, counts TEXT,"
+            " deferred TEXT, PRIMARY KEY (batch_id, scope));"
+            "CREATE TABLE IF NOT EXISTS run_journal_rows ("
+            " batch_id TEXT, scope TEXT, row INTEGER, product_id TEXT, change TEXT, written INTEGER,"
+            " PRIMARY KEY (batch_id, scope, row));"
+        )
+        self._db.commit()
+        self.batch_id: Optional[str] = None
+        self._pending: List[Tuple[int, str, Optional[str]]] = []
+        self._last_checkpoint = time.monotonic()
+        self.checkpoints = 0
+
+    def unfinished(self, batch_id: Optional[str] = None) -> Optional[JournalState]:
+        """The latest batch of this scope that was started and not finished (``batch_id`` only, when given)."""
+        with self._lock:
+            if batch_id is None:
+                head = self._db.execute(
+                    "SELECT batch_id, started_at, counts FROM run_journal WHERE scope = ? AND status = 'running'"
+                    " ORDER BY started_at DESC LIMIT 1", (self.scope,)
+                ).fetchone()
+            else:
+                head = self._db.execute(
+                    "SELECT batch_id, started_at, counts FROM run_journal WHERE scope = ? AND status = 'running'"
+                    " AND batch_id = ?", (self.scope, batch_id)
+                ).fetchone()
+            if head is None:
+                return None
+            done = set()
+            unwritten = []
+            for row, product_id, change, written in self._db.execute(
+                    "SELECT row, product_id, change, written FROM run_journal_rows"
+                    " WHERE batch_id = ? AND scope = ? ORDER BY row", (head[0], self.scope)):
+                done.add((row, product_id or ""))
+                if change is not None and not written:
+                    unwritten.append(json.loads(change))
+        return JournalState(head[0], head[1], json.loads(head[2]) if head[2] else {}, done, unwritten)
+
+    def begin(self, batch_id: str, started_at: float) -> None:
+        """Journal ``batch_id`` from here on (a new batch, or the one being resumed)."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO run_journal VALUES (?, ?, 'running', ?, ?, NULL, NULL)",
+                (batch_id, self.scope, started_at, time.time()),
+            )
+            self._db.commit()
+        self.batch_id = batch_id
+        self._last_checkpoint = time.monotonic()
+
+    def discard(self, batch_id: str) -> None:
+        """Forget an unfinished batch (the next run starts a fresh one)."""
+        with self._lock:
+            self._db.execute("DELETE FROM run_journal_rows WHERE batch_id = ? AND scope = ?", (batch_id, self.scope))
+            self._db.execute("UPDATE run_journal SET status = 'discarded', updated_at = ? WHERE batch_id = ?"
+                             " AND scope = ?", (time.time(), batch_id, self.scope))
+            self._db.commit()
+
+    def processed(self, row: int, product_id: str, change: Optional[Dict[str, Any]]) -> None:
+        """Queue a finished product row with the change row (if any) it passed to the sink."""
+        self._pending.append((row, product_id or "", json.dumps(change, ensure_ascii=False) if change else None))
+
+    def due(self) -> bool:
+        return len(self._pending) >= self.checkpoint_rows or \
+            (bool(self._pending) and time.monotonic() - self._last_checkpoint >= self.checkpoint_s)
+
+    def checkpoint(self, counts: Dict[str, int], sync: Callable[[], None]) -> None:
+        """Commit the queued rows, flush the sink with ``sync``, then mark their change rows written."""
+        rows = [(self.batch_id, self.scope, row, product_id, change, 0) for row, product_id, change in self._pending]
+        self._pending = []
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO run_journal_rows VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._db.execute("UPDATE run_journal SET counts = ?, updated_at = ? WHERE batch_id = ? AND scope = ?",
+                             (json.dumps(counts), time.time(), self.batch_id, self.scope))
+            self._db.commit()
+        sync()
+        with self._lock:
+            self._db.execute("UPDATE run_journal_rows SET written = 1 WHERE batch_id = ? AND scope = ?"
+                             " AND written = 0", (self.batch_id, self.scope))
+            self._db.commit()
+        self._last_checkpoint = time.monotonic()
+        self.checkpoints += 1
+
+    def finish(self, counts: Dict[str, int], deferred: List[int]) -> None:
+        """Mark the batch finished and keep only its summary."""
+        with self._lock:
+            self._db.execute("DELETE FROM run_journal_rows WHERE batch_id = ? AND scope = ?",
+                             (self.batch_id, self.scope))
+            self._db.execute(
+                "UPDATE run_journal SET status = 'done', updated_at = ?, counts = ?, deferred = ?"
+                " WHERE batch_id = ? AND scope = ?",
+                (time.time(), json.dumps(counts), json.dumps(deferred), self.batch_id, self.scope),
+            )
+            self._db.commit()
+        self._pending = []
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
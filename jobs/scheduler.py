@@ -1,9 +1,36 @@
-"""Simple scheduler wrapper for periodic runs.
+"""Periodic runs: a thin `schedule` wrapper and a long-running daemon.
 
-This is a tiny wrapper using the `schedule` library if available.
+``Scheduler`` is a tiny wrapper using the `schedule` library if available.
+
+``Daemon`` runs ``run_once`` every ``DAEMON_INTERVAL_MIN`` minutes in one
+process and keeps a ``runner.RunResources`` open between runs: the storage
+(and with it the authenticated Sheets client), the parsed rules, the
+pooled HTTP sessions, the rate limiter, the browser pool and the response
+cache stay warm, and the rules are re-parsed only when the settings
+revision changes. A run that is still going when the next one is due is
+not started twice - neither in this process nor in another daemon sharing
+``DAEMON_LOCK_PATH`` - and the tick is counted as skipped. SIGTERM/SIGINT
+let the current run finish, then close everything.
+
+With ``DAEMON_HEALTH_PORT`` set, a local HTTP endpoint serves
+``GET /health`` (status, run counters, last run, last error),
+``GET /metrics`` (last run metrics, connection pool and rate limiter state)
+and ``POST /run`` (start a run now; 409 while one is in progress).
 """
 import time
-from typing import Callable
+from typing import Any, Callable, Dict, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import json
+import logging
+import signal
+import threading
+import traceback
+
+from project.config.settings import settings
+from project.storage import Storage, get_storage
+
+log = logging.getLogger(__name__)
 
 
 class Scheduler:
@@ -24,3 +51,194 @@ class Scheduler:
             schedule.run_pending()
             time.sleep(1)
 
+
+class _FileLock:
+    """Non-blocking exclusive lock on a file (no-op where ``fcntl`` is missing)."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._fh = None
+
+    def acquire(self) -> bool:
+        try:
+            import fcntl
+        except ImportError:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fh = open(self.path, "a+")
+        try:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        self._fh = fh
+        return True
+
+    def release(self) -> None:
+        if self._fh is not None:
+            import fcntl
+
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+
+
+class Daemon:
+    def __init__(self, interval_minutes: Optional[float] = None, health_port: Optional[int] = None,
+                 incremental: bool = False, budget: Optional[int] = None,
+                 storage_factory: Callable[[], Storage] = get_storage, lock_path: Optional[str] = None):
+        self.interval_s = 60.0 * (interval_minutes if interval_minutes is not None else settings.DAEMON_INTERVAL_MIN)
+        self.health_port = health_port if health_port is not None else settings.DAEMON_HEALTH_PORT
+        self.incremental = incremental
+        self.budget = budget
+        self.storage_factory = storage_factory
+        self.resources = None
+        self._run_lock = threading.Lock()
+        self._file_lock = _FileLock(lock_path or settings.DAEMON_LOCK_PATH)
+        self._stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.started = time.time()
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.running_since: Optional[float] = None
+        self.next_run: Optional[float] = None
+        self.warmup_ms: Optional[float] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+
+    def run_now(self) -> bool:
+        """Run once unless a run is already in progress (here or in another process)."""
+        if not self._run_lock.acquire(blocking=False):
+            self.skipped += 1
+            return False
+        try:
+            if not self._file_lock.acquire():
+                self.skipped += 1
+                log.warning("another run holds %s; skipping", self._file_lock.path)
+                return False
+            try:
+                self._run()
+            finally:
+                self._file_lock.release()
+        finally:
+            self._run_lock.release()
+        return True
+
+    def _run(self) -> None:
+        from project.runner import RunResources, run_once
+
+        self.running_since = time.time()
+        t0 = time.perf_counter()
+        try:
+            if self.resources is None:
+                self.resources = RunResources(self.storage_factory())
+                self.warmup_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+            entry = run_once(incremental=self.incremental, budget=self.budget, resources=self.resources)
+            self.runs += 1
+            self.last_error = None
+            self.last_run = {key: entry.get(key) for key in ("batch_id", "total", "success", "fail", "http_calls",
+                                                             "memo")}
+            self.last_run.update(finished=time.time(), duration_s=round(time.perf_counter() - t0, 3))
+        except Exception:
+            self.failures += 1
+            self.last_error = traceback.format_exc(limit=5)
+            log.exception("daemon run failed")
+        finally:
+            self.running_since = None
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def health(self) -> Dict[str, Any]:
+        resources = self.resources
+        now = time.time()
+        return {
+            "status": "stopping" if self._stop.is_set() else "running" if self.running_since else "idle",
+            "uptime_s": round(now - self.started, 1),
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "running_for_s": round(now - self.running_since, 1) if self.running_since else None,
+            "next_run_in_s": round(max(0.0, self.next_run - now), 1) if self.next_run else None,
+            "warmup_ms": self.warmup_ms,
+            "rules_loads": resources.rules_loads if resources is not None else 0,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        from project.scraper.session import get_session_pool
+
+        resources = self.resources
+        last = resources.last_metrics if resources is not None else None
+        limiter = resources.limiter if resources is not None else None
+        return {
+            "last_run": last.summary() if last is not None else None,
+            "sessions": get_session_pool().stats(),
+            "rates": limiter.rates() if limiter is not None else {},
+        }
+
+    def _trigger(self) -> bool:
+        if self._run_lock.locked():
+            return False
+        threading.Thread(target=self.run_now, name="daemon-run", daemon=True).start()
+        return True
+
+    def _serve_health(self) -> None:
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, body: Dict[str, Any]) -> None:
+                data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._reply(200, daemon.health())
+                elif self.path == "/metrics":
+                    self._reply(200, daemon.metrics())
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path != "/run":
+                    self._reply(404, {"error": "not found"})
+                elif daemon._trigger():
+                    self._reply(202, {"started": True})
+                else:
+                    self._reply(409, {"started": False, "error": "a run is in progress"})
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.health_port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="daemon-health", daemon=True).start()
+
+    def run_forever(self) -> None:
+        """Run now and then every interval until stopped; closes the warm resources on exit."""
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                signal.signal(signum, lambda *_: self.stop())
+        if self.health_port:
+            self._serve_health()
+        try:
+            while not self._stop.is_set():
+                started = time.time()
+                self.next_run = started + self.interval_s
+                self.run_now()
+                self._stop.wait(max(0.0, self.next_run - time.time()))
+        finally:
+            # a run started through POST /run finishes before anything is closed
+            with self._run_lock:
+                if self.resources is not None:
+                    self.resources.close()
+                    self.resources = None
+            if self._server is not None:
+                self._server.shutdown()
+                self._server.server_close()
@@ -0,0 +1,158 @@
+"""Sharded runs across processes or machines.
+
+Product rows are partitioned by a stable hash of their domain
+(``runner.shard_of``), so every shop - and its rate limit - lives in
+exactly one shard. Each shard runs the normal pipeline with
+``run_once(shard=(i, n))`` into a recording sink and produces a result:
+its change rows (tagged with their product-sheet row) and its runlog
+entry with raw counters and metrics. ``merge_results`` combines the shard
+results of one batch into a single row-ordered change list and one runlog
+entry, which ``write_merged`` writes like a single-process run would.
+
+Locally, ``run_sharded`` runs the shards in a process pool. Across
+machines, run ``cli.py run --shards N --shard-index i --batch-id B`` on
+each node (results go to ``SHARD_DIR/<batch>/``, which must be shared or
+copied to one place) and finish with ``cli.py merge --batch-id B --shards N``.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import json
+
+from project.config.settings import settings
+from project.metrics import RunMetrics
+from project.storage import Storage, get_storage
+
+
+class _ShardSink:
+    """Keeps change fields (with their row) and the runlog entry of one shard."""
+
+    def __init__(self):
+        self.changes: List[Dict[str, Any]] = []
+        self.runlog: Optional[Dict[str, Any]] = None
+
+    def add_change(self, **fields) -> None:
+        self.changes.append(fields)
+
+    def add_row(self, row: List[Any]) -> None:
+        pass
+
+    def add_runlog(self, info: Dict[str, Any]) -> None:
+        self.runlog = info
+
+    def close(self) -> None:
+        pass
+
+
+def run_shard(index: int, shards: int, batch_id: str, incremental: bool = False, budget: Optional[int] = None,
+              storage_factory: Callable[[], Storage] = get_storage,
+              time_budget: Optional[float] = None) -> Dict[str, Any]:
+    """Run shard ``index`` of ``shards`` and return its (JSON-serializable) result."""
+    from project.runner import run_once
+
+    if not 0 <= index < shards:
+        raise ValueError(f"shard index {index} out of range for {shards} shards")
+    sink = _ShardSink()
+    runlog = run_once(incremental=incremental, budget=budget, sink=sink, storage=storage_factory(),
+                      shard=(index, shards), batch_id=batch_id, time_budget=time_budget)
+    return {"batch_id": batch_id, "index": index, "shards": shards, "changes": sink.changes, "runlog": runlog}
+
+
+def result_path(batch_id: str, index: int, shards: int, directory: Optional[str] = None) -> Path:
+    return Path(directory or settings.SHARD_DIR) / batch_id / f"shard-{index}-of-{shards}.json"
+
+
+def save_result(result: Dict[str, Any], directory: Optional[str] = None) -> Path:
+    path = result_path(result["batch_id"], result["index"], result["shards"], directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+    tmp.replace(path)
+    return path
+
+
+def load_results(batch_id: str, shards: int, directory: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Load every shard result of a batch; raises RuntimeError if any is missing."""
+    results = []
+    missing = []
+    for index in range(shards):
+        path = result_path(batch_id, index, shards, directory)
+        if not path.exists():
+            missing.append(index)
+            continue
+        results.append(json.loads(path.read_text(encoding="utf-8")))
+    if missing:
+        raise RuntimeError(f"batch {batch_id}: missing results for shards {missing}")
+    return results
+
+
+def merge_results(results: Sequence[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any], RunMetrics]:
+    """Combine shard results into ``(changes in sheet-row order, runlog entry, metrics)``."""
+    from project.runner import RUN_COUNTERS, build_runlog_entry
+
+    if not results:
+        raise ValueError("no shard results to merge")
+    batch_ids = {r["batch_id"] for r in results}
+    if len(batch_ids) != 1:
+        raise ValueError(f"shard results belong to different batches: {sorted(batch_ids)}")
+    counts = dict.fromkeys(RUN_COUNTERS, 0)
+    conn = [0, 0]
+    incremental = None
+    metrics = RunMetrics()
+    changes: List[Dict[str, Any]] = []
+    for result in results:
+        runlog = result["runlog"]
+        for name in RUN_COUNTERS:
+            counts[name] += runlog["counts"].get(name, 0)
+        conn = [conn[0] + runlog["conn"][0], conn[1] + runlog["conn"][1]]
+        if runlog.get("incremental") is not None:
+            incremental = [a + b for a, b in zip(incremental or [0, 0, 0], runlog["incremental"])]
+        metrics.merge_state(runlog.get("metrics") or {})
+        changes.extend(result["changes"])
+    # stable: rows keep their per-shard order, shards interleave by sheet row
+    changes.sort(key=lambda fields: fields.get("row") or 0)
+    start_ts = min(r["runlog"]["start_ts"] for r in results)
+    end_ts = max(r["runlog"]["end_ts"] for r in results)
+    entry = build_runlog_entry(batch_ids.pop(), start_ts, end_ts, counts, metrics, tuple(conn),
+                               tuple(incremental) if incremental is not None else None)
+    entry["memo"] += f" / 샤드:{len(results)}"
+    return changes, entry, metrics
+
+
+def write_merged(storage: Storage, results: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Write merged shard results to the storage's change log and runlog as one batch."""
+    from project.history import PageArchive
+    from project.runner import close_batch
+
+    changes, entry, metrics = merge_results(results)
+    sink = storage.change_sink()
+    for fields in changes:
+        sink.add_change(**fields)
+    close_batch(sink, entry, metrics, storage)
+    if settings.ARCHIVE_ENABLED:
+        # shard runs leave the batch open, so the archive is pruned once the merged batch is written
+        archive = PageArchive()
+        try:
+            archive.prune()
+        finally:
+            archive.close()
+    return entry
+
+
+def run_sharded(shards: int, incremental: bool = False, budget: Optional[int] = None,
+                storage_factory: Callable[[], Storage] = get_storage,
+                processes: Optional[int] = None, time_budget: Optional[float] = None) -> Dict[str, Any]:
+    """Run all shards in a local process pool and write the merged batch.
+
+    ``storage_factory`` must be picklable (a class or module-level function);
+    it builds the storage backend in every worker and in the coordinator.
+    """
+    from project.runner import new_batch_id
+
+    batch_id = new_batch_id()
+    with ProcessPoolExecutor(max_workers=max(1, processes or shards)) as pool:
+        futures = [pool.submit(run_shard, index, shards, batch_id, incremental, budget, storage_factory,
+                               time_budget)
+                   for index in range(shards)]
+        results = [future.result() for future in futures]
+    return write_merged(storage_factory(), results)
@@ -0,0 +1,155 @@
+"""Per-product check state for incremental runs.
+
+Each product keeps when it was last checked (the start of that run) and
+last changed, an exponentially weighted change rate and its last error.
+The rate is a plain average over the first checks, so a product that
+changes every time reaches the shortest interval at once instead of
+creeping towards it. ``select_due`` turns the rate into a re-check
+interval between ``INCREMENTAL_MIN_INTERVAL_MIN`` (products that change on
+most checks) and ``INCREMENTAL_MAX_INTERVAL_MIN`` (products that never
+change) and picks the most overdue products up to a per-run fetch budget.
+A product counts as due a little early (``DUE_FRACTION``), so that with
+runs every hour an hourly product is not pushed to the next run by a few
+seconds of scheduling jitter.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+import sqlite3
+import threading
+import time
+
+from project.config.settings import settings
+
+# weight of the newest observation in the change-rate EWMA
+CHANGE_RATE_ALPHA = 0.3
+# a product is due once this fraction of its interval has passed
+DUE_FRACTION = 0.9
+# floor for INCREMENTAL_MIN_INTERVAL_MIN (0 would mean "check on every run" and break the interpolation)
+MIN_INTERVAL_S = 60.0
+
+
+def product_key(product_id: str, url: str) -> str:
+    return f"{product_id}|{url}" if product_id else url
+
+
+class ProductState:
+    __slots__ = ("key", "last_checked", "last_changed", "checks", "changes", "change_rate",
+                 "last_error", "error_streak")
+
+    def __init__(self, key: str, last_checked: Optional[float] = None, last_changed: Optional[float] = None,
+                 checks: int = 0, changes: int = 0, change_rate: float = 0.0,
+                 last_error: Optional[str] = None, error_streak: int = 0):
+        self.key = key
+        self.last_checked = last_checked
+        self.last_changed = last_changed
+        self.checks = checks
+        self.changes = changes
+        self.change_rate = change_rate
+        self.last_error = last_error
+        self.error_streak = error_streak
+
+    def interval_s(self) -> float:
+        # at least a minute: the interpolation below divides by it
+        lo = max(MIN_INTERVAL_S, settings.INCREMENTAL_MIN_INTERVAL_MIN * 60.0)
+        hi = max(lo, settings.INCREMENTAL_MAX_INTERVAL_MIN * 60.0)
+        # geometric interpolation: rate 1 -> lo, rate 0 -> hi
+        interval = lo * (hi / lo) ** (1.0 - min(1.0, max(0.0, self.change_rate)))
+        if self.error_streak:
+            # failing products come back sooner, backing off per consecutive error
+            interval = min(interval, lo * (2 ** (self.error_streak - 1)))
+        return interval
+
+    def record(self, now: float, changed: bool, error: Optional[str]) -> None:
+        self.last_checked = now
+        if error:
+            self.last_error = error
+            self.error_streak += 1
+            return
+        self.last_error = None
+        self.error_streak = 0
+        self.checks += 1
+        if changed:
+            self.changes += 1
+            self.last_changed = now
+        # plain mean until there are enough checks for the EWMA weight to take over
+        weight = max(CHANGE_RATE_ALPHA, 1.0 / self.checks)
+        self.change_rate = (1 - weight) * self.change_rate + weight * (1.0 if changed else 0.0)
+
+
+class ProductStateStore:
+    _COLUMNS = ProductState.__slots__
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or settings.STATE_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # shared by parallel shard processes: WAL, and wait for a writer instead of failing
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS product_state ("
+            " key TEXT PRIMARY KEY, last_checked REAL, last_changed REAL, checks INTEGER, changes INTEGER,"
+            " change_rate REAL, last_error TEXT, error_streak INTEGER)"
+        )
+        self._db.commit()
+
+    def load(self, keys: Iterable[str]) -> Dict[str, ProductState]:
+        """Return state for ``keys``; unknown products get a fresh (never checked) state."""
+        states = {key: ProductState(key) for key in keys}
+        if not states:
+            return states
+        with self._lock:
+            cur = self._db.execute(f"SELECT {', '.join(self._COLUMNS)} FROM product_state")
+            for row in cur:
+                if row[0] in states:
+                    states[row[0]] = ProductState(*row)
+        return states
+
+    def save(self, states: Iterable[ProductState]) -> None:
+        rows = [tuple(getattr(s, c) for c in self._COLUMNS) for s in states]
+        if not rows:
+            return
+        placeholders = ", ".join("?" for _ in self._COLUMNS)
+        with self._lock:
+            self._db.executemany(f"INSERT OR REPLACE INTO product_state VALUES ({placeholders})", rows)
+            self._db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def priority_order(keys: List[str], states: Dict[str, ProductState], now: Optional[float] = None) -> List[int]:
+    """All positions in ``keys``, most overdue first (never-checked products lead, ties keep sheet order)."""
+    now = now if now is not None else time.time()
+    scores = []
+    for pos, key in enumerate(keys):
+        state = states[key]
+        if state.last_checked is None:
+            scores.append((float("inf"), pos))
+        else:
+            scores.append(((now - state.last_checked) / state.interval_s(), pos))
+    scores.sort(key=lambda item: (-item[0], item[1]))
+    return [pos for _score, pos in scores]
+
+
+def select_due(keys: List[str], states: Dict[str, ProductState], now: Optional[float] = None,
+               budget: Optional[int] = None) -> Tuple[List[int], int]:
+    """Pick the positions in ``keys`` that are due, most overdue first, capped by ``budget``.
+
+    Returns ``(positions in original order, number of due products)`` so the
+    caller can report how many were deferred by the budget.
+    """
+    now = now if now is not None else time.time()
+    due: List[Tuple[float, int]] = []
+    for pos, key in enumerate(keys):
+        state = states[key]
+        if state.last_checked is None:
+            due.append((float("inf"), pos))
+            continue
+        overdue = (now - state.last_checked) / state.interval_s()
+        if overdue >= DUE_FRACTION:
+            due.append((overdue, pos))
+    due.sort(key=lambda item: (-item[0], item[1]))
+    picked = due[:budget] if budget else due
+    return sorted(pos for _score, pos in picked), len(due)
@@ -0,0 +1,163 @@
+"""Per-run performance metrics.
+
+``RunMetrics`` aggregates stage timings (rule lookup, DNS, connect, TTFB,
+download, parse, extraction, sheet writes), per-domain latency
+percentiles, downloaded bytes, retries and typed error categories for one
+run. The runner puts the compact form into the runlog row
+(``avg_response_ms`` / ``domain_summary``) and the full form into a JSON
+file per batch under ``settings.METRICS_DIR``.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+from pathlib import Path
+import json
+import math
+
+from project.config.settings import settings
+
+STAGES = ("rule_lookup", "fetch", "dns", "connect", "ttfb", "download", "parse", "extract", "sheet_write")
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class _DomainStats:
+    __slots__ = ("latencies", "bytes", "retries", "errors", "cached")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.bytes = 0
+        self.retries = 0
+        self.errors: Dict[str, int] = {}
+        self.cached = 0
+
+
+class RunMetrics:
+    def __init__(self):
+        self.stage_ms: Dict[str, float] = {name: 0.0 for name in STAGES}
+        self.domains: Dict[str, _DomainStats] = {}
+        self.errors: Dict[str, int] = {}
+
+    def add_stage(self, name: str, ms: float) -> None:
+        self.stage_ms[name] = self.stage_ms.get(name, 0.0) + ms
+
+    def record(self, domain: str, elapsed_ms: Optional[float], trace: Optional[Dict[str, Any]] = None,
+               error_kind: Optional[str] = None, cached: bool = False) -> None:
+        """Fold one fetched product into the run totals."""
+        stats = self.domains.get(domain)
+        if stats is None:
+            stats = self.domains[domain] = _DomainStats()
+        trace = trace or {}
+        if cached:
+            stats.cached += 1
+        elif elapsed_ms is not None and error_kind != "circuit_open":
+            stats.latencies.append(elapsed_ms)
+        stats.bytes += trace.get("bytes", 0)
+        stats.retries += trace.get("retries", 0)
+        if error_kind:
+            stats.errors[error_kind] = stats.errors.get(error_kind, 0) + 1
+            self.errors[error_kind] = self.errors.get(error_kind, 0) + 1
+        for name in ("dns", "connect", "ttfb", "download", "parse", "extract"):
+            self.add_stage(name, trace.get(name + "_ms", 0.0))
+        if elapsed_ms is not None:
+            self.add_stage("fetch", elapsed_ms)
+
+    def avg_response_ms(self) -> Optional[float]:
+        latencies = [ms for stats in self.domains.values() for ms in stats.latencies]
+        if not latencies:
+            return None
+        return round(sum(latencies) / len(latencies), 1)
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        """p50/p95/p99 of every fetched product of the run, across domains."""
+        latencies = sorted(ms for stats in self.domains.values() for ms in stats.latencies)
+        return {f"p{q}_ms": round(percentile(latencies, q), 1) for q in PERCENTILES}
+
+    def domain_table(self) -> Dict[str, Dict[str, Any]]:
+        table = {}
+        for domain, stats in self.domains.items():
+            latencies = sorted(stats.latencies)
+            row = {"count": len(latencies), "cached": stats.cached, "bytes": stats.bytes,
+                   "retries": stats.retries, "errors": dict(stats.errors)}
+            for q in PERCENTILES:
+                row[f"p{q}_ms"] = round(percentile(latencies, q), 1)
+            table[domain] = row
+        return table
+
+    def domain_summary(self, limit: int = 5) -> str:
+        """Slowest domains by p95, e.g. ``coupang.com n=40 p50=210 p95=880 p99=1200 err=2``."""
+        table = self.domain_table()
+        slowest = sorted(table.items(), key=lambda kv: kv[1]["p95_ms"], reverse=True)[:limit]
+        parts = []
+        for domain, row in slowest:
+            text = f"{domain} n={row['count']} p50={row['p50_ms']:.0f} p95={row['p95_ms']:.0f} p99={row['p99_ms']:.0f}"
+            errors = sum(row["errors"].values())
+            if errors:
+                text += f" err={errors}"
+            parts.append(text)
+        if len(table) > limit:
+            parts.append(f"+{len(table) - limit}")
+        return "; ".join(parts)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "stage_ms": {name: round(ms, 1) for name, ms in self.stage_ms.items()},
+            "avg_response_ms": self.avg_response_ms(),
+            "latency_ms": self.latency_percentiles(),
+            "bytes": sum(stats.bytes for stats in self.domains.values()),
+            "retries": sum(stats.retries for stats in self.domains.values()),
+            "errors": dict(self.errors),
+            "domains": self.domain_table(),
+        }
+
+    def dump(self) -> Dict[str, Any]:
+        """Raw, mergeable state (including latency samples) for shard results."""
+        return {
+            "stage_ms": dict(self.stage_ms),
+            "errors": dict(self.errors),
+            "domains": {domain: {name: getattr(stats, name) for name in _DomainStats.__slots__}
+                        for domain, stats in self.domains.items()},
+        }
+
+    @classmethod
+    def load(cls, state: Dict[str, Any]) -> "RunMetrics":
+        metrics = cls()
+        metrics.merge_state(state)
+        return metrics
+
+    def merge_state(self, state: Dict[str, Any]) -> None:
+        """Add another run's ``dump()`` (e.g. a shard of the same batch) to this one."""
+        for name, ms in state.get("stage_ms", {}).items():
+            self.add_stage(name, ms)
+        for kind, n in state.get("errors", {}).items():
+            self.errors[kind] = self.errors.get(kind, 0) + n
+        for domain, raw in state.get("domains", {}).items():
+            stats = self.domains.get(domain)
+            if stats is None:
+                stats = self.domains[domain] = _DomainStats()
+            stats.latencies.extend(raw.get("latencies", ()))
+            stats.bytes += raw.get("bytes", 0)
+            stats.retries += raw.get("retries", 0)
+            stats.cached += raw.get("cached", 0)
+            for kind, n in raw.get("errors", {}).items():
+                stats.errors[kind] = stats.errors.get(kind, 0) + n
+
+    def write_json(self, batch_id: str, extra: Optional[Dict[str, Any]] = None,
+                   directory: Optional[str] = None) -> Optional[Path]:
+        """Write ``<METRICS_DIR>/<batch_id>.json``; returns None when disabled."""
+        directory = directory if directory is not None else settings.METRICS_DIR
+        if not directory:
+            return None
+        root = Path(directory)
+        root.mkdir(parents=True, exist_ok=True)
+        payload = dict(extra or {}, batch_id=batch_id, **self.summary())
+        path = root / f"{batch_id}.json"
+        tmp = root / f"{batch_id}.json.tmp"
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(path)
+        return path
@@ -4,14 +4,19 @@ Provides price parsing, shipping parsing, DOM extraction helpers, and
 an HTTP GET with retries/backoff. These functions are designed to be
 imported by the runner.
 """
-from typing import Optional, Iterable, Tuple
+from typing import Any, Callable, Dict, List, Optional, Iterable, Mapping, Tuple
+import codecs
 import re
 import time
 from datetime import datetime, timezone, timedelta
 from bs4 import BeautifulSoup
-import requests
 
 from project.config.settings import settings
+from project.scraper.engine import domain_of
+from project.scraper.errors import FetchError
+from project.scraper.session import get_session_pool
+
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?([A-Za-z0-9_-]+)", re.I)
 
 # Timezone for logging (KST)
 KST = timezone(timedelta(hours=9))
@@ -123,21 +128,183 @@ def sleep_ms(ms: int) -> None:
 
 
 def http_get(url: str, ua: str, timeout: int, retry: int, backoff_ms: int) -> Tuple[str, int]:
+    text, status, _headers = http_get_conditional(url, ua, timeout, retry, backoff_ms)
+    return text, status
+
+
+def _incremental_decoder(encoding: Optional[str], head: bytes):
+    if not encoding:
+        m = _META_CHARSET_RE.search(head[:4096])
+        encoding = m.group(1).decode("ascii") if m else "utf-8"
+    try:
+        return codecs.getincrementaldecoder(encoding)(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+class _PartialBody:
+    """Decoded chunks of a partial-body download and when to stop it.
+
+    The caller runs its "located yet?" check on ``text()`` whenever
+    ``due()``; that check parses the whole prefix, so it is only due once
+    the body read has doubled since the last one - about two full parses in
+    all, however many chunks arrive. ``add`` says stop one chunk after the
+    check first holds (the extra chunk lets the matched elements close), at
+    ``</body>`` or once ``max_bytes`` have been read.
+    """
+
+    __slots__ = ("max_bytes", "parts", "read", "checked_at", "located", "cut", "_tail")
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.parts: List[str] = []
+        self.read = 0
+        self.checked_at = 0
+        self.located = False
+        # stopped before the end of the page (located or max_bytes)
+        self.cut = False
+        self._tail = ""
+
+    def keep(self, data: bytes) -> bytes:
+        return data[:self.max_bytes - self.read] if self.max_bytes > 0 else data
+
+    def add(self, text: str, size: int) -> bool:
+        """Take a decoded chunk of ``size`` wire bytes; True when the download should stop."""
+        self.parts.append(text)
+        self.read += size
+        if self.located or (self.max_bytes > 0 and self.read >= self.max_bytes):
+            self.cut = True
+            return True
+        tail, self._tail = self._tail + text, text[-6:]
+        return "</body" in tail.lower()
+
+    def due(self) -> bool:
+        if self.located or self.read < 2 * self.checked_at:
+            return False
+        self.checked_at = self.read
+        return True
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
+def read_partial(r: Any, max_bytes: int, until: Optional[Callable[[str], bool]] = None,
+                 trace: Optional[Dict[str, Any]] = None) -> str:
+    """Read a ``stream=True`` response incrementally and close it early.
+
+    Stops one chunk (``STREAM_CHUNK_BYTES``) after ``until(text so far)``
+    first holds, at ``</body>`` or once ``max_bytes`` of body have been
+    read (see ``_PartialBody`` for how often ``until`` runs). The connection
+    is closed rather than drained, so it is not reused. ``trace`` receives
+    ``download_ms``, wire ``bytes`` and ``partial`` (1 when the body was cut
+    short).
+    """
+    t0 = time.perf_counter()
+    decoder = None
+    body = _PartialBody(max_bytes)
+    stopped = False
+    try:
+        for data in r.iter_content(chunk_size=settings.STREAM_CHUNK_BYTES):
+            if decoder is None:
+                decoder = _incremental_decoder(r.encoding, data)
+            if body.add(decoder.decode(body.keep(data)), len(data)):
+                stopped = True
+                break
+            if until is not None and body.due():
+                body.located = until(body.text())
+        if decoder is not None and not stopped:
+            body.parts.append(decoder.decode(b"", final=True))
+    finally:
+        try:
+            wire = r.raw.tell()
+        except Exception:
+            wire = 0
+        r.close()
+        if trace is not None:
+            trace["download_ms"] = trace.get("download_ms", 0.0) + (time.perf_counter() - t0) * 1000.0
+            trace["bytes"] = trace.get("bytes", 0) + (wire or min(body.read, max_bytes))
+            if body.cut:
+                trace["partial"] = 1
+    return body.text()
+
+
+def http_get_conditional(url: str, ua: str, timeout: int, retry: int, backoff_ms: int,
+                         etag: Optional[str] = None, last_modified: Optional[str] = None,
+                         trace: Optional[Dict[str, Any]] = None,
+                         limiter: Optional[Any] = None, max_bytes: int = 0,
+                         until: Optional[Callable[[str], bool]] = None) -> Tuple[str, int, Mapping[str, str]]:
+    """GET with retries that revalidates with ``etag``/``last_modified`` when given.
+
+    Returns ``(text, status, response_headers)``; a 304 comes back as
+    ``("", 304, headers)``. ``trace`` collects connection timings, bytes,
+    the number of ``retries`` and the ``final_url`` after redirects. Raises ``FetchError`` once retries run out.
+
+    With an ``AdaptiveRateLimiter`` every attempt waits for the domain's
+    token bucket, throttling responses (honouring ``Retry-After``) feed back
+    into its rate, and an open circuit fails immediately; without one the
+    fixed linear backoff is used.
+
+    With ``max_bytes`` the body is streamed through ``read_partial`` and
+    the download stops once ``until(text so far)`` is satisfied or
+    ``max_bytes`` have been read.
+    """
     last_error = None
-    headers = {"User-Agent": ua} if ua else settings.DEFAULT_HEADERS
+    last_kind = "other"
+    last_status = None
+    headers = dict({"User-Agent": ua} if ua else settings.DEFAULT_HEADERS)
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    pool = get_session_pool()
+    domain = domain_of(url) if limiter is not None else ""
     for attempt in range(retry + 1):
+        if attempt and trace is not None:
+            trace["retries"] = trace.get("retries", 0) + 1
+        if limiter is not None:
+            limiter.acquire(domain)
         try:
-            r = requests.get(url, headers=headers, timeout=timeout)
+            r = pool.get(url, headers=headers, timeout=timeout, trace=trace, stream=max_bytes > 0)
             status = r.status_code
-            if status == 200:
-                return r.text, status
-            elif status in (403, 429, 503):
+            if max_bytes > 0 and status != 200:
+                r.content  # drain the (small) error body so the connection is reused
+            if status in (403, 429, 503):
                 last_error = f"HTTP {status}"
-                sleep_ms(backoff_ms * (attempt + 1))
+                last_kind, last_status = f"http_{status}", status
+                if limiter is not None:
+                    limiter.on_throttle(domain, status, r.headers, backoff_ms)
+                else:
+                    sleep_ms(backoff_ms * (attempt + 1))
+                continue
+            if limiter is not None and (200 <= status < 300 or status == 304):
+                limiter.on_success(domain)
+            elif limiter is not None:
+                limiter.on_response(domain)
+            if status == 200:
+                if r.history and trace is not None:
+                    trace["final_url"] = r.url
+                if max_bytes > 0:
+                    return read_partial(r, max_bytes, until, trace), status, r.headers
+                return r.text, status, r.headers
+            elif status == 304:
+                return "", status, r.headers
             else:
-                return "", status
+                return "", status, r.headers
         except Exception as exc:
             last_error = str(exc)
-            sleep_ms(backoff_ms * (attempt + 1))
-    raise RuntimeError(f"HTTP GET failed: {last_error}")
+            last_kind, last_status = _error_kind(exc), None
+            if limiter is not None:
+                limiter.on_failure(domain, backoff_ms)
+            else:
+                sleep_ms(backoff_ms * (attempt + 1))
+    raise FetchError(f"HTTP GET failed: {last_error}", kind=last_kind, status=last_status)
+
+
+def _error_kind(exc: Exception) -> str:
+    import requests
 
+    if isinstance(exc, requests.Timeout):
+        return "timeout"
+    if isinstance(exc, requests.ConnectionError):
+        return "connection"
+    return "other"
@@ -0,0 +1,8 @@
+# pipeline package
+# Generator/queue-connected run stages with pluggable row sources and sinks.
+from .stages import threaded
+from .sources import ListRowSource, SheetRowSource
+from .sinks import MemorySink, ThreadedSink
+from .catalogue import Catalogue
+
+__all__ = ["threaded", "ListRowSource", "SheetRowSource", "MemorySink", "ThreadedSink", "Catalogue"]
@@ -0,0 +1,91 @@
+"""Compact in-memory product catalogue.
+
+``Catalogue.load`` reads the product rows of a run once and keeps only the
+columns the runner uses, column by column: sheet rows and previous prices
+(parsed once) in ``array`` columns, sellers and domains interned so each
+distinct value is stored once, ids, names and URLs as plain lists. Rows
+without id, name and URL are dropped while loading. The rule resolver,
+the incremental/priority scheduler and the diff stage all work from the
+same catalogue; per-row entry dicts are only built for the row being
+processed (``entry``).
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from array import array
+
+from project.parsers import to_int_price
+from project.scraper.engine import domain_of
+
+# array('q') value for an empty 이전가 cell, or one that holds no price
+NO_PRICE = -1
+# what ``columns`` lists, in order (1-based sheet columns)
+CATALOGUE_FIELDS = ("product_id", "product_name", "prev_price", "prev_seller", "url")
+
+
+class Catalogue:
+    __slots__ = ("rows", "product_ids", "names", "prev_prices", "sellers", "urls", "domains", "_raw_prices")
+
+    def __init__(self):
+        self.rows = array("l")
+        self.product_ids: List[str] = []
+        self.names: List[str] = []
+        self.prev_prices = array("q")
+        self.sellers: List[str] = []
+        self.urls: List[str] = []
+        self.domains: List[str] = []
+        # 이전가 cells that are not empty but hold no number, kept verbatim by position
+        self._raw_prices: Dict[int, str] = {}
+
+    @classmethod
+    def load(cls, rows: Iterable[Sequence[str]], start_row: int, columns: Sequence[int]) -> "Catalogue":
+        """Catalogue of ``rows`` (sheet rows from ``start_row``); ``columns`` as in ``CATALOGUE_FIELDS``."""
+        id_col, name_col, price_col, seller_col, url_col = (col - 1 for col in columns)
+        width = max(columns)
+        catalogue = cls()
+        interned: Dict[str, str] = {}
+        for row_num, row in enumerate(rows, start_row):
+            if len(row) < width:
+                row = list(row) + [""] * (width - len(row))
+            product_id, name, url = row[id_col].strip(), row[name_col].strip(), row[url_col].strip()
+            if not (product_id or name or url):
+                continue
+            price_text = row[price_col].strip()
+            price = to_int_price(price_text)
+            if price is None and price_text:
+                catalogue._raw_prices[len(catalogue.rows)] = price_text
+            seller = row[seller_col].strip()
+            domain = domain_of(url) if url else ""
+            catalogue.rows.append(row_num)
+            catalogue.product_ids.append(product_id)
+            catalogue.names.append(name)
+            catalogue.prev_prices.append(NO_PRICE if price is None else price)
+            catalogue.sellers.append(interned.setdefault(seller, seller))
+            catalogue.urls.append(url)
+            catalogue.domains.append(interned.setdefault(domain, domain))
+        return catalogue
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def prev_price(self, pos: int) -> Optional[int]:
+        price = self.prev_prices[pos]
+        return None if price == NO_PRICE else price
+
+    def prev_price_str(self, pos: int) -> str:
+        """The 이전가 cell as text: the parsed price (digits only), or the cell itself when it holds none."""
+        price = self.prev_prices[pos]
+        if price == NO_PRICE:
+            return self._raw_prices.get(pos, "")
+        return str(price)
+
+    def entry(self, pos: int) -> Dict[str, Any]:
+        """The runner's per-row dict for position ``pos``."""
+        return {
+            "row": self.rows[pos],
+            "product_id": self.product_ids[pos],
+            "product_name": self.names[pos],
+            "prev_price_str": self.prev_price_str(pos),
+            "prev_price": self.prev_price(pos),
+            "prev_seller": self.sellers[pos],
+            "url": self.urls[pos],
+            "domain": self.domains[pos],
+        }
@@ -0,0 +1,104 @@
+"""Output sinks for the runner pipeline.
+
+A sink takes change-sheet rows and the runlog entry through
+``add_change(**fields)``, ``add_row(row)``, ``add_runlog(info)`` and
+``close()`` - the interface of ``sheets.writer.BufferedSheetWriter``, which
+is the default sink. ``ThreadedSink`` moves any sink's writes onto a
+background thread behind a bounded queue so slow writes do not stall the
+fetch and diff stages; ``sync()`` waits for the queue and flushes it.
+"""
+from typing import Any, Dict, List, Optional
+import queue
+import threading
+
+from project.config.settings import settings
+from project.sheets.writer import build_change_row, build_runlog_row
+
+
+class MemorySink:
+    """Collects rows in lists (dry runs, tests, embedding)."""
+
+    def __init__(self, changes: Optional[List[List[Any]]] = None, runlog: Optional[List[List[Any]]] = None):
+        self.changes: List[List[Any]] = changes if changes is not None else []
+        self.runlog: List[List[Any]] = runlog if runlog is not None else []
+        self.closed = False
+
+    def add_change(self, **fields) -> None:
+        self.changes.append(build_change_row(**fields))
+
+    def add_row(self, row: List[Any]) -> None:
+        self.changes.append(list(row))
+
+    def add_runlog(self, info: Dict[str, Any]) -> None:
+        self.runlog.append(build_runlog_row(info))
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class ThreadedSink:
+    def __init__(self, sink: Any, maxsize: Optional[int] = None):
+        self.sink = sink
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, maxsize or settings.PIPELINE_QUEUE_SIZE))
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._drain, name="sink", daemon=True)
+        self._thread.start()
+
+    def _drain(self) -> None:
+        while True:
+            call = self._q.get()
+            if call is None:
+                return
+            method, args, kwargs = call
+            if method == "sync":
+                self._sync(args[0])
+                continue
+            if self._error is not None:
+                continue
+            try:
+                getattr(self.sink, method)(*args, **kwargs)
+            except BaseException as exc:
+                self._error = exc
+
+    def _put(self, method: str, *args, **kwargs) -> None:
+        if self._error is not None:
+            raise self._error
+        self._q.put((method, args, kwargs))
+
+    def _sync(self, done: threading.Event) -> None:
+        try:
+            flush = getattr(self.sink, "flush", None)
+            if self._error is None and flush is not None:
+                flush()
+        except BaseException as exc:
+            self._error = exc
+        finally:
+            done.set()
+
+    def sync(self) -> None:
+        """Block until every queued write has reached the wrapped sink and it has flushed (where it can)."""
+        done = threading.Event()
+        self._put("sync", done)
+        done.wait()
+        if self._error is not None:
+            raise self._error
+
+    def add_change(self, **fields) -> None:
+        self._put("add_change", **fields)
+
+    def add_row(self, row: List[Any]) -> None:
+        self._put("add_row", row)
+
+    def add_runlog(self, info: Dict[str, Any]) -> None:
+        self._put("add_runlog", info)
+
+    def close(self) -> None:
+        """Drain pending writes, then close the wrapped sink."""
+        self._q.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        self.sink.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.sink, name)
@@ -0,0 +1,70 @@
+"""Row sources for the runner pipeline.
+
+A source yields raw product-sheet rows (lists of cell strings, column A
+first) starting at the first product row. ``SheetRowSource`` pages through
+the worksheet in ranged reads of ``PIPELINE_SOURCE_CHUNK_ROWS`` rows, so the
+sheet is never held in memory as a whole; with ``columns`` it reads only
+those column spans (one batchGet per chunk) and leaves the other cells
+blank. ``ListRowSource`` serves rows that are already loaded (tests, other
+spreadsheets, CSV exports).
+"""
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from project.config.settings import settings
+
+LAST_COLUMN = "K"
+# the product columns the runner reads: E..F (관리번호, 상품명), I..K (이전가, 판매처, URL)
+PRODUCT_COLUMNS = (("E", "F"), ("I", "K"))
+
+
+def column_index(letter: str) -> int:
+    """1-based index of a column letter (``"A"`` -> 1, ``"AA"`` -> 27)."""
+    index = 0
+    for ch in letter.upper():
+        index = index * 26 + ord(ch) - 64
+    return index
+
+
+class ListRowSource:
+    def __init__(self, rows: List[List[str]], start_row: int = 1):
+        self.rows_list = rows
+        self.start_row = start_row
+
+    def rows(self) -> Iterator[List[str]]:
+        for row in self.rows_list[self.start_row - 1:]:
+            yield row
+
+
+class SheetRowSource:
+    def __init__(self, worksheet: Any, start_row: int = 1, chunk_rows: Optional[int] = None,
+                 columns: Optional[Sequence[Tuple[str, str]]] = None):
+        self.worksheet = worksheet
+        self.start_row = start_row
+        self.chunk_rows = max(1, chunk_rows or settings.PIPELINE_SOURCE_CHUNK_ROWS)
+        self.columns = list(columns) if columns else None
+
+    def _chunk(self, first: int, last: int) -> List[List[str]]:
+        if self.columns is None:
+            return [list(row) for row in self.worksheet.get(f"A{first}:{LAST_COLUMN}{last}")]
+        spans = [(column_index(a), column_index(b)) for a, b in self.columns]
+        width = max(end for _start, end in spans)
+        rows = [[""] * width for _ in range(last - first + 1)]
+        ranges = self.worksheet.batch_get([f"{a}{first}:{b}{last}" for a, b in self.columns])
+        for (start, end), values in zip(spans, ranges):
+            for row, cells in zip(rows, values):
+                row[start - 1:start - 1 + len(cells)] = cells[:end - start + 1]
+        return rows
+
+    def rows(self) -> Iterator[List[str]]:
+        # row_count comes from the worksheet metadata already fetched with the handle
+        last_row = self.worksheet.row_count
+        first = self.start_row
+        while first <= last_row:
+            last = min(first + self.chunk_rows - 1, last_row)
+            chunk = self._chunk(first, last)
+            for row in chunk:
+                yield row
+            # the API trims trailing empty rows; pad so row positions stay aligned
+            for _ in range(last - first + 1 - len(chunk)):
+                yield []
+            first = last + 1
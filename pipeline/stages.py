@@ -0,0 +1,63 @@
+"""Bounded-queue plumbing between run stages.
+
+``threaded`` runs an upstream generator in its own thread and hands its
+items over through a bounded queue, so the producer stays at most
+``maxsize`` items ahead of the consumer: stages overlap, and a slow
+consumer applies back-pressure instead of letting memory grow.
+"""
+from typing import Any, Iterable, Iterator, Optional
+import queue
+import threading
+
+from project.config.settings import settings
+
+_DONE = object()
+
+
+class _Failure:
+    __slots__ = ("exc",)
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def threaded(items: Iterable[Any], maxsize: Optional[int] = None, name: str = "stage") -> Iterator[Any]:
+    """Iterate ``items`` in a background thread through a queue of ``maxsize``.
+
+    Exceptions raised by the upstream iterator are re-raised in the consumer.
+    Closing the returned generator early stops the producer.
+    """
+    q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, maxsize or settings.PIPELINE_QUEUE_SIZE))
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pump():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+        except BaseException as exc:  # surfaced to the consumer
+            put(_Failure(exc))
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=pump, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
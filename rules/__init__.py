@@ -1,5 +1,5 @@
 # rules package
 # ...existing code...
-from .loader import load_rules_from_rows, select_rule
+from .loader import Rule, RuleIndex, RulesStore, load_rules_from_rows, select_rule
 
-__all__ = ["load_rules_from_rows", "select_rule"]
+__all__ = ["Rule", "RuleIndex", "RulesStore", "load_rules_from_rows", "select_rule"]
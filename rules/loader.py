@@ -1,24 +1,339 @@
-"""Loader for domain scraping rules.
+"""Loader and matcher for domain scraping rules.
 
-This is a minimal loader that will later be wired to Sheets via the
-SheetsClient. For now it contains helper utilities and a simple in-memory
-representation.
+The settings sheet is parsed once per run into immutable ``Rule`` objects.
+``RuleIndex`` stores the domain patterns in a trie keyed by reversed
+hostname labels (``www.coupang.com`` -> ``com / coupang / www``), so a URL
+lookup walks at most one node per label and the longest (most specific)
+pattern wins. Patterns may carry a path prefix (``smartstore.naver.com/brand``)
+and bare labels (``coupang``) match any host containing that label.
+Resolutions are memoized per host for the lifetime of the index; hosts
+that match nothing get the DEFAULT rule.
 """
-from typing import Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+# Settings-sheet header aliases -> Rule field
+HEADER_ALIASES = {
+    "domain": "pattern", "도메인": "pattern", "pattern": "pattern", "도메인패턴": "pattern",
+    "shop": "shop", "판매처": "shop", "쇼핑몰": "shop",
+    "coupon_css": "coupon_css", "쿠폰": "coupon_css", "쿠폰css": "coupon_css",
+    "price_css": "price_css", "가격": "price_css", "가격css": "price_css",
+    "ship_css": "ship_css", "배송비": "ship_css", "배송비css": "ship_css",
+    "stock_css": "stock_css", "재고": "stock_css", "재고css": "stock_css",
+    "timeout": "timeout", "retry": "retry", "backoff_ms": "backoff_ms", "gap_ms": "gap_ms",
+    "spread": "spread", "ua": "ua", "user_agent": "ua",
+    "cache_max_age": "cache_max_age",
+    "max_bytes": "max_bytes", "최대바이트": "max_bytes",
+    "fingerprint": "fingerprint", "지문": "fingerprint",
+    "volatile_re": "volatile_re", "변동영역": "volatile_re",
+    "keep_params": "keep_params", "유지파라미터": "keep_params",
+    "drop_params": "drop_params", "제거파라미터": "drop_params",
+    "render": "render", "렌더링": "render", "js": "render",
+    "wait_css": "wait_css", "대기css": "wait_css",
+    "http_backend": "http_backend", "backend": "http_backend", "백엔드": "http_backend",
+    "http백엔드": "http_backend",
+    "coupon_json": "coupon_json", "쿠폰json": "coupon_json",
+    "price_json": "price_json", "가격json": "price_json",
+    "ship_json": "ship_json", "배송비json": "ship_json",
+    "stock_json": "stock_json", "재고json": "stock_json",
+}
+
+SELECTOR_FIELDS = ("coupon_css", "price_css", "ship_css", "stock_css")
+# Structured-data paths (``ld:offers.price``, ``next:props.pageProps...``), see project.structured
+JSON_FIELDS = ("coupon_json", "price_json", "ship_json", "stock_json")
+# Regexes (one per line) stripped from a page before it is fingerprinted, see project.jobs.fingerprint
+PATTERN_FIELDS = ("volatile_re",)
+# Query-param allow/deny lists (comma or line separated, ``utm_*`` wildcards) for URL dedup, see
+# project.scraper.canonical
+PARAM_FIELDS = ("keep_params", "drop_params")
+INT_FIELDS = ("timeout", "retry", "backoff_ms", "gap_ms", "spread", "cache_max_age", "max_bytes")
+BOOL_FIELDS = ("render", "fingerprint")
+# ``http_backend``: "requests" (default) or "async", see project.scraper.async_http
+TEXT_FIELDS = ("pattern", "shop", "ua", "wait_css", "http_backend")
+# Fields a domain rule inherits from DEFAULT when its own cell is empty
+INHERITED_FIELDS = (SELECTOR_FIELDS + JSON_FIELDS + PATTERN_FIELDS + PARAM_FIELDS + INT_FIELDS + BOOL_FIELDS +
+                    ("ua", "wait_css", "http_backend"))
+
+_TRUE_CELLS = ("y", "yes", "true", "1", "o", "예", "on")
+
+DEFAULT_PATTERNS = ("default", "*")
+
+
+class Rule:
+    """Immutable scraping rule for one domain pattern."""
+
+    __slots__ = ("pattern", "shop", "coupon_css", "price_css", "ship_css", "stock_css",
+                 "timeout", "retry", "backoff_ms", "gap_ms", "spread", "ua", "cache_max_age", "max_bytes",
+                 "render", "wait_css", "coupon_json", "price_json", "ship_json", "stock_json",
+                 "fingerprint", "volatile_re", "keep_params", "drop_params", "http_backend", "extra")
+
+    def __init__(self, pattern: str = "", shop: Optional[str] = None,
+                 coupon_css: Sequence[str] = (), price_css: Sequence[str] = (),
+                 ship_css: Sequence[str] = (), stock_css: Sequence[str] = (),
+                 timeout: Optional[int] = None, retry: Optional[int] = None,
+                 backoff_ms: Optional[int] = None, gap_ms: Optional[int] = None,
+                 spread: Optional[int] = None, ua: Optional[str] = None,
+                 cache_max_age: Optional[int] = None, render: Optional[bool] = None,
+                 wait_css: Optional[str] = None, coupon_json: Sequence[str] = (), price_json: Sequence[str] = (),
+                 ship_json: Sequence[str] = (), stock_json: Sequence[str] = (), max_bytes: Optional[int] = None,
+                 fingerprint: Optional[bool] = None, volatile_re: Sequence[str] = (),
+                 keep_params: Sequence[str] = (), drop_params: Sequence[str] = (),
+                 http_backend: Optional[str] = None, extra: Optional[Dict[str, str]] = None):
+        values = {
+            "pattern": pattern, "shop": shop or None,
+            "coupon_css": tuple(coupon_css), "price_css": tuple(price_css),
+            "ship_css": tuple(ship_css), "stock_css": tuple(stock_css),
+            "timeout": timeout, "retry": retry, "backoff_ms": backoff_ms, "gap_ms": gap_ms,
+            "spread": spread, "ua": ua or None, "cache_max_age": cache_max_age,
+            "max_bytes": max_bytes,
+            "render": render, "wait_css": wait_css or None,
+            "coupon_json": tuple(coupon_json), "price_json": tuple(price_json),
+            "ship_json": tuple(ship_json), "stock_json": tuple(stock_json),
+            "fingerprint": fingerprint, "volatile_re": tuple(volatile_re),
+            "keep_params": tuple(keep_params), "drop_params": tuple(drop_params),
+            "http_backend": http_backend or None,
+            "extra": tuple(sorted((extra or {}).items())),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Rule is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Rule is immutable")
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Mapping-style access so rules can be passed where dicts are accepted."""
+        value = getattr(self, name, None) if name in self.__slots__ else dict(self.extra).get(name)
+        return default if value is None else value
+
+    def replace(self, **changes) -> "Rule":
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values["extra"] = dict(values["extra"])
+        values.update(changes)
+        return Rule(**values)
+
+    @property
+    def is_default(self) -> bool:
+        return self.pattern.lower() in DEFAULT_PATTERNS
+
+    def __repr__(self):
+        return f"Rule({self.pattern!r}, shop={self.shop!r})"
+
+
+EMPTY_RULE = Rule("DEFAULT")
+
+
+def _split_selectors(cell: str) -> Tuple[str, ...]:
+    # one selector per line (or "||"-separated); commas stay inside a selector group
+    parts = []
+    for line in cell.replace("||", "\n").splitlines():
+        line = line.strip()
+        if line:
+            parts.append(line)
+    return tuple(parts)
+
+
+def _split_params(cell: str) -> Tuple[str, ...]:
+    return tuple(part for part in cell.replace(",", " ").split() if part)
+
+
+def _to_int(cell: str) -> Optional[int]:
+    cell = cell.strip().replace(",", "")
+    if not cell:
+        return None
+    try:
+        return int(float(cell))
+    except ValueError:
+        return None
+
+
+def _normalize_pattern(pattern: str) -> Tuple[str, str]:
+    """Return ``(host, path_prefix)`` for a sheet pattern."""
+    pattern = pattern.strip().lower()
+    if "://" in pattern:
+        pattern = pattern.split("://", 1)[1]
+    if pattern.startswith("*."):
+        pattern = pattern[2:]
+    host, _, path = pattern.partition("/")
+    host = host.strip(".")
+    return host, ("/" + path).rstrip("/") if path else ""
+
+
+class _Node:
+    __slots__ = ("children", "rule", "path_rules")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.rule: Optional[Rule] = None
+        # (path_prefix, rule), longest prefix first
+        self.path_rules: List[Tuple[str, Rule]] = []
+
+
+class RuleIndex:
+    """Reversed-hostname trie over rules with a per-host resolution memo."""
+
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.root = _Node()
+        self.label_rules: Dict[str, Rule] = {}
+        self.default: Rule = EMPTY_RULE
+        self.rules: List[Rule] = []
+        self._memo: Dict[str, Tuple[Tuple[Tuple[str, Rule], ...], Rule]] = {}
+        pending = list(rules)
+        for rule in pending:
+            if rule.is_default:
+                self.default = rule
+        for rule in pending:
+            if not rule.is_default:
+                self.add(rule)
+
+    def add(self, rule: Rule) -> None:
+        rule = self._inherit(rule)
+        self.rules.append(rule)
+        self._memo.clear()
+        host, path = _normalize_pattern(rule.pattern)
+        if not host:
+            return
+        if "." not in host and not path:
+            self.label_rules[host] = rule
+            return
+        node = self.root
+        for label in reversed(host.split(".")):
+            node = node.children.setdefault(label, _Node())
+        if path:
+            node.path_rules.append((path, rule))
+            node.path_rules.sort(key=lambda pr: len(pr[0]), reverse=True)
+        else:
+            node.rule = rule
+
+    def _inherit(self, rule: Rule) -> Rule:
+        if self.default is EMPTY_RULE:
+            return rule
+        changes = {}
+        for name in INHERITED_FIELDS:
+            if getattr(rule, name) in (None, ()) and getattr(self.default, name) not in (None, ()):
+                changes[name] = getattr(self.default, name)
+        return rule.replace(**changes) if changes else rule
+
+    def _resolve_host(self, host: str) -> Tuple[Tuple[Tuple[str, Rule], ...], Rule]:
+        hit = self._memo.get(host)
+        if hit is not None:
+            return hit
+        labels = host.split(".") if host else []
+        node = self.root
+        chain = []
+        for label in reversed(labels):
+            node = node.children.get(label)
+            if node is None:
+                break
+            chain.append(node)
+        path_rules: List[Tuple[str, Rule]] = []
+        host_rule = None
+        for node in reversed(chain):  # deepest (longest) match first
+            path_rules.extend(node.path_rules)
+            if node.rule is not None:
+                host_rule = node.rule
+                break
+        if host_rule is None:
+            for label in labels:
+                if label in self.label_rules:
+                    host_rule = self.label_rules[label]
+                    break
+        hit = (tuple(path_rules), host_rule or self.default)
+        self._memo[host] = hit
+        return hit
+
+    def match(self, url: str) -> Rule:
+        if "://" not in url:
+            url = "//" + url
+        try:
+            parts = urlsplit(url)
+            host = (parts.hostname or "").rstrip(".")
+        except ValueError:
+            return self.default
+        path_rules, host_rule = self._resolve_host(host)
+        if path_rules:
+            path = parts.path.lower().rstrip("/")
+            for prefix, rule in path_rules:
+                if path == prefix or path.startswith(prefix + "/"):
+                    return rule
+        return host_rule
+
+
+def _header_map(header: List[str]) -> Dict[int, str]:
+    mapping = {}
+    for idx, name in enumerate(header):
+        key = name.strip().lower().replace(" ", "")
+        mapping[idx] = HEADER_ALIASES.get(key, key)
+    return mapping
+
+
+def _find_header(rows: List[List[str]]) -> int:
+    for i, row in enumerate(rows):
+        fields = set(_header_map(row).values())
+        if "pattern" in fields:
+            return i
+    return -1
+
+
+def rule_from_row(row: List[str], columns: Dict[int, str]) -> Optional[Rule]:
+    values: Dict[str, Any] = {}
+    extra: Dict[str, str] = {}
+    for idx, field in columns.items():
+        cell = row[idx].strip() if idx < len(row) else ""
+        if field in SELECTOR_FIELDS or field in JSON_FIELDS or field in PATTERN_FIELDS:
+            values[field] = _split_selectors(cell)
+        elif field in PARAM_FIELDS:
+            values[field] = _split_params(cell)
+        elif field in INT_FIELDS:
+            values[field] = _to_int(cell)
+        elif field in BOOL_FIELDS:
+            values[field] = cell.lower() in _TRUE_CELLS if cell else None
+        elif field in TEXT_FIELDS:
+            values[field] = cell
+        elif field and cell:
+            extra[field] = cell
+    if not values.get("pattern"):
+        return None
+    return Rule(extra=extra, **values)
+
+
+def load_rules_from_rows(rows: List[List[str]]) -> Tuple[RuleIndex, List[str]]:
+    """Parse settings-sheet rows into a ``RuleIndex``; returns ``(index, header)``."""
+    header_idx = _find_header(rows)
+    if header_idx < 0:
+        return RuleIndex(), []
+    header = rows[header_idx]
+    columns = _header_map(header)
+    rules = []
+    for row in rows[header_idx + 1:]:
+        rule = rule_from_row(row, columns)
+        if rule is not None:
+            rules.append(rule)
+    return RuleIndex(rules), header
+
+
+def select_rule(rules: RuleIndex, url: str) -> Rule:
+    return rules.match(url)
 
 
 class RulesStore:
+    """Incrementally built rule set (kept for callers that add rules by hand)."""
+
     def __init__(self):
         self.rules: Dict[str, Dict] = {}
+        self._index: Optional[RuleIndex] = None
 
     def add_rule(self, domain_pattern: str, rule: Dict) -> None:
         self.rules[domain_pattern] = rule
+        self._index = None
 
-    def get_rule_for_domain(self, domain: str) -> Dict:
-        # simple substring match
-        candidates = [d for d in self.rules.keys() if d in domain]
-        if candidates:
-            candidates.sort(key=len, reverse=True)
-            return self.rules[candidates[0]]
-        return self.rules.get("DEFAULT", {})
-
+    def get_rule_for_domain(self, domain: str) -> Rule:
+        if self._index is None:
+            fields = set(Rule.__slots__) - {"pattern", "extra"}
+            self._index = RuleIndex(
+                Rule(pattern, **{k: v for k, v in rule.items() if k in fields})
+                for pattern, rule in self.rules.items()
+            )
+        return self._index.match(domain)
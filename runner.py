@@ -1,18 +1,36 @@
 """Central runner module: migrated core logic from pricebot_v3 into a reusable function.
 
-This module depends on project.parsers, project.rules.loader, and
-project.sheets.client.SheetsClient. It mirrors the original script's
-behaviour but keeps state local to the run_once() function.
+This module depends on project.parsers, project.rules.loader, and a
+project.storage backend (Google Sheets by default). It mirrors the
+original script's behaviour but keeps state local to the run_once() function.
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Callable, Dict, Any, Iterable, Iterator, List, Sequence, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
+from functools import partial
+import time
+import zlib
 
 from project.config.settings import settings
-from project.sheets.client import SheetsClient
 from project import parsers
-from project.rules import load_rules_from_rows, select_rule
-from project.sheets import writer as sheets_writer
-from bs4 import BeautifulSoup
+from project.rules import RuleIndex, load_rules_from_rows, select_rule
+from project.scraper.async_http import backend_name, get_async_backend
+from project.scraper.engine import FetchEngine, domain_of
+from project.scraper.session import get_session_pool
+from project.scraper.cache import ResponseCache
+from project.scraper.canonical import RedirectMemo, rule_canonical
+from project.scraper.browser import BrowserPool
+from project.extraction import Extractor, selector_key
+from project.jobs.journal import RunJournal
+from project.jobs.state import ProductStateStore, priority_order, product_key, select_due
+from project.jobs.fingerprint import FingerprintStore, enabled_for, page_fingerprint
+from project.history import HistoryStore, PageArchive
+from project.metrics import RunMetrics
+from project.pipeline import Catalogue, ThreadedSink, threaded
+from project.storage import Storage, get_storage
+from project.scraper.errors import FetchError
+from project.scraper.ratelimit import AdaptiveRateLimiter
 
 # Worksheet names (same as original)
 SHEET_PRODUCTS = "1.상품리스트"
@@ -34,227 +52,914 @@ COL_K_URL = 11  # 조사 URL
 # NOTE: append helpers moved to project.sheets.writer
 
 
-def run_once() -> None:
-    sc = SheetsClient()
-    ws_products = sc.worksheet(SHEET_PRODUCTS)
-    ws_settings = sc.worksheet(SHEET_SETTINGS)
-    ws_changes = sc.worksheet(SHEET_CHANGES)
-    ws_runlog = sc.worksheet(SHEET_RUNLOG)
+def load_catalogue(source: Any) -> Catalogue:
+    """The product rows of ``source`` as a compact ``Catalogue``."""
+    return Catalogue.load(source.rows(), getattr(source, "start_row", START_ROW),
+                          (COL_E_ID, COL_F_NAME, COL_I_PREV, COL_J_SELLER, COL_K_URL))
 
-    # Load settings
-    rows = ws_settings.get_all_values()
-    rules_map, _header = load_rules_from_rows(rows)
 
-    product_rows = ws_products.get_all_values()
-    total_rows = len(product_rows)
+def _fetch(entry: Dict[str, Any], cache: Optional[ResponseCache] = None,
+           browser: Optional[BrowserPool] = None,
+           limiter: Optional[AdaptiveRateLimiter] = None,
+           extractor: Optional[Extractor] = None) -> Any:
+    """Fetch stage, run on the engine's worker threads (no sheet I/O).
 
-    total = success = fail = 0
-    http_calls = 0
-    err_429 = err_403 = err_timeout = err_selector = 0
-    price_changes = 0
-    stock_changes = 0
+    Rules flagged ``render`` are loaded through the shared browser pool.
+    Requests (and renders) are paced by ``limiter`` when one is given.
+    Rules with ``max_bytes`` stream the body and stop downloading once
+    ``extractor`` finds their price, from its first source, in what has
+    arrived so far.
+    Rules on the ``async`` HTTP backend return a Future of the result
+    instead, completed on the backend's event loop.
+
+    The returned dict carries ``cache`` = "fresh" (no request made),
+    "revalidated" (304) or "" (full download), plus either the cached
+    ``extracted`` values (with the cached ``body``, for the page archive)
+    or the ``html`` still to be extracted. Connection
+    timings are collected in ``entry["trace"]``.
+    """
+    url = entry["url"]
+    if not url:
+        return None
+    rule = entry["rule"]
+    trace = entry["trace"] = {}
+
+    # Resolve rule fallbacks
+    timeout = rule.timeout or settings.DEFAULT_TIMEOUT
+    retry = rule.retry or settings.DEFAULT_RETRY
+    backoff_ms = rule.backoff_ms or settings.DEFAULT_BACKOFF_MS
+    ua = rule.ua or settings.DEFAULT_HEADERS.get("User-Agent")
+    max_age = rule.cache_max_age
+    if max_age is None:
+        max_age = settings.CACHE_MAX_AGE_S
+    rule_key = selector_key(rule)
+
+    if rule.render and browser is not None:
+        domain = domain_of(url)
+        if limiter is not None:
+            limiter.acquire(domain)
+        try:
+            html = browser.fetch_html(url, wait_selector=rule.wait_css, timeout_s=timeout)
+        except Exception:
+            # pool errors too, or a probe would hold the circuit half-open for good
+            if limiter is not None:
+                limiter.on_failure(domain, backoff_ms)
+            raise
+        if limiter is not None:
+            limiter.on_success(domain)
+        trace["bytes"] = len(html.encode("utf-8"))
+        return {"cache": "", "extracted": None, "html": html, "store": None}
+
+    cached = cache.lookup(url) if cache is not None else None
+    if cached is not None and cached.extracted is not None and cached.rule_key == rule_key \
+            and cached.age_s() < max_age:
+        return {"cache": "fresh", "extracted": cached.extracted, "body": cached.body}
+
+    conditional = dict(
+        url=url, ua=ua, timeout=timeout, retry=retry, backoff_ms=backoff_ms,
+        etag=cached.etag if cached else None,
+        last_modified=cached.last_modified if cached else None,
+        trace=trace, limiter=limiter, max_bytes=rule.max_bytes or 0,
+        until=partial(extractor.located, rule=rule) if extractor is not None and rule.max_bytes else None,
+    )
+    if backend_name(rule) == "async":
+        # the worker thread is released while the request is in flight
+        return _then(get_async_backend().fetch(**conditional),
+                     partial(_fetched, url=url, cached=cached, rule_key=rule_key, max_age=max_age, cache=cache))
+    return _fetched(parsers.http_get_conditional(**conditional), url, cached, rule_key, max_age, cache)
+
+
+def _fetched(response: Tuple[str, int, Any], url: str, cached, rule_key: str, max_age: int,
+             cache: Optional[ResponseCache]) -> Dict[str, Any]:
+    """Turn ``(html, status, headers)`` into the fetch stage's result (see ``_fetch``)."""
+    html, status_code, headers = response
+    if status_code == 304 and cached is not None:
+        if cached.extracted is not None and cached.rule_key == rule_key:
+            cache.touch(url)
+            return {"cache": "revalidated", "extracted": cached.extracted, "body": cached.body}
+        # selectors changed since the body was cached: re-extract from it
+        return {"cache": "revalidated", "extracted": None, "html": cached.body, "store": None}
+
+    store = None
+    if cache is not None and status_code == 200:
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if etag or last_modified or max_age > 0:
+            store = (etag, last_modified)
+    return {"cache": "", "extracted": None, "html": html, "store": store}
+
+
+def _then(future: Future, func) -> Future:
+    """Future of ``func(future.result())``, run on the thread that completes ``future``."""
+    chained: Future = Future()
+
+    def done(source: Future):
+        try:
+            chained.set_result(func(source.result()))
+        except BaseException as exc:
+            chained.set_exception(exc)
+    future.add_done_callback(done)
+    return chained
+
+
+def _extract(entry: Dict[str, Any], fetched: Dict[str, Any], extractor: Extractor,
+             cache: Optional[ResponseCache] = None,
+             fingerprints: Optional[FingerprintStore] = None) -> Dict[str, Any]:
+    """Extract stage: parse a fetched body, or pass cached values through.
+
+    With ``fingerprints`` (rules with fingerprinting on), a page whose
+    fingerprint matches the last check reuses its values without parsing;
+    ``unchanged`` is set when the sheet's previous price is also the same.
+    """
+    if fetched["extracted"] is not None:
+        return dict(fetched["extracted"], cache=fetched["cache"])
+    rule = entry["rule"]
+    fingerprint = None
+    if fingerprints is not None and enabled_for(rule):
+        key = product_key(entry["product_id"], entry["url"])
+        fingerprint = page_fingerprint(fetched["html"], rule.volatile_re)
+        known = fingerprints.get(key)
+        if known is not None and known.fingerprint == fingerprint and known.rule_key == selector_key(rule):
+            unchanged = known.prev_price == entry["prev_price_str"]
+            if not unchanged:
+                fingerprints.put(key, fingerprint, known.rule_key, entry["prev_price_str"], known.extracted)
+            return dict(known.extracted, cache=fetched["cache"], unchanged=unchanged)
+    extracted = extractor.extract(fetched["html"], rule, entry.get("trace"))
+    if fingerprint is not None:
+        fingerprints.put(key, fingerprint, selector_key(rule), entry["prev_price_str"], extracted)
+    if cache is not None:
+        if fetched["cache"] == "revalidated":
+            cache.touch(entry["url"], extracted, selector_key(rule))
+        elif fetched["store"] is not None:
+            etag, last_modified = fetched["store"]
+            cache.store(entry["url"], etag, last_modified, fetched["html"], extracted, selector_key(rule))
+    return dict(extracted, cache=fetched["cache"])
+
+
+def _timed(func):
+    """Wrap a worker so each entry records its fetch wall time (until its Future completes, for async fetches)."""
+    def run(entry: Dict[str, Any]):
+        t0 = time.perf_counter()
+
+        def stop(_future=None):
+            entry["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+        try:
+            result = func(entry)
+        except BaseException:
+            stop()
+            raise
+        if isinstance(result, Future):
+            result.add_done_callback(stop)
+        else:
+            stop()
+        return result
+    return run
+
+
+def _error_kind(exc: Exception) -> str:
+    if isinstance(exc, FetchError):
+        return exc.kind
+    msg = str(exc)
+    if "429" in msg:
+        return "http_429"
+    if "403" in msg:
+        return "http_403"
+    if "timeout" in msg.lower():
+        return "timeout"
+    return "selector" if isinstance(exc, RuntimeError) else "exception"
+
+
+# Runlog counters kept per run (and summed across shards)
+RUN_COUNTERS = (
+    "total", "success", "fail", "http_calls", "err_429", "err_403", "err_timeout", "err_selector",
+    "price_changes", "stock_changes", "cache_hits", "circuit_skips", "fingerprint_skips", "dedup_hits",
+    "deferred",
+)
+
+
+def shard_of(url: str, shards: int) -> int:
+    """Stable shard of a product: by domain, so a shop's rate limit stays in one shard."""
+    return _domain_shard(domain_of(url), shards)
+
+
+def _domain_shard(domain: str, shards: int) -> int:
+    if shards <= 1:
+        return 0
+    return zlib.crc32(domain.encode("utf-8")) % shards
 
-    start_ts = datetime.now().timestamp()
 
+# Pipeline stages: catalogue positions (shard, schedule) -> entries (rule resolve) -> fetched -> extracted
+# -> change rows
+
+def _positions(catalogue: Catalogue, shard: Optional[Tuple[int, int]] = None,
+               done: Optional[Any] = None) -> Sequence[int]:
+    """Catalogue positions this run checks: those of ``shard``, minus ``(row, product_id)`` pairs in ``done``."""
+    if shard is None and not done:
+        return range(len(catalogue))
+    positions = range(len(catalogue))
+    if shard is not None:
+        shard_by_domain: Dict[str, int] = {}
+        domains = catalogue.domains
+        for domain in set(domains):
+            shard_by_domain[domain] = _domain_shard(domain, shard[1])
+        positions = [pos for pos in positions if shard_by_domain[domains[pos]] == shard[0]]
+    if done:
+        rows, ids = catalogue.rows, catalogue.product_ids
+        positions = [pos for pos in positions if (rows[pos], ids[pos]) not in done]
+    return positions
+
+
+def _resolve_stage(catalogue: Catalogue, positions: Iterable[int], rules_map: RuleIndex,
+                   metrics: RunMetrics) -> Iterator[Dict[str, Any]]:
+    lookup_ms = 0.0
     try:
-        existing_changes = ws_changes.get_all_values()
-    except Exception:
-        existing_changes = []
-    start_row_index = len(existing_changes) + 1
-    current_row_index = start_row_index
-
-    for r in range(START_ROW - 1, total_rows):
-        row = product_rows[r]
-        product_id = row[COL_E_ID - 1].strip() if len(row) >= COL_E_ID else ""
-        product_name = row[COL_F_NAME - 1].strip() if len(row) >= COL_F_NAME else ""
-        prev_price_str = row[COL_I_PREV - 1].strip() if len(row) >= COL_I_PREV else ""
-        prev_seller = row[COL_J_SELLER - 1].strip() if len(row) >= COL_J_SELLER else ""
-        url = row[COL_K_URL - 1].strip() if len(row) >= COL_K_URL else ""
-        if not (product_id or product_name or url):
-            continue
-        total += 1
-        if not url:
-            sheets_writer.append_change_row(
-                sc,
-                timestamp=parsers.current_time_str(),
-                product_id=product_id,
-                product_name=product_name,
-                seller=prev_seller,
-                url="",
-                prev_price=parsers.to_int_price(prev_price_str),
-                curr_price=None,
-                ship_cost=None,
-                diff_str="",
-                change_type="",
-                prev_stock="InStock",
-                curr_stock="OutOfStock",
-                memo="URL 없음/접속불가",
-            )
-            if prev_price_str:
-                stock_changes += 1
-            success += 1
+        for pos in positions:
+            entry = catalogue.entry(pos)
+            t0 = time.perf_counter()
+            entry["rule"] = select_rule(rules_map, entry["url"]) if entry["url"] else rules_map.default
+            lookup_ms += time.perf_counter() - t0
+            yield entry
+    finally:
+        metrics.add_stage("rule_lookup", lookup_ms * 1000.0)
+
+
+def _dedup_stage(entries: Iterable[Dict[str, Any]], redirects: Optional[RedirectMemo] = None,
+                 memo_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Mark rows whose page is already being checked this run as followers of that row.
+
+    Rows are grouped by canonical URL (through the redirect memo) and the
+    rule's selectors, so rows are only shared when they extract the same way.
+    The first row of a group - the leader - is fetched and extracted;
+    followers get ``entry["leader"]``, skip the fetch and reuse the
+    leader's outcome in the extract stage. The last ``memo_size`` distinct
+    pages are remembered, so memory stays flat on large sheets.
+    """
+    size = settings.DEDUP_MEMO_SIZE if memo_size is None else memo_size
+    leaders: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+    rule_keys: Dict[int, str] = {}
+    for entry in entries:
+        if entry["url"]:
+            canonical = entry["canonical"] = rule_canonical(entry["url"], entry["rule"])
+            page = entry["page"] = redirects.resolve(canonical) if redirects is not None else canonical
+            rule_key = rule_keys.get(id(entry["rule"]))
+            if rule_key is None:
+                rule_key = rule_keys[id(entry["rule"])] = selector_key(entry["rule"])
+            key = (page, rule_key)
+            leader = leaders.get(key)
+            if leader is None:
+                leaders[key] = entry
+                if len(leaders) > size:
+                    leaders.popitem(last=False)
+            else:
+                leaders.move_to_end(key)
+                entry["leader"] = leader
+        yield entry
+
+
+def _extract_stage(fetched: Iterable[Tuple[Dict[str, Any], Any, Optional[BaseException]]], extractor: Extractor,
+                   cache: Optional[ResponseCache] = None, fingerprints: Optional[FingerprintStore] = None,
+                   redirects: Optional[RedirectMemo] = None, archive: Optional[PageArchive] = None,
+                   batch_id: str = ""
+                   ) -> Iterator[Tuple[Dict[str, Any], Any, Optional[BaseException]]]:
+    """Extract fetched pages, hand followers their leader's outcome and archive the pages.
+
+    Cache hits are archived from the cached body; checked rows without a
+    page are recorded as missing from the archive.
+    """
+    for entry, result, error in fetched:
+        leader = entry.get("leader")
+        if leader is not None:
+            # the leader came through first (outcomes are in row order)
+            result, error = leader["outcome"]
+            if leader.get("deferred"):
+                entry["deferred"] = True
+            if result is not None:
+                result = {key: value for key, value in result.items() if key != "unchanged"}
+            if archive is not None:
+                _archive_row(archive, batch_id, entry, leader.get("archived"), result, error)
+            yield entry, result, error
             continue
+        if error is None and result is not None:
+            if redirects is not None and result.get("cache") == "" and "canonical" in entry:
+                final_url = entry["trace"].get("final_url")
+                target = rule_canonical(final_url, entry["rule"]) if final_url else entry["canonical"]
+                if target != entry["page"]:
+                    redirects.put(entry["canonical"], target)
+            body = result.get("html") or result.get("body")
+            try:
+                result = _extract(entry, result, extractor, cache, fingerprints)
+            except Exception as exc:
+                result, error = None, exc
+            if archive is not None and body:
+                entry["archived"] = archive.put_body(body)
+        if archive is not None:
+            _archive_row(archive, batch_id, entry, entry.get("archived"), result, error)
+        if "page" in entry:
+            entry["outcome"] = (result, error)
+        yield entry, result, error
+
 
-        rule = select_rule(rules_map, url)
+def _archive_row(archive: PageArchive, batch_id: str, entry: Dict[str, Any], digest: Optional[str],
+                 result: Optional[Dict[str, Any]], error: Optional[BaseException]) -> None:
+    if entry.get("deferred"):
+        return
+    if digest:
+        archive.add_page(batch_id, entry, digest, result)
+    elif not entry["url"]:
+        archive.add_missing(batch_id, entry, "no_url")
+    else:
+        archive.add_missing(batch_id, entry, getattr(error, "kind", None) or ("error" if error else "no_page"))
 
-        # Resolve rule fallbacks
-        timeout = rule.get("timeout") or settings.DEFAULT_TIMEOUT
-        retry = rule.get("retry") or settings.DEFAULT_RETRY
-        backoff_ms = rule.get("backoff_ms") or settings.DEFAULT_BACKOFF_MS
-        ua = rule.get("ua") or settings.DEFAULT_HEADERS.get("User-Agent")
-        gap_ms = rule.get("gap_ms") or 0
 
-        if gap_ms > 0:
-            parsers.sleep_ms(gap_ms)
+def _failure_row(entry: Dict[str, Any], memo: str) -> Dict[str, Any]:
+    return dict(
+        row=entry["row"],
+        timestamp=parsers.current_time_str(),
+        product_id=entry["product_id"],
+        product_name=entry["product_name"],
+        seller=entry["prev_seller"],
+        url=entry["url"],
+        prev_price=entry["prev_price"],
+        curr_price=None,
+        ship_cost=None,
+        diff_str="",
+        change_type="",
+        prev_stock="InStock",
+        curr_stock="OutOfStock",
+        memo=memo,
+    )
 
+
+def compare_extracted(entry: Dict[str, Any], extracted: Dict[str, Any], counts: Dict[str, int]
+             ) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """Diff extracted values against the sheet's previous price; returns ``(change fields or None, changed)``."""
+    rule = entry["rule"]
+    change = None
+    price_val = extracted["price_val"]
+    ship_text = extracted["ship_text"]
+    ship_val = extracted["ship_val"]
+    curr_stock = extracted["curr_stock"]
+    prev_price_val = entry["prev_price"]
+    effective_ship = ship_val if ship_val is not None else 0
+    curr_total = (price_val if price_val is not None else 0) + effective_ship
+
+    price_changed = False
+    change_type = ""
+    diff_str = ""
+    if prev_price_val is not None and price_val is not None:
+        diff = curr_total - prev_price_val
+        threshold = rule.spread or settings.DEFAULT_SPREAD_DIFF
+        if abs(diff) >= threshold:
+            price_changed = True
+            change_type = "가격상승" if diff > 0 else "가격하락"
+            diff_str = f"{diff:+d}"
+    elif price_val is None:
+        change_type = "품절"
+
+    stock_changed = False
+    if prev_price_val is not None:
+        if curr_stock == "OutOfStock":
+            stock_changed = True
+            change_type = (change_type + ", " if change_type else "") + "입고→품절"
+
+    if price_changed or stock_changed or price_val is None:
+        memo_parts = []
+        if price_val is None:
+            memo_parts.append("가격파싱실패")
+        if ship_text is None:
+            memo_parts.append("배송비추출실패")
+        memo = "; ".join(memo_parts)
+        change = dict(
+            row=entry["row"],
+            timestamp=parsers.current_time_str(),
+            product_id=entry["product_id"],
+            product_name=entry["product_name"],
+            seller=rule.shop or entry["prev_seller"],
+            url=entry["url"],
+            prev_price=prev_price_val,
+            curr_price=price_val,
+            ship_cost=ship_val,
+            diff_str=diff_str,
+            change_type=change_type,
+            prev_stock="InStock",
+            curr_stock=curr_stock,
+            memo=memo,
+        )
+        if price_changed:
+            counts["price_changes"] += 1
+        if stock_changed or price_val is None:
+            counts["stock_changes"] += 1
+    return change, price_changed or stock_changed
+
+
+def _diff_stage(outcomes: Iterable[Tuple[Dict[str, Any], Any, Optional[BaseException]]], counts: Dict[str, int],
+                metrics: RunMetrics, history: Optional[HistoryStore] = None,
+                checked: Optional[List[Tuple[Dict[str, Any], bool, Optional[str]]]] = None,
+                deferred: Optional[List[int]] = None,
+                done: Optional[Callable[[Dict[str, Any]], None]] = None) -> Iterator[Dict[str, Any]]:
+    """Compare each outcome with the sheet's previous values; yields change-row fields.
+
+    ``counts`` is updated in place with the runlog counters; ``checked``
+    (incremental and time-budgeted runs) collects ``(entry, changed, error)``.
+    Rows the time budget left unfetched are appended to ``deferred``.
+    ``done(entry)`` is called once a row is finished, after its change row
+    (if any) has been handed to the consumer.
+    """
+    for entry, extracted, error in outcomes:
+        if entry.get("deferred"):
+            if deferred is not None:
+                deferred.append(entry["row"])
+            continue
+        prev_price_str = entry["prev_price_str"]
+        url = entry["url"]
+        counts["total"] += 1
+        if not url:
+            yield _failure_row(entry, "URL 없음/접속불가")
+            if prev_price_str:
+                counts["stock_changes"] += 1
+            if history is not None:
+                history.add(entry["product_id"], "", datetime.now().timestamp(), None, None, None, "no_url", None)
+            counts["success"] += 1
+            if done is not None:
+                done(entry)
+            continue
+
+        follower = entry.get("leader") is not None
+        if follower:
+            # no request of its own: the leader's fetch is already in the metrics
+            counts["dedup_hits"] += 1
+        else:
+            metrics.record(
+                entry["domain"], entry.get("elapsed_ms"), entry.get("trace"),
+                error_kind=_error_kind(error) if error is not None else None,
+                cached=error is None and extracted is not None and extracted["cache"] == "fresh",
+            )
         try:
-            html, status_code = parsers.http_get(url=url, ua=ua, timeout=timeout, retry=retry, backoff_ms=backoff_ms)
-            http_calls += 1
-            soup = BeautifulSoup(html, "html.parser")
-
-            price_val = parsers.extract_price_with_coupon(soup, rule.get("coupon_css", []), rule.get("price_css", []))
-            ship_text, ship_val = parsers.extract_shipping_cost(soup, rule.get("ship_css", []))
-            stock_text = parsers.extract_text(soup, rule.get("stock_css", []))
-            curr_stock = parsers.determine_stock(price_val, stock_text)
-            prev_price_val = parsers.to_int_price(prev_price_str) if prev_price_str else None
-            effective_ship = ship_val if ship_val is not None else 0
-            curr_total = (price_val if price_val is not None else 0) + effective_ship
-
-            price_changed = False
-            change_type = ""
-            diff_str = ""
-            if prev_price_val is not None and price_val is not None:
-                diff = curr_total - prev_price_val
-                threshold = rule.get("spread") or settings.DEFAULT_SPREAD_DIFF
-                if abs(diff) >= threshold:
-                    price_changed = True
-                    change_type = "가격상승" if diff > 0 else "가격하락"
-                    diff_str = f"{diff:+d}"
-            elif price_val is None:
-                change_type = "품절"
-
-            stock_changed = False
-            if prev_price_val is not None:
-                if curr_stock == "OutOfStock":
-                    stock_changed = True
-                    change_type = (change_type + ", " if change_type else "") + "입고→품절"
-
-            if price_changed or stock_changed or price_val is None:
-                memo_parts = []
-                if price_val is None:
-                    memo_parts.append("가격파싱실패")
-                if ship_text is None:
-                    memo_parts.append("배송비추출실패")
-                memo = "; ".join(memo_parts)
-                sheets_writer.append_change_row(
-                    sc,
-                    timestamp=parsers.current_time_str(),
-                    product_id=product_id,
-                    product_name=product_name,
-                    seller=rule.get("shop", prev_seller),
-                    url=url,
-                    prev_price=prev_price_val,
-                    curr_price=price_val,
-                    ship_cost=ship_val,
-                    diff_str=diff_str,
-                    change_type=change_type,
-                    prev_stock="InStock",
-                    curr_stock=curr_stock,
-                    memo=memo,
-                )
-                try:
-                    if diff_str:
-                        cell_a1 = f"I{current_row_index}"
-                        if diff_str.startswith("-"):
-                            ws_changes.format(cell_a1, {"textFormat": {"bold": True, "foregroundColor": {"red": 0.0, "green": 0.0, "blue": 1.0}}})
-                        elif diff_str.startswith("+"):
-                            ws_changes.format(cell_a1, {"textFormat": {"bold": True, "foregroundColor": {"red": 1.0, "green": 0.0, "blue": 0.0}}})
-                except Exception:
-                    # Formatting may not be supported; ignore
-                    pass
-
-                if price_changed:
-                    price_changes += 1
-                if stock_changed or price_val is None:
-                    stock_changes += 1
-                current_row_index += 1
-            success += 1
+            if error is not None:
+                raise error
+            if not follower and extracted["cache"] != "fresh":
+                counts["http_calls"] += 1
+            if not follower and extracted["cache"]:
+                counts["cache_hits"] += 1
+
+            if extracted.get("unchanged"):
+                # same page and same sheet price as at the last check: nothing new to report
+                counts["fingerprint_skips"] += 1
+                changed = False
+            else:
+                change, changed = compare_extracted(entry, extracted, counts)
+                if change is not None:
+                    yield change
+            if checked is not None:
+                checked.append((entry, changed, None))
+            counts["success"] += 1
         except RuntimeError as e:
             err_msg = str(e)
-            if "429" in err_msg:
-                err_429 += 1
-            elif "403" in err_msg:
-                err_403 += 1
-            elif "timeout" in err_msg.lower():
-                err_timeout += 1
-            else:
-                err_selector += 1
-            sheets_writer.append_change_row(
-                sc,
-                timestamp=parsers.current_time_str(),
-                product_id=product_id,
-                product_name=product_name,
-                seller=prev_seller,
-                url=url,
-                prev_price=parsers.to_int_price(prev_price_str),
-                curr_price=None,
-                ship_cost=None,
-                diff_str="",
-                change_type="",
-                prev_stock="InStock",
-                curr_stock="OutOfStock",
-                memo=f"접속오류:{err_msg}",
-            )
-            fail += 1
+            kind = _error_kind(e)
+            if kind == "http_429":
+                counts["err_429"] += 1
+            elif kind == "http_403":
+                counts["err_403"] += 1
+            elif kind == "timeout":
+                counts["err_timeout"] += 1
+            elif kind == "circuit_open":
+                counts["circuit_skips"] += 1
+            elif kind != "backend_unavailable":
+                # a missing fetch library is not the page's fault; the memo names it
+                counts["err_selector"] += 1
+            yield _failure_row(entry, f"접속오류:{err_msg}")
+            counts["fail"] += 1
+            if checked is not None:
+                checked.append((entry, False, err_msg))
         except Exception as e:
-            sheets_writer.append_change_row(
-                sc,
-                timestamp=parsers.current_time_str(),
-                product_id=product_id,
-                product_name=product_name,
-                seller=prev_seller,
-                url=url,
-                prev_price=parsers.to_int_price(prev_price_str),
-                curr_price=None,
-                ship_cost=None,
-                diff_str="",
-                change_type="",
-                prev_stock="InStock",
-                curr_stock="OutOfStock",
-                memo=f"예외:{e}",
+            yield _failure_row(entry, f"예외:{e}")
+            counts["fail"] += 1
+            if checked is not None:
+                checked.append((entry, False, f"예외:{e}"))
+
+        if history is not None:
+            ok = error is None and extracted is not None
+            history.add(
+                entry["product_id"], url, datetime.now().timestamp(),
+                extracted["price_val"] if ok else None,
+                extracted["ship_val"] if ok else None,
+                extracted["curr_stock"] if ok else None,
+                "ok" if ok else "error",
+                entry.get("elapsed_ms"),
             )
-            fail += 1
+        if done is not None:
+            done(entry)
 
-    end_ts = datetime.now().timestamp()
-    duration_s = round(end_ts - start_ts, 2)
-    runlog_entry = {
-        "batch_id": datetime.now().astimezone(parsers.KST).strftime("%Y%m%d-%H%M%S"),
+
+def _product_keys(catalogue: Catalogue, positions: Sequence[int]) -> Tuple[List[int], List[str]]:
+    """Positions that have a URL and their state-store keys."""
+    urls, ids = catalogue.urls, catalogue.product_ids
+    with_url = [pos for pos in positions if urls[pos]]
+    return with_url, [product_key(ids[pos], urls[pos]) for pos in with_url]
+
+
+def _select_incremental(catalogue: Catalogue, positions: Sequence[int], state_store: ProductStateStore,
+                        budget: Optional[int]) -> Tuple[List[int], Dict[str, Any], Tuple[int, int, int]]:
+    """Keep the due positions; returns ``(positions, states, (picked, candidates, due))``."""
+    with_url, keys = _product_keys(catalogue, positions)
+    states = state_store.load(keys)
+    run_budget = budget if budget is not None else settings.RUN_BUDGET
+    picked, due_count = select_due(keys, states, budget=run_budget)
+    selected = {with_url[i] for i in picked}
+    # rows without a URL cost no fetch and are always reported
+    urls = catalogue.urls
+    positions = [pos for pos in positions if not urls[pos] or pos in selected]
+    return positions, states, (len(picked), len(keys), due_count)
+
+
+def _prioritize(catalogue: Catalogue, positions: Sequence[int], state_store: ProductStateStore,
+                states: Optional[Dict[str, Any]] = None) -> Tuple[List[int], Dict[str, Any]]:
+    """Order positions most overdue first; returns ``(positions, states)``.
+
+    Rows without a URL cost nothing and go first.
+    """
+    with_url, keys = _product_keys(catalogue, positions)
+    if states is None:
+        states = state_store.load(keys)
+    urls = catalogue.urls
+    ordered = [pos for pos in positions if not urls[pos]] + [with_url[i] for i in priority_order(keys, states)]
+    return ordered, states
+
+
+class _TimeBudget:
+    """Wall-clock budget of a run: no product is started once it has run out.
+
+    ``take`` stops handing entries to the fetch stage and lists the rest in
+    ``deferred``; ``guard`` makes a fetch still queued at the deadline
+    return nothing and marks its entry ``deferred`` for the diff stage.
+    """
+
+    __slots__ = ("deadline", "deferred")
+
+    def __init__(self, seconds: float):
+        self.deadline = time.monotonic() + seconds
+        self.deferred: List[int] = []
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def take(self, entries: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        entries = iter(entries)
+        for entry in entries:
+            if self.expired():
+                self.deferred.append(entry["row"])
+                self.deferred.extend(rest["row"] for rest in entries)
+                return
+            yield entry
+
+    def guard(self, func: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+        def run(entry: Dict[str, Any]):
+            if self.expired():
+                entry["deferred"] = True
+                return None
+            return func(entry)
+        return run
+
+
+def new_batch_id() -> str:
+    return datetime.now().astimezone(parsers.KST).strftime("%Y%m%d-%H%M%S")
+
+
+def build_runlog_entry(batch_id: str, start_ts: float, end_ts: float, counts: Dict[str, int],
+                       metrics: RunMetrics, conn: Tuple[int, int],
+                       incremental: Optional[Tuple[int, int, int]] = None) -> Dict[str, Any]:
+    """Runlog fields for a batch, keeping the raw counters so shard entries can be merged."""
+    memo = (f"가격변동:{counts['price_changes']} / 재고변동:{counts['stock_changes']}"
+            f" / 연결재사용:{conn[0]}/{conn[1]} / 캐시재사용:{counts['cache_hits']}"
+            f" / 차단건너뜀:{counts['circuit_skips']}")
+    if counts["fingerprint_skips"]:
+        rate = counts["fingerprint_skips"] / max(1, counts["http_calls"])
+        memo += f" / 지문건너뜀:{counts['fingerprint_skips']}/{counts['http_calls']}({rate:.0%})"
+    if counts["dedup_hits"]:
+        rate = counts["dedup_hits"] / max(1, counts["total"])
+        memo += f" / 중복제거:{counts['dedup_hits']}/{counts['total']}({rate:.0%})"
+    if counts["deferred"]:
+        memo += f" / 시간초과보류:{counts['deferred']}"
+    if incremental is not None:
+        memo += f" / 증분:{incremental[0]}/{incremental[1]}(대상{incremental[2]})"
+    return {
+        "batch_id": batch_id,
         "start_time": datetime.fromtimestamp(start_ts, tz=parsers.KST).strftime("%Y-%m-%d %H:%M:%S"),
         "end_time": datetime.fromtimestamp(end_ts, tz=parsers.KST).strftime("%Y-%m-%d %H:%M:%S"),
-        "duration": duration_s,
-        "total": total,
-        "success": success,
-        "fail": fail,
-        "http_calls": http_calls,
-        "avg_response_ms": "",
-        "err_429": err_429,
-        "err_403": err_403,
-        "err_timeout": err_timeout,
-        "err_selector": err_selector,
-        "domain_summary": "",
-        "memo": f"가격변동:{price_changes} / 재고변동:{stock_changes}",
+        "duration": round(end_ts - start_ts, 2),
+        "total": counts["total"],
+        "success": counts["success"],
+        "fail": counts["fail"],
+        "http_calls": counts["http_calls"],
+        "avg_response_ms": metrics.avg_response_ms() or "",
+        "err_429": counts["err_429"],
+        "err_403": counts["err_403"],
+        "err_timeout": counts["err_timeout"],
+        "err_selector": counts["err_selector"],
+        "domain_summary": metrics.domain_summary(),
+        "memo": memo,
+        # not written to the sheet
+        "start_ts": start_ts,
+        "end_ts": end_ts,
+        "counts": dict(counts),
+        "conn": list(conn),
+        "incremental": list(incremental) if incremental is not None else None,
     }
-    sheets_writer.append_runlog(sc, runlog_entry)
 
+
+def close_batch(sink: Any, runlog_entry: Dict[str, Any], metrics: RunMetrics,
+                storage: Optional[Storage] = None) -> None:
+    """Write the runlog row and the blank separator row, close the sink and export metrics."""
+    sink.add_runlog(runlog_entry)
+    header_row = storage.change_header() if storage is not None else []
+    num_cols = len(header_row) if header_row else 14
+    sink.add_row(["" for _ in range(num_cols)])
+    sink.close()
+    write_ms = getattr(sink, "write_ms", None)
+    if write_ms is not None:
+        metrics.add_stage("sheet_write", write_ms)
     try:
-        header_row = ws_changes.get('A1:1')[0] if ws_changes.get('A1:1') else []
-        num_cols = len(header_row) if header_row else 14
-        blank_row = ["" for _ in range(num_cols)]
-        ws_changes.append_row(blank_row, value_input_option="USER_ENTERED")
-    except Exception:
+        metrics.write_json(runlog_entry["batch_id"], extra={
+            key: runlog_entry[key] for key in ("start_time", "end_time", "duration", "total", "success", "fail",
+                                               "http_calls")
+        })
+    except OSError:
         pass
 
 
+class RunResources:
+    """The long-lived parts of a run: storage, rules, cache, rate limiter, browser, extractor, fingerprints.
+
+    ``run_once`` builds a set per call and closes it afterwards; a daemon
+    keeps one open so credentials, compiled rules, learned rates, pooled
+    connections and the browser stay warm between runs. Rules are only
+    re-parsed when the storage's ``settings_revision()`` changes; a storage
+    without a revision (None) is re-parsed every run.
+    """
+
+    def __init__(self, storage: Optional[Storage] = None):
+        self._own_storage = storage is None
+        self.storage = storage if storage is not None else get_storage()
+        self.cache = ResponseCache() if settings.RESPONSE_CACHE_ENABLED else None
+        self.limiter = AdaptiveRateLimiter() if settings.RATE_LIMIT_ENABLED else None
+        # Chromium is only launched when the first render rule is fetched
+        self.browser = BrowserPool()
+        self.extractor = Extractor()
+        self.fingerprints = FingerprintStore()
+        self.redirects = RedirectMemo() if settings.DEDUP_ENABLED else None
+        self.archive = PageArchive() if settings.ARCHIVE_ENABLED else None
+        self.rules_loads = 0
+        self.last_metrics: Optional[RunMetrics] = None
+        self._rules: Optional[RuleIndex] = None
+        self._revision: Optional[str] = None
+
+    def rules(self) -> RuleIndex:
+        revision = self.storage.settings_revision()
+        if self._rules is None or revision is None or revision != self._revision:
+            self._rules, _header = load_rules_from_rows(self.storage.settings_rows())
+            self._revision = revision
+            self.rules_loads += 1
+        return self._rules
+
+    def checkpoint(self) -> None:
+        """Persist what was learned during a run (rates, fingerprints, redirects, archived pages)."""
+        self.fingerprints.flush()
+        if self.archive is not None:
+            self.archive.flush()
+        if self.redirects is not None:
+            self.redirects.flush()
+        if self.limiter is not None:
+            self.limiter.save()
+
+    def close(self) -> None:
+        self.checkpoint()
+        self.browser.close()
+        self.fingerprints.close()
+        if self.redirects is not None:
+            self.redirects.close()
+        if self.archive is not None:
+            self.archive.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.limiter is not None:
+            self.limiter.close()
+        if self._own_storage:
+            self.storage.close()
+
+
+def run_once(incremental: bool = False, budget: Optional[int] = None, source: Optional[Any] = None,
+             sink: Optional[Any] = None, storage: Optional[Storage] = None,
+             shard: Optional[Tuple[int, int]] = None, batch_id: Optional[str] = None,
+             resources: Optional[RunResources] = None, time_budget: Optional[float] = None,
+             resume: bool = True) -> Dict[str, Any]:
+    """Check every product once, or with ``incremental`` only those that are due.
+
+    ``budget`` caps the number of fetched products in an incremental run
+    (defaults to ``settings.RUN_BUDGET``; 0 means unlimited).
+
+    The product rows are first read into a compact ``Catalogue`` (only the
+    used columns, prices parsed once) that the shard filter, the scheduler
+    and the later stages share. The run is then a chain of stages
+    connected by bounded queues - rule resolve, fetch (concurrent),
+    extract, diff and sink - so a slow fetch does not hold up parsing and
+    a slow sheet write does not hold up fetching. ``source`` (an
+    object with ``rows()``) and ``sink`` (``add_change``/``add_row``/
+    ``add_runlog``/``close``) default to the product list and change log of
+    ``storage`` (``settings.STORAGE_BACKEND`` when not given), which also
+    supplies the settings rows.
+
+    With ``shard=(index, count)`` only the rows whose domain hashes to
+    ``index`` are checked and the run is left open for
+    ``jobs.shards.merge_results``: no separator row or metrics file is
+    written and the runlog entry carries the raw metrics.
+
+    ``resources`` (a ``RunResources`` kept open by the caller) replaces
+    ``storage`` and is left open; otherwise a set is built and closed for
+    this run.
+
+    Runs writing to the storage's own change log are journaled
+    (``jobs.journal``, ``JOURNAL_ENABLED``): a batch that was interrupted
+    is resumed by the next run - same batch id, counters carried over, rows
+    already done skipped, change rows not yet written re-sent - unless
+    ``resume`` is false, which discards it. ``time_budget`` (minutes;
+    ``RUN_TIME_BUDGET_MIN`` when not given, 0 = none) checks the products
+    most overdue first and stops taking new ones when the time is up; the
+    rest are counted as deferred. Returns the runlog entry.
+    """
+    if resources is not None:
+        entry = _run_batch(resources, False, incremental, budget, source, sink, shard, batch_id, time_budget,
+                           resume)
+        resources.checkpoint()
+        return entry
+    resources = RunResources(storage)
+    try:
+        entry = _run_batch(resources, True, incremental, budget, source, sink, shard, batch_id, time_budget,
+                           resume)
+    except BaseException:
+        # flush what the run learned and release the databases, pack file and browser it opened
+        try:
+            resources.close()
+        except Exception:
+            pass
+        raise
+    resources.close()
+    return entry
+
+
+def _run_batch(resources: RunResources, own_resources: bool, incremental: bool, budget: Optional[int],
+               source: Optional[Any], sink: Optional[Any], shard: Optional[Tuple[int, int]],
+               batch_id: Optional[str], time_budget: Optional[float], resume: bool) -> Dict[str, Any]:
+    """The body of ``run_once``; the caller checkpoints or closes ``resources`` afterwards."""
+    storage = resources.storage
+    rules_map = resources.rules()
+
+    if source is None:
+        source = storage.product_source(START_ROW)
+
+    journaled = settings.JOURNAL_ENABLED and shard is None and sink is None
+    # a journaled run's sink only writes at journal checkpoints, so the journal knows what reached the log
+    sink = ThreadedSink(sink if sink is not None else storage.change_sink(auto_flush=not journaled))
+
+    counts = dict.fromkeys(RUN_COUNTERS, 0)
+    metrics = RunMetrics()
+    start_ts = datetime.now().timestamp()
+    journal = resumed = None
+    if journaled:
+        journal = RunJournal(storage.name)
+        resumed = journal.unfinished(batch_id)
+        if resumed is not None and not resume:
+            journal.discard(resumed.batch_id)
+            resumed = None
+    if resumed is not None:
+        batch_id, start_ts = resumed.batch_id, resumed.started_at
+        counts.update(resumed.counts)
+        for change in resumed.unwritten:
+            sink.add_change(**change)
+    batch_id = batch_id or new_batch_id()
+    if journal is not None:
+        journal.begin(batch_id, start_ts)
+
+    conn_before = get_session_pool().stats()
+
+    time_budget = time_budget if time_budget is not None else settings.RUN_TIME_BUDGET_MIN
+    clock = _TimeBudget(time_budget * 60.0) if time_budget else None
+    t0 = time.perf_counter()
+    catalogue = load_catalogue(source)
+    metrics.add_stage("catalogue_load", (time.perf_counter() - t0) * 1000.0)
+    positions = _positions(catalogue, shard, resumed.done if resumed is not None else None)
+    state_store = states = checked = incremental_info = None
+    if incremental or clock is not None:
+        state_store = ProductStateStore()
+        checked = []
+    if incremental:
+        if shard is not None:
+            # the fetch budget is for the whole batch: split it across shards
+            run_budget = budget if budget is not None else settings.RUN_BUDGET
+            budget = -(-run_budget // shard[1]) if run_budget else 0
+        positions, states, incremental_info = _select_incremental(catalogue, positions, state_store, budget)
+    if clock is not None:
+        positions, states = _prioritize(catalogue, positions, state_store, states)
+    entries = _resolve_stage(catalogue, positions, rules_map, metrics)
+    if clock is not None:
+        entries = clock.take(entries)
+    if settings.DEDUP_ENABLED:
+        entries = _dedup_stage(entries, resources.redirects)
+
+    cache, limiter, browser, extractor = resources.cache, resources.limiter, resources.browser, resources.extractor
+    engine = FetchEngine(limiter=limiter)
+    history = HistoryStore() if settings.HISTORY_ENABLED else None
+    fetch = _timed(partial(_fetch, cache=cache, browser=browser, limiter=limiter, extractor=extractor))
+    fetched = engine.run(
+        clock.guard(fetch) if clock is not None else fetch,
+        threaded(entries, name="rule-resolve"),
+        domain_fn=lambda e: e["domain"],
+        gap_fn=lambda e: e["rule"].gap_ms or 0,
+        skip_fn=lambda e: "leader" in e,
+    )
+    extracted = threaded(_extract_stage(fetched, extractor, cache, resources.fingerprints, resources.redirects,
+                                        resources.archive, batch_id), name="extract")
+    sent: Dict[int, Dict[str, Any]] = {}
+    journaled_counts = dict(counts)
+
+    def save_states() -> None:
+        # stamped with the run's start, so the next run a scheduler period later sees the whole period
+        for entry, changed, error in checked:
+            states[product_key(entry["product_id"], entry["url"])].record(start_ts, changed, error)
+        state_store.save(states[product_key(e["product_id"], e["url"])] for e, _c, _err in checked)
+        checked.clear()
+
+    def checkpoint() -> None:
+        if history is not None:
+            history.flush(batch_id)
+        if resources.archive is not None:
+            resources.archive.flush()
+        if state_store is not None:
+            save_states()
+        journal.checkpoint(journaled_counts, sink.sync)
+
+    def row_done(entry: Dict[str, Any]) -> None:
+        journal.processed(entry["row"], entry["product_id"], sent.pop(entry["row"], None))
+        journaled_counts.update(counts)
+        if journal.due():
+            checkpoint()
+
+    try:
+        for change in _diff_stage(extracted, counts, metrics, history, checked,
+                                  clock.deferred if clock is not None else None,
+                                  row_done if journal is not None else None):
+            sink.add_change(**change)
+            if journal is not None:
+                sent[change["row"]] = change
+    except BaseException:
+        if journal is not None:
+            # keep what was finished; the next run resumes after it
+            try:
+                checkpoint()
+            except Exception:
+                pass
+            journal.close()
+        if state_store is not None:
+            state_store.close()
+        raise
+    finally:
+        if own_resources:
+            browser.close()
+    if journal is not None:
+        # everything done is in the log before the runlog row; a kill from here on resumes an empty batch
+        checkpoint()
+    if clock is not None:
+        counts["deferred"] = len(clock.deferred)
+
+    end_ts = datetime.now().timestamp()
+    conn_after = get_session_pool().stats()
+    conn = (conn_after["reused"] - conn_before["reused"], conn_after["requests"] - conn_before["requests"])
+    runlog_entry = build_runlog_entry(batch_id, start_ts, end_ts, counts, metrics, conn, incremental_info)
+    if history is not None:
+        segment = batch_id if shard is None else f"{batch_id}-s{shard[0]}"
+        history.flush(segment)
+        history.compact(segment)
+        history.close()
+
+    if resumed is not None:
+        runlog_entry["memo"] += f" / 재개:{len(resumed.done)}"
+    if shard is None:
+        close_batch(sink, runlog_entry, metrics, storage)
+        if resources.archive is not None:
+            resources.archive.prune()
+        if journal is not None:
+            journal.finish(counts, sorted(clock.deferred) if clock is not None else [])
+            journal.close()
+    else:
+        runlog_entry["metrics"] = metrics.dump()
+        sink.add_runlog(runlog_entry)
+        sink.close()
+    resources.last_metrics = metrics
+    if state_store is not None:
+        save_states()
+        state_store.close()
+    return runlog_entry
+
+
 if __name__ == "__main__":
     run_once()
     print("Price tracking run completed.")
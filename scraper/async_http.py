@@ -0,0 +1,294 @@
+"""Asynchronous HTTP/2 fetch backend (httpx).
+
+Rules with ``http_backend = async`` (or ``HTTP_BACKEND=async``) fetch
+through one ``httpx.AsyncClient`` running on a background event loop
+instead of the blocking ``requests`` session: requests to a host share one
+HTTP/2 connection (streams multiplexed) where the shop supports it, and
+no thread waits on the network - ``fetch()`` returns a
+``concurrent.futures.Future`` the fetch engine completes its lane from.
+
+Hostnames are resolved with ``loop.getaddrinfo`` through the same TTL
+cache as the session layer (concurrent lookups of one host share a single
+resolution), and each cached address is tried in turn, as the session
+layer does. The cache sits in the connection pool's network backend, so
+only the TCP connect sees the address: URLs, the ``Host`` header, TLS
+(SNI and certificate checks), connection pooling and redirects all keep
+working on hostnames. Retries, backoff, the User-Agent,
+conditional headers and the rate limiter behave as in
+``parsers.http_get_conditional``.
+
+httpx takes no network backend, so the one of its transport's connection
+pool is replaced; that relies on httpcore internals, which is why
+requirements.txt pins both to the tested minor versions and a transport
+without them fails loudly instead of silently skipping the cache. httpx is
+only imported when the backend is first used; without it every fetch of
+an async rule fails with ``FetchError(kind="backend_unavailable")``.
+"""
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+from concurrent.futures import Future
+from contextvars import ContextVar
+import asyncio
+import ipaddress
+import socket
+import threading
+import time
+
+from project.config.settings import settings
+from project.parsers import _PartialBody, _incremental_decoder
+from project.scraper.engine import domain_of
+from project.scraper.errors import FetchError
+from project.scraper.session import DNS_CACHE_TTL_S, _dns_cache, _dns_lock
+
+BACKENDS = ("requests", "async")
+_BACKEND_ALIASES = {"async": "async", "httpx": "async", "h2": "async", "http2": "async", "asyncio": "async"}
+# trace dict of the request being sent, for the DNS time spent while connecting
+_trace: ContextVar[Optional[Dict[str, Any]]] = ContextVar("async_http_trace", default=None)
+
+
+def backend_name(rule: Any) -> str:
+    """``"async"`` or ``"requests"`` for a rule (``HTTP_BACKEND`` when the rule has none)."""
+    name = (rule.get("http_backend") or settings.HTTP_BACKEND or "").strip().lower()
+    return _BACKEND_ALIASES.get(name, "requests")
+
+
+def _httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise FetchError('httpx is not installed; pip install "httpx[http2]"', kind="backend_unavailable")
+    return httpx
+
+
+def _is_ip(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class _CachedDnsNetworkBackend:
+    """httpcore network backend that connects to hostnames through the shared DNS cache."""
+
+    def __init__(self, backend: Any, resolve: Callable[[str, int], Any]):
+        # ``resolve(host, port)`` is a coroutine returning the host's addresses
+        self._backend = backend
+        self._resolve = resolve
+
+    async def connect_tcp(self, host: str, port: int, timeout: Optional[float] = None,
+                          local_address: Optional[str] = None, socket_options: Any = None) -> Any:
+        addrs = [host]
+        if not _is_ip(host):
+            t0 = time.perf_counter()
+            addrs = await self._resolve(host, port)
+            trace = _trace.get()
+            if trace is not None:
+                trace["dns_ms"] = trace.get("dns_ms", 0.0) + (time.perf_counter() - t0) * 1000.0
+        for addr in addrs[:-1]:
+            try:
+                return await self._backend.connect_tcp(addr, port, timeout=timeout, local_address=local_address,
+                                                       socket_options=socket_options)
+            except Exception:
+                continue
+        return await self._backend.connect_tcp(addrs[-1], port, timeout=timeout, local_address=local_address,
+                                               socket_options=socket_options)
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options: Any = None) -> Any:
+        return await self._backend.connect_unix_socket(path, timeout=timeout, socket_options=socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+class AsyncHttpBackend:
+    def __init__(self, max_connections: Optional[int] = None):
+        httpx = _httpx()
+        try:
+            import h2  # noqa: F401 - httpx needs it for HTTP/2
+            http2 = True
+        except ImportError:
+            http2 = False
+        self.http2 = http2
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-http", daemon=True)
+        self._thread.start()
+        max_connections = max_connections or settings.HTTP_POOL_HOSTS * settings.PER_DOMAIN_CONCURRENCY
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=settings.HTTP_POOL_HOSTS)
+        try:
+            self._client = self._call(self._make_client(httpx, limits))
+        except BaseException:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            raise
+        self._resolving: Dict[Tuple[str, int], "asyncio.Future"] = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._http2_responses = 0
+
+    async def _make_client(self, httpx, limits):
+        transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=limits)
+        # httpx takes no network backend, so wrap the one its connection pool was built with
+        pool = getattr(transport, "_pool", None)
+        if not hasattr(pool, "_network_backend"):
+            raise FetchError(f"httpx {httpx.__version__} is not supported; install the version in requirements.txt",
+                             kind="backend_unavailable")
+        pool._network_backend = _CachedDnsNetworkBackend(pool._network_backend, self.resolve)
+        return httpx.AsyncClient(transport=transport, follow_redirects=True, timeout=None,
+                                 headers={"Connection": "keep-alive"})
+
+    def _call(self, coro) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def resolve(self, host: str, port: int) -> List[str]:
+        """Addresses of ``host`` from the shared DNS cache, resolving it once when missing or stale."""
+        key = (host, port)
+        now = time.monotonic()
+        with _dns_lock:
+            hit = _dns_cache.get(key)
+        if hit is not None and hit[0] > now:
+            return hit[1]
+        pending = self._resolving.get(key)
+        if pending is None:
+            pending = self._resolving[key] = self._loop.create_future()
+            try:
+                infos = await self._loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+                addrs = list(dict.fromkeys(info[4][0] for info in infos))
+                with _dns_lock:
+                    _dns_cache[key] = (time.monotonic() + DNS_CACHE_TTL_S, addrs)
+                pending.set_result(addrs)
+            except Exception as exc:
+                pending.set_exception(exc)
+                # nobody else may be waiting; don't warn about an unretrieved exception
+                pending.exception()
+            finally:
+                self._resolving.pop(key, None)
+        return await asyncio.shield(pending)
+
+    async def _request(self, url: str, headers: Dict[str, str], timeout: float,
+                       trace: Optional[Dict[str, Any]], max_bytes: int,
+                       until: Optional[Callable[[str], bool]]) -> Tuple[int, Mapping[str, str], str]:
+        with self._lock:
+            self._requests += 1
+        t0 = time.perf_counter()
+        _trace.set(trace)
+        request = self._client.build_request("GET", url, headers=headers, timeout=timeout)
+        r = await self._client.send(request, stream=True)
+        t1 = time.perf_counter()
+        try:
+            if r.http_version == "HTTP/2":
+                with self._lock:
+                    self._http2_responses += 1
+            decoder = None
+            body = _PartialBody(max_bytes)
+            stopped = False
+            async for data in r.aiter_bytes():
+                if decoder is None:
+                    decoder = _incremental_decoder(r.charset_encoding, data)
+                if body.add(decoder.decode(body.keep(data)), len(data)) and max_bytes > 0:
+                    stopped = True
+                    break
+                # the check parses HTML: keep it off the event loop
+                if until is not None and body.due():
+                    body.located = await self._loop.run_in_executor(None, until, body.text())
+            if decoder is not None and not stopped:
+                body.parts.append(decoder.decode(b"", final=True))
+        finally:
+            await r.aclose()
+        if trace is not None:
+            trace["ttfb_ms"] = trace.get("ttfb_ms", 0.0) + (t1 - t0) * 1000.0
+            trace["download_ms"] = trace.get("download_ms", 0.0) + (time.perf_counter() - t1) * 1000.0
+            trace["bytes"] = trace.get("bytes", 0) + r.num_bytes_downloaded
+            if body.cut:
+                trace["partial"] = 1
+            if r.history:
+                trace["final_url"] = str(r.url)
+        return r.status_code, r.headers, body.text()
+
+    async def get_conditional(self, url: str, ua: str, timeout: int, retry: int, backoff_ms: int,
+                              etag: Optional[str] = None, last_modified: Optional[str] = None,
+                              trace: Optional[Dict[str, Any]] = None, limiter: Optional[Any] = None,
+                              max_bytes: int = 0, until: Optional[Callable[[str], bool]] = None
+                              ) -> Tuple[str, int, Mapping[str, str]]:
+        """Async twin of ``parsers.http_get_conditional`` (same retries, backoff and limiter feedback)."""
+        httpx = _httpx()
+        last_error = None
+        last_kind = "other"
+        last_status = None
+        headers = dict({"User-Agent": ua} if ua else settings.DEFAULT_HEADERS)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        domain = domain_of(url) if limiter is not None else ""
+        for attempt in range(retry + 1):
+            if attempt and trace is not None:
+                trace["retries"] = trace.get("retries", 0) + 1
+            if limiter is not None:
+                while True:
+                    wait = limiter.try_acquire(domain)
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(min(wait, 1.0))
+            try:
+                status, response_headers, text = await self._request(url, headers, timeout, trace, max_bytes,
+                                                                     until)
+                if status in (403, 429, 503):
+                    last_error = f"HTTP {status}"
+                    last_kind, last_status = f"http_{status}", status
+                    if limiter is not None:
+                        limiter.on_throttle(domain, status, response_headers, backoff_ms)
+                    else:
+                        await asyncio.sleep(backoff_ms * (attempt + 1) / 1000.0)
+                    continue
+                if limiter is not None and (200 <= status < 300 or status == 304):
+                    limiter.on_success(domain)
+                elif limiter is not None:
+                    limiter.on_response(domain)
+                if status == 200:
+                    return text, status, response_headers
+                return "", status, response_headers
+            except Exception as exc:
+                last_error = str(exc) or type(exc).__name__
+                if isinstance(exc, httpx.TimeoutException):
+                    last_kind = "timeout"
+                elif isinstance(exc, httpx.TransportError):
+                    last_kind = "connection"
+                else:
+                    last_kind = "other"
+                last_status = None
+                if limiter is not None:
+                    limiter.on_failure(domain, backoff_ms)
+                else:
+                    await asyncio.sleep(backoff_ms * (attempt + 1) / 1000.0)
+        raise FetchError(f"HTTP GET failed: {last_error}", kind=last_kind, status=last_status)
+
+    def fetch(self, url: str, ua: str, timeout: int, retry: int, backoff_ms: int, **kwargs) -> Future:
+        """Start ``get_conditional`` on the backend's loop; the Future resolves to ``(text, status, headers)``."""
+        return asyncio.run_coroutine_threadsafe(
+            self.get_conditional(url, ua, timeout, retry, backoff_ms, **kwargs), self._loop)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self._requests, "http2": self._http2_responses}
+
+    def close(self) -> None:
+        if self._loop.is_closed():
+            return
+        self._call(self._client.aclose())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+
+
+_backend: Optional[AsyncHttpBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_async_backend() -> AsyncHttpBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = AsyncHttpBackend()
+    return _backend
@@ -1,29 +1,176 @@
-"""Browser-based scraper skeleton (Playwright preferred).
+"""Browser-based scraper (Playwright).
 
-This module provides a thin wrapper that will use Playwright if
-available. Installing and configuring Playwright is outside the scope of
-this skeleton. The implementation is intentionally minimal to avoid a
-hard dependency at this stage.
+``BrowserPool`` keeps one Chromium instance alive for the whole run and
+renders pages on async Playwright in a background event loop, so several
+JS-rendered products load concurrently while callers (the fetch engine's
+worker threads) use a plain blocking ``fetch_html``. A bounded set of pages
+is reused across URLs; images, fonts, media and known trackers are
+blocked, and navigation waits for a rule-specified selector instead of
+``networkidle``.
+
+Playwright remains optional: a RuntimeError is raised when it is missing.
 """
+from typing import Optional
+from urllib.parse import urlparse
+import asyncio
+import threading
+
+from project.config.settings import settings
+from project.scraper.errors import FetchError
+
+BLOCKED_RESOURCE_TYPES = frozenset(("image", "font", "media"))
+TRACKER_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.com", "criteo.com", "criteo.net", "wcs.naver.net",
+    "lcs.naver.com", "analytics.kakao.com", "t1.daumcdn.net", "hotjar.com", "clarity.ms",
+)
+
+_MISSING_PLAYWRIGHT = "Playwright is not installed; install with `pip install playwright` and run `playwright install`"
+
+
+def _is_tracker(url: str) -> bool:
+    host = (urlparse(url).hostname or "").lower()
+    return any(host == t or host.endswith("." + t) for t in TRACKER_HOSTS)
+
+
+class BrowserPool:
+    def __init__(self, size: Optional[int] = None, headless: bool = True):
+        self.size = max(1, size or settings.BROWSER_POOL_SIZE)
+        self.headless = headless
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._pw = None
+        self._browser = None
+        self._context = None
+        self._pages: Optional[asyncio.Queue] = None
+        self._created = 0
+        self._launch_error: Optional[str] = None
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            if self._launch_error is not None:
+                # don't relaunch Chromium for every remaining row of the run
+                raise RuntimeError(self._launch_error)
+            try:
+                from playwright.async_api import async_playwright  # noqa: F401
+            except Exception:
+                raise RuntimeError(_MISSING_PLAYWRIGHT)
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True)
+            thread.start()
+            try:
+                asyncio.run_coroutine_threadsafe(self._launch(), loop).result()
+            except Exception as exc:
+                try:
+                    asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=10)
+                except Exception:
+                    pass
+                self._browser = self._pw = None
+                loop.call_soon_threadsafe(loop.stop)
+                thread.join()
+                self._launch_error = f"browser launch failed: {exc}"
+                raise RuntimeError(self._launch_error) from exc
+            self._loop, self._thread = loop, thread
+
+    async def _launch(self) -> None:
+        from playwright.async_api import async_playwright
+
+        self._pw = await async_playwright().start()
+        self._browser = await self._pw.chromium.launch(headless=self.headless)
+        self._context = await self._browser.new_context(
+            user_agent=settings.DEFAULT_USER_AGENT, locale="ko-KR", service_workers="block",
+        )
+        await self._context.route("**/*", self._route)
+        self._pages = asyncio.Queue()
+
+    async def _route(self, route) -> None:
+        request = route.request
+        if request.resource_type in BLOCKED_RESOURCE_TYPES or _is_tracker(request.url):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _take_page(self):
+        if self._pages.empty() and self._created < self.size:
+            self._created += 1
+            try:
+                return await self._context.new_page()
+            except Exception:
+                self._created -= 1
+                raise
+        return await self._pages.get()
+
+    async def _render(self, url: str, wait_selector: Optional[str], timeout_ms: int) -> str:
+        page = await self._take_page()
+        healthy = False
+        try:
+            await page.goto(url, wait_until="domcontentloaded", timeout=timeout_ms)
+            if wait_selector:
+                await page.wait_for_selector(wait_selector, state="attached", timeout=timeout_ms)
+            else:
+                await page.wait_for_load_state("load", timeout=timeout_ms)
+            html = await page.content()
+            healthy = True
+            return html
+        finally:
+            if healthy:
+                self._pages.put_nowait(page)
+            else:
+                # a page stuck mid-navigation is not reused
+                self._created -= 1
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+
+    def fetch_html(self, url: str, wait_selector: Optional[str] = None, timeout_s: Optional[float] = None) -> str:
+        """Render ``url`` and return its HTML; blocks the calling thread only."""
+        self.start()
+        timeout_ms = int((timeout_s or settings.DEFAULT_TIMEOUT) * 1000)
+        future = asyncio.run_coroutine_threadsafe(self._render(url, wait_selector, timeout_ms), self._loop)
+        try:
+            return future.result()
+        except Exception as exc:
+            kind = "timeout" if "Timeout" in type(exc).__name__ else "render"
+            raise FetchError(f"render failed: {exc}", kind=kind) from exc
+
+    async def _shutdown(self) -> None:
+        if self._browser is not None:
+            await self._browser.close()
+        if self._pw is not None:
+            await self._pw.stop()
+
+    def close(self) -> None:
+        with self._start_lock:
+            if self._loop is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=30)
+            finally:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop = self._thread = None
+                self._browser = self._pw = self._context = self._pages = None
+                self._created = 0
 
 
 class BrowserScraper:
-    def __init__(self, headless: bool = True):
+    def __init__(self, headless: bool = True, pool: Optional[BrowserPool] = None):
         self.headless = headless
+        self.pool = pool
 
-    def fetch_page_html(self, url: str) -> str:
-        """Fetch rendered HTML using Playwright if available.
+    def fetch_page_html(self, url: str, wait_selector: Optional[str] = None) -> str:
+        """Fetch rendered HTML through a (lazily started) browser pool.
 
         Raises RuntimeError if Playwright is not installed.
         """
-        try:
-            from playwright.sync_api import sync_playwright
-        except Exception as e:
-            raise RuntimeError("Playwright is not installed; install with `pip install playwright` and run `playwright install`")
-        with sync_playwright() as pw:
-            browser = pw.chromium.launch(headless=self.headless)
-            page = browser.new_page()
-            page.goto(url, wait_until="networkidle")
-            html = page.content()
-            browser.close()
-            return html
+        if self.pool is None:
+            self.pool = BrowserPool(headless=self.headless)
+        return self.pool.fetch_html(url, wait_selector=wait_selector)
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.close()
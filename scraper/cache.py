@@ -0,0 +1,110 @@
+"""On-disk HTTP response cache for conditional requests.
+
+Entries are keyed by URL and keep the validators (ETag / Last-Modified),
+the compressed body and the values extracted from it. On the next run the
+validators are sent as ``If-None-Match`` / ``If-Modified-Since``; a 304 lets
+the runner reuse the extracted tuple without parsing. The store is a
+single SQLite file bounded by size with least-recently-used eviction.
+"""
+from typing import Any, Dict, Optional
+from pathlib import Path
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from project.config.settings import settings
+
+
+class CacheEntry:
+    __slots__ = ("url", "etag", "last_modified", "body", "extracted", "rule_key", "stored_at")
+
+    def __init__(self, url: str, etag: Optional[str], last_modified: Optional[str], body: str,
+                 extracted: Optional[Dict[str, Any]], rule_key: str, stored_at: float):
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+        self.extracted = extracted
+        self.rule_key = rule_key
+        self.stored_at = stored_at
+
+    def age_s(self, now: Optional[float] = None) -> float:
+        return (now or time.time()) - self.stored_at
+
+
+class ResponseCache:
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = Path(path or settings.RESPONSE_CACHE_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.RESPONSE_CACHE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body BLOB, extracted TEXT,"
+            " rule_key TEXT, stored_at REAL, accessed_at REAL, size INTEGER)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, body, extracted, rule_key, stored_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        etag, last_modified, body, extracted, rule_key, stored_at = row
+        return CacheEntry(
+            url, etag, last_modified, zlib.decompress(body).decode("utf-8") if body else "",
+            json.loads(extracted) if extracted else None, rule_key or "", stored_at,
+        )
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], body: str,
+              extracted: Optional[Dict[str, Any]], rule_key: str) -> None:
+        blob = zlib.compress(body.encode("utf-8"), 6)
+        size = len(blob) + len(url)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, blob, json.dumps(extracted) if extracted is not None else None,
+                 rule_key, now, now, size),
+            )
+            self._total += size - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def touch(self, url: str, extracted: Optional[Dict[str, Any]] = None, rule_key: Optional[str] = None) -> None:
+        """Mark an entry as revalidated (304), optionally refreshing its extracted values."""
+        now = time.time()
+        with self._lock:
+            if extracted is None:
+                self._db.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            else:
+                self._db.execute(
+                    "UPDATE responses SET stored_at = ?, accessed_at = ?, extracted = ?, rule_key = ? WHERE url = ?",
+                    (now, now, json.dumps(extracted), rule_key, url),
+                )
+
+    def _evict(self) -> None:
+        # drop least recently used entries until we are 10% under the bound
+        target = int(self.max_bytes * 0.9)
+        cur = self._db.execute("SELECT url, size FROM responses ORDER BY accessed_at")
+        victims = []
+        for url, size in cur:
+            if self._total <= target:
+                break
+            victims.append((url,))
+            self._total -= size
+        self._db.executemany("DELETE FROM responses WHERE url = ?", victims)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
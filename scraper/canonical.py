@@ -0,0 +1,111 @@
+"""Canonical product URLs for fetch deduplication.
+
+Rows that point at the same page - option variants under different
+관리번호, links copied with tracking parameters, short links that redirect
+to one product - are grouped by their canonical URL so the page is fetched
+and extracted once per run. ``canonical_url`` lowercases scheme and host,
+drops the default port, the fragment and tracking parameters
+(``DEFAULT_DROP_PARAMS`` plus the rule's ``drop_params``, or everything
+not in the rule's ``keep_params`` when that is set) and sorts the rest.
+
+``RedirectMemo`` remembers where a canonical URL redirected to (table
+``url_redirect`` in the state database), so on later runs rows whose URLs
+end up on the same page are grouped before anything is fetched. Entries
+older than ``REDIRECT_MEMO_TTL_S`` are ignored.
+"""
+from typing import Dict, Optional, Sequence, Tuple
+from fnmatch import fnmatchcase
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import sqlite3
+import threading
+import time
+
+from project.config.settings import settings
+
+DEFAULT_DROP_PARAMS = (
+    "utm_*", "fbclid", "gclid", "dclid", "msclkid", "_ga", "_gl", "igshid", "mc_cid", "mc_eid",
+    # Naver / Coupang / Kakao ad and referral tracking
+    "NaPm", "n_media", "n_query", "n_rank", "n_ad_group", "n_ad", "n_keyword_id", "n_keyword",
+    "n_campaign_type", "n_ad_group_type", "n_match", "spm", "trcid", "traceid", "wPcid", "wRef", "wTime",
+    "ref", "referrer", "trcode",
+)
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _matches(name: str, patterns: Sequence[str]) -> bool:
+    lowered = name.lower()
+    return any(fnmatchcase(lowered, pattern.lower()) for pattern in patterns)
+
+
+def canonical_url(url: str, keep_params: Sequence[str] = (), drop_params: Sequence[str] = ()) -> str:
+    """Normalized form of ``url`` used as the dedup key (the URL itself when it does not parse)."""
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    netloc = host if port is None or port == _DEFAULT_PORTS.get(scheme) else f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    query = []
+    for name, value in parse_qsl(parts.query, keep_blank_values=True):
+        if keep_params:
+            if not _matches(name, keep_params):
+                continue
+        elif _matches(name, DEFAULT_DROP_PARAMS) or _matches(name, drop_params):
+            continue
+        query.append((name, value))
+    query.sort()
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+
+def rule_canonical(url: str, rule) -> str:
+    return canonical_url(url, rule.keep_params, rule.drop_params)
+
+
+class RedirectMemo:
+    def __init__(self, path: Optional[str] = None, ttl_s: Optional[float] = None):
+        self.path = Path(path or settings.STATE_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_s = settings.REDIRECT_MEMO_TTL_S if ttl_s is None else ttl_s
+        self._lock = threading.Lock()
+        # shared by parallel shard processes: WAL, and wait for a writer instead of failing
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS url_redirect (canonical TEXT PRIMARY KEY, target TEXT, updated_at REAL)"
+        )
+        self._db.commit()
+        self._pending: Dict[str, Tuple[str, float]] = {}
+
+    def resolve(self, canonical: str) -> str:
+        """Where ``canonical`` last redirected to (itself when unknown or stale)."""
+        # only what was known when the run started, so a run groups its rows consistently
+        with self._lock:
+            row = self._db.execute(
+                "SELECT target, updated_at FROM url_redirect WHERE canonical = ?", (canonical,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_s:
+            return canonical
+        return row[0]
+
+    def put(self, canonical: str, target: str) -> None:
+        """Queue a redirect; written by ``flush``. ``target == canonical`` records "no redirect"."""
+        with self._lock:
+            self._pending[canonical] = (target, time.time())
+
+    def flush(self) -> None:
+        with self._lock:
+            rows = [(key,) + value for key, value in self._pending.items()]
+            self._pending = {}
+            if rows:
+                self._db.executemany("INSERT OR REPLACE INTO url_redirect VALUES (?, ?, ?)", rows)
+                self._db.commit()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._db.close()
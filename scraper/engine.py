@@ -0,0 +1,183 @@
+"""Concurrent per-domain fetch engine.
+
+Rows are fanned out over a thread pool, but each domain keeps its own lane:
+at most ``per_domain_concurrency`` requests are in flight per domain and the
+rule's ``gap_ms`` is observed between one request finishing and the next
+starting. A global cap bounds the total number of in-flight jobs. Results
+are yielded back in submission order so callers can write deterministic
+output.
+
+With an ``AdaptiveRateLimiter`` the lanes are paced by the limiter's
+per-domain token buckets instead (``gap_ms`` then only seeds the rate of a
+domain the limiter has not learned yet).
+
+A job may return a ``concurrent.futures.Future`` (the async HTTP backend
+does): its worker thread is released at once and the job counts as in
+flight until the future resolves.
+"""
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, Optional, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse
+import queue
+import threading
+import time
+
+from project.config.settings import settings
+
+# (item, result, error) - exactly one of result/error is meaningful
+Outcome = Tuple[Any, Any, Optional[BaseException]]
+
+
+def domain_of(url: str) -> str:
+    try:
+        return (urlparse(url).hostname or "").lower()
+    except ValueError:
+        return ""
+
+
+class _Lane:
+    def __init__(self):
+        self.pending: Deque[Tuple[int, Any, int]] = deque()
+        self.active = 0
+        self.next_at = 0.0
+
+
+class FetchEngine:
+    def __init__(self, max_concurrency: Optional[int] = None, per_domain_concurrency: Optional[int] = None,
+                 max_pending: Optional[int] = None, limiter: Optional[Any] = None):
+        self.max_concurrency = max(1, max_concurrency or settings.MAX_CONCURRENCY)
+        self.per_domain_concurrency = max(1, per_domain_concurrency or settings.PER_DOMAIN_CONCURRENCY)
+        # bound on items read ahead of the consumer (reorder buffer size)
+        self.max_pending = max(self.max_concurrency, max_pending or settings.FETCH_MAX_PENDING)
+        self.limiter = limiter
+
+    def run(self, func: Callable[[Any], Any], items: Iterable[Any], domain_fn: Callable[[Any], str],
+            gap_fn: Callable[[Any], int], skip_fn: Optional[Callable[[Any], bool]] = None) -> Iterator[Outcome]:
+        """Run ``func`` over ``items`` and yield outcomes in input order.
+
+        ``items`` is consumed lazily, so it may be a generator fed by a
+        slower upstream stage. Items for which ``skip_fn`` is true bypass
+        the lanes and are yielded in their place with a None result.
+        """
+        cond = threading.Condition()
+        lanes: Dict[str, _Lane] = {}
+        done_q: "queue.Queue[Tuple[int, Any, Any, Optional[BaseException]]]" = queue.Queue()
+        window = threading.Semaphore(self.max_pending)
+        state = {"active": 0, "fed": 0, "feed_done": False, "feed_error": None, "stop": False}
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="fetch")
+        limiter = self.limiter
+
+        def feeder():
+            try:
+                for item in items:
+                    while not window.acquire(timeout=0.5):
+                        if state["stop"]:
+                            return
+                    if state["stop"]:
+                        return
+                    if skip_fn is not None and skip_fn(item):
+                        with cond:
+                            seq = state["fed"]
+                            state["fed"] = seq + 1
+                        done_q.put((seq, item, None, None))
+                        continue
+                    gap = max(0, int(gap_fn(item) or 0))
+                    domain = domain_fn(item)
+                    if limiter is not None:
+                        limiter.seed(domain, gap)
+                    with cond:
+                        seq = state["fed"]
+                        lanes.setdefault(domain, _Lane()).pending.append((seq, item, gap))
+                        state["fed"] = seq + 1
+                        cond.notify_all()
+            except BaseException as exc:  # surfaced to the consumer
+                state["feed_error"] = exc
+            finally:
+                with cond:
+                    state["feed_done"] = True
+                    cond.notify_all()
+                done_q.put((-1, None, None, None))
+
+        def finish(domain: str, lane: _Lane, seq: int, item: Any, gap: int, result: Any,
+                   error: Optional[BaseException]):
+            with cond:
+                lane.active -= 1
+                lane.next_at = time.monotonic() + gap / 1000.0
+                state["active"] -= 1
+                cond.notify_all()
+            done_q.put((seq, item, result, error))
+
+        def execute(domain: str, lane: _Lane, seq: int, item: Any, gap: int):
+            result = error = None
+            try:
+                result = func(item)
+            except Exception as exc:
+                error = exc
+            if isinstance(result, Future):
+                def resolved(future: Future):
+                    value = failure = None
+                    try:
+                        value = future.result()
+                    except BaseException as exc:  # includes cancellation on shutdown
+                        failure = exc
+                    finish(domain, lane, seq, item, gap, value, failure)
+                result.add_done_callback(resolved)
+                return
+            finish(domain, lane, seq, item, gap, result, error)
+
+        def dispatcher():
+            with cond:
+                while not state["stop"]:
+                    now = time.monotonic()
+                    wait_for: Optional[float] = None
+                    launched = False
+                    for domain, lane in lanes.items():
+                        if state["active"] >= self.max_concurrency:
+                            break
+                        if not lane.pending or lane.active >= self.per_domain_concurrency:
+                            continue
+                        delay = limiter.delay(domain) if limiter is not None else lane.next_at - now
+                        if delay > 0:
+                            wait_for = delay if wait_for is None else min(wait_for, delay)
+                            continue
+                        seq, item, gap = lane.pending.popleft()
+                        lane.active += 1
+                        state["active"] += 1
+                        executor.submit(execute, domain, lane, seq, item, gap)
+                        launched = True
+                    if launched:
+                        continue
+                    if state["feed_done"] and state["active"] == 0 and not any(l.pending for l in lanes.values()):
+                        return
+                    cond.wait(timeout=wait_for)
+
+        feed_thread = threading.Thread(target=feeder, name="fetch-feed", daemon=True)
+        dispatch_thread = threading.Thread(target=dispatcher, name="fetch-dispatch", daemon=True)
+        feed_thread.start()
+        dispatch_thread.start()
+
+        buffered: Dict[int, Tuple[Any, Any, Optional[BaseException]]] = {}
+        next_seq = 0
+        try:
+            while True:
+                with cond:
+                    finished = state["feed_done"] and next_seq >= state["fed"]
+                if finished:
+                    break
+                seq, item, result, error = done_q.get()
+                if seq < 0:
+                    continue
+                buffered[seq] = (item, result, error)
+                while next_seq in buffered:
+                    outcome = buffered.pop(next_seq)
+                    next_seq += 1
+                    window.release()
+                    yield outcome
+            if state["feed_error"] is not None:
+                raise state["feed_error"]
+        finally:
+            with cond:
+                state["stop"] = True
+                cond.notify_all()
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,17 @@
+"""Typed fetch errors shared by the HTTP and browser fetch paths."""
+from typing import Optional
+
+
+class FetchError(RuntimeError):
+    """A fetch that failed after retries.
+
+    ``kind`` is a stable category for metrics and the runlog: ``http_403``,
+    ``http_429``, ``http_503``, ``timeout``, ``connection``, ``render``,
+    ``circuit_open``, ``backend_unavailable`` (the rule's fetch backend is not
+    installed) or ``other``.
+    """
+
+    def __init__(self, message: str, kind: str = "other", status: Optional[int] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.status = status
@@ -0,0 +1,233 @@
+"""Adaptive per-domain rate limiting.
+
+Each domain gets a token bucket whose refill rate is tuned from the
+responses it returns (AIMD): healthy responses grow the rate by 25% per
+response until the domain first throttles ("slow start") and by
+``RATE_INCREASE_RPS`` after that; a 403/429/503 halves it and blocks the
+domain for ``Retry-After`` (or a jittered exponential backoff). After
+``RATE_BREAKER_FAILURES`` consecutive failures the domain's circuit opens
+and requests fail immediately with ``FetchError(kind="circuit_open")``
+until ``RATE_BREAKER_COOLDOWN_S`` has passed; one probe request then
+decides whether it closes again.
+
+Learned rates are kept in the ``domain_rate`` table of the state database
+so the next run starts at the last safe rate instead of from scratch.
+"""
+from typing import Dict, Iterable, Mapping, Optional
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+import random
+import sqlite3
+import threading
+import time
+
+from project.config.settings import settings
+from project.scraper.errors import FetchError
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """Seconds to wait from a ``Retry-After`` header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = now if now is not None else datetime.now(timezone.utc).timestamp()
+    return max(0.0, when.timestamp() - now)
+
+
+def _jittered(backoff_ms: int, attempt: int) -> float:
+    base = max(backoff_ms, 100) / 1000.0 * (2 ** (max(1, attempt) - 1))
+    return base * random.uniform(0.5, 1.5)
+
+
+class DomainBucket:
+    __slots__ = ("rate", "tokens", "capacity", "updated", "blocked_until", "failures", "throttles",
+                 "open_until", "probing", "slow_start")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.failures = 0
+        self.throttles = 0
+        # circuit breaker: open while monotonic() < open_until
+        self.open_until = 0.0
+        self.probing = False
+        self.slow_start = True
+
+    def refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, path: Optional[str] = None, burst: Optional[int] = None):
+        self.min_rps = settings.RATE_MIN_RPS
+        self.max_rps = max(self.min_rps, settings.RATE_MAX_RPS)
+        self.burst = max(1, burst or settings.PER_DOMAIN_CONCURRENCY)
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, DomainBucket] = {}
+        self._learned: Dict[str, float] = {}
+        self.path = Path(path or settings.STATE_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # shared by parallel shard processes: WAL, and wait for a writer instead of failing
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS domain_rate (domain TEXT PRIMARY KEY, rate REAL, updated_at REAL)"
+        )
+        self._db.commit()
+        self._learned = dict(self._db.execute("SELECT domain, rate FROM domain_rate"))
+
+    def _clamp(self, rate: float) -> float:
+        return min(self.max_rps, max(self.min_rps, rate))
+
+    def _bucket(self, domain: str, gap_ms: int = 0) -> DomainBucket:
+        bucket = self._buckets.get(domain)
+        if bucket is None:
+            rate = self._learned.get(domain)
+            if rate is None:
+                # a rule's gap_ms is only the starting point for unknown domains
+                rate = 1000.0 / gap_ms if gap_ms > 0 else settings.RATE_INITIAL_RPS
+            bucket = self._buckets[domain] = DomainBucket(self._clamp(rate), self.burst)
+        return bucket
+
+    def seed(self, domain: str, gap_ms: int = 0) -> None:
+        with self._lock:
+            self._bucket(domain, gap_ms)
+
+    def delay(self, domain: str) -> float:
+        """Seconds until ``domain`` may send again (0 when open circuits should fail fast)."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(domain)
+            if bucket.open_until > now:
+                return 0.0
+            bucket.refill(now)
+            wait = max(0.0, bucket.blocked_until - now)
+            if bucket.tokens < 1.0:
+                wait = max(wait, (1.0 - bucket.tokens) / bucket.rate)
+            return wait
+
+    def try_acquire(self, domain: str) -> float:
+        """Take a token if one is available (0.0), else return the seconds to wait.
+
+        Raises FetchError while the circuit is open.
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(domain)
+            if bucket.open_until > now or bucket.probing:
+                raise FetchError(f"HTTP GET failed: circuit open for {domain}", kind="circuit_open")
+            bucket.refill(now)
+            if bucket.open_until:
+                # cooldown over: the first request allowed to send is the one probe
+                bucket.tokens = max(bucket.tokens, 1.0)
+            wait = bucket.blocked_until - now
+            if wait <= 0 and bucket.tokens >= 1.0:
+                bucket.tokens -= 1.0
+                if bucket.open_until:
+                    bucket.open_until = 0.0
+                    bucket.probing = True
+                return 0.0
+            if wait <= 0:
+                wait = (1.0 - bucket.tokens) / bucket.rate
+            return wait
+
+    def acquire(self, domain: str) -> None:
+        """Block until a token is available; raise FetchError while the circuit is open."""
+        while True:
+            wait = self.try_acquire(domain)
+            if wait <= 0:
+                return
+            time.sleep(min(wait, 1.0))
+
+    def on_response(self, domain: str) -> None:
+        """Any other answer (404, 500, ...): the shop is up, but that is no reason to send faster."""
+        with self._lock:
+            bucket = self._bucket(domain)
+            bucket.failures = 0
+            bucket.probing = False
+
+    def on_success(self, domain: str) -> None:
+        """A 2xx or 304 answer."""
+        with self._lock:
+            bucket = self._bucket(domain)
+            bucket.failures = 0
+            bucket.throttles = 0
+            bucket.probing = False
+            if bucket.slow_start:
+                bucket.rate = self._clamp(bucket.rate * 1.25)
+            else:
+                bucket.rate = self._clamp(bucket.rate + settings.RATE_INCREASE_RPS)
+
+    def on_throttle(self, domain: str, status: int, headers: Optional[Mapping[str, str]] = None,
+                    backoff_ms: int = 0) -> None:
+        retry_after = parse_retry_after((headers or {}).get("Retry-After"))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(domain)
+            bucket.rate = self._clamp(bucket.rate / 2.0)
+            bucket.slow_start = False
+            bucket.throttles += 1
+            if retry_after is None:
+                retry_after = _jittered(backoff_ms, bucket.throttles)
+            if retry_after > settings.RATE_MAX_RETRY_AFTER_S:
+                # the shop asked for longer than a run should wait: skip it for now
+                self._open(bucket, now, retry_after)
+                return
+            bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+            self._fail(bucket, now)
+
+    def on_failure(self, domain: str, backoff_ms: int = 0) -> None:
+        """A connection error or timeout: back off without touching the rate."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._bucket(domain)
+            bucket.blocked_until = max(bucket.blocked_until, now + _jittered(backoff_ms, bucket.failures + 1))
+            self._fail(bucket, now)
+
+    def _fail(self, bucket: DomainBucket, now: float) -> None:
+        bucket.failures += 1
+        if bucket.probing or bucket.failures >= settings.RATE_BREAKER_FAILURES:
+            self._open(bucket, now, settings.RATE_BREAKER_COOLDOWN_S)
+
+    def _open(self, bucket: DomainBucket, now: float, seconds: float) -> None:
+        bucket.open_until = now + seconds
+        bucket.probing = False
+        bucket.failures = 0
+
+    def is_open(self, domain: str) -> bool:
+        with self._lock:
+            bucket = self._buckets.get(domain)
+            return bucket is not None and bucket.open_until > time.monotonic()
+
+    def rates(self) -> Dict[str, float]:
+        with self._lock:
+            return {domain: bucket.rate for domain, bucket in self._buckets.items()}
+
+    def save(self, domains: Optional[Iterable[str]] = None) -> None:
+        now = time.time()
+        with self._lock:
+            names = list(domains) if domains is not None else list(self._buckets)
+            rows = [(d, self._buckets[d].rate, now) for d in names if d and d in self._buckets]
+            self._db.executemany("INSERT OR REPLACE INTO domain_rate VALUES (?, ?, ?)", rows)
+            self._db.commit()
+            self._learned.update((d, rate) for d, rate, _ts in rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
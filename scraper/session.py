@@ -0,0 +1,199 @@
+"""Shared HTTP session layer with per-host connection pools.
+
+Both the runner path (``parsers.http_get``) and ``StaticScraper`` go through
+one process-wide ``requests.Session`` so connections to a shop are kept
+alive and reused across product URLs instead of paying DNS/TCP/TLS setup
+per request. Pool sizes follow the fetch engine's concurrency limits.
+
+Connections are created through timed urllib3 connection classes, so a
+request can be traced as DNS / connect (TCP+TLS) / TTFB / download.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import socket
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
+
+from project.config.settings import settings
+
+
+DNS_CACHE_TTL_S = 300.0
+
+_dns_cache: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+_dns_lock = threading.Lock()
+# per-thread connection timings of the request currently in flight
+_conn_timing = threading.local()
+
+
+def _resolve(host: str, port: int) -> List[str]:
+    key = (host, port)
+    now = time.monotonic()
+    with _dns_lock:
+        hit = _dns_cache.get(key)
+    if hit is not None and hit[0] > now:
+        return hit[1]
+    infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    addrs = list(dict.fromkeys(info[4][0] for info in infos))
+    with _dns_lock:
+        _dns_cache[key] = (now + DNS_CACHE_TTL_S, addrs)
+    return addrs
+
+
+def _add_timing(name: str, ms: float) -> None:
+    timings = getattr(_conn_timing, "timings", None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + ms
+
+
+class _TimedConnectionMixin:
+    """Resolves through a small DNS cache and records dns/connect times."""
+
+    def _new_conn(self):
+        host = self._dns_host
+        t0 = time.perf_counter()
+        try:
+            addrs = _resolve(host, self.port)
+        except socket.gaierror:
+            # let urllib3 raise its usual NameResolutionError
+            return super()._new_conn()
+        finally:
+            _add_timing("dns_ms", (time.perf_counter() - t0) * 1000.0)
+        last_exc = None
+        for addr in addrs:
+            self._dns_host = addr
+            try:
+                return super()._new_conn()
+            except Exception as exc:
+                last_exc = exc
+            finally:
+                self._dns_host = host
+        raise last_exc
+
+    def connect(self):
+        t0 = time.perf_counter()
+        before = getattr(_conn_timing, "timings", {}).get("dns_ms", 0.0)
+        try:
+            super().connect()
+        finally:
+            dns = getattr(_conn_timing, "timings", {}).get("dns_ms", 0.0) - before
+            _add_timing("connect_ms", (time.perf_counter() - t0) * 1000.0 - dns)
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class SessionPool:
+    def __init__(self, pool_hosts: Optional[int] = None, per_host: Optional[int] = None):
+        self.pool_hosts = max(1, pool_hosts or settings.HTTP_POOL_HOSTS)
+        self.per_host = max(1, per_host or settings.PER_DOMAIN_CONCURRENCY)
+        self.session = requests.Session()
+        # ACCEPT_ENCODING advertises br/zstd only when urllib3 can decode them
+        self.session.headers.update({"Accept-Encoding": ACCEPT_ENCODING, "Connection": "keep-alive"})
+        self._adapters = []
+        for scheme in ("https://", "http://"):
+            adapter = HTTPAdapter(pool_connections=self.pool_hosts, pool_maxsize=self.per_host, max_retries=0)
+            adapter.poolmanager.pool_classes_by_scheme = {
+                "http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool,
+            }
+            self.session.mount(scheme, adapter)
+            self._adapters.append(adapter)
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._retired_connections = 0
+        for adapter in self._adapters:
+            self._track_evictions(adapter)
+
+    def _track_evictions(self, adapter: HTTPAdapter) -> None:
+        pools = adapter.poolmanager.pools
+        dispose = pools.dispose_func
+
+        def on_dispose(pool):
+            with self._lock:
+                self._retired_connections += getattr(pool, "num_connections", 0)
+            if dispose:
+                dispose(pool)
+
+        pools.dispose_func = on_dispose
+
+    def get(self, url: str, headers: Optional[Mapping[str, str]] = None, timeout: Optional[float] = None,
+            trace: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        """GET through the shared session.
+
+        When ``trace`` is given it accumulates ``dns_ms``, ``connect_ms``,
+        ``ttfb_ms``, ``download_ms`` and wire ``bytes`` for the request
+        (only up to ``ttfb_ms`` for ``stream=True``).
+        """
+        with self._lock:
+            self._requests += 1
+        if trace is None:
+            return self.session.get(url, headers=headers, timeout=timeout, **kwargs)
+        _conn_timing.timings = timings = {}
+        t0 = time.perf_counter()
+        try:
+            r = self.session.get(url, headers=headers, timeout=timeout, **kwargs)
+        finally:
+            _conn_timing.timings = None
+            total_ms = (time.perf_counter() - t0) * 1000.0
+            for name, ms in timings.items():
+                trace[name] = trace.get(name, 0.0) + ms
+        # r.elapsed runs from sending the request until the headers are parsed
+        head_ms = r.elapsed.total_seconds() * 1000.0
+        setup_ms = timings.get("dns_ms", 0.0) + timings.get("connect_ms", 0.0)
+        trace["ttfb_ms"] = trace.get("ttfb_ms", 0.0) + max(0.0, head_ms - setup_ms)
+        if kwargs.get("stream"):
+            # the body is read (and its download time and bytes accounted) by the caller
+            return r
+        trace["download_ms"] = trace.get("download_ms", 0.0) + max(0.0, total_ms - head_ms)
+        try:
+            wire = r.raw.tell()
+        except Exception:
+            wire = 0
+        trace["bytes"] = trace.get("bytes", 0) + (wire or len(r.content))
+        return r
+
+    def stats(self) -> Dict[str, int]:
+        """Cumulative request / new-connection counters for this process."""
+        with self._lock:
+            connections = self._retired_connections
+            total = self._requests
+        for adapter in self._adapters:
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections += pool.num_connections
+        return {"requests": total, "connections": connections, "reused": max(0, total - connections)}
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_pool: Optional[SessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> SessionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SessionPool()
+    return _pool
@@ -1,8 +1,9 @@
 """Static (requests + BeautifulSoup) scraping utilities."""
 from typing import Tuple, Optional, Iterable
-import requests
 from bs4 import BeautifulSoup
 
+from project.scraper.session import get_session_pool
+
 
 class StaticScraper:
     def __init__(self, user_agent: str, timeout: int = 12, retry: int = 2, backoff_ms: int = 600):
@@ -13,9 +14,10 @@ class StaticScraper:
 
     def http_get(self, url: str) -> Tuple[str, int]:
         last_err = None
+        pool = get_session_pool()
         for attempt in range(self.retry + 1):
             try:
-                r = requests.get(url, headers=self.headers, timeout=self.timeout)
+                r = pool.get(url, headers=self.headers, timeout=self.timeout)
                 if r.status_code == 200:
                     return r.text, r.status_code
                 last_err = f"HTTP {r.status_code}"
@@ -3,7 +3,7 @@
 Provides a minimal wrapper around gspread and service account credentials
 using settings from project.config.settings.
 """
-from typing import Optional, Any, List
+from typing import Optional, Any, Dict, List
 from pathlib import Path
 import gspread
 from google.oauth2.service_account import Credentials
@@ -20,6 +20,7 @@ class SheetsClient:
         self.spreadsheet_id = spreadsheet_id or settings.SPREADSHEET_ID
         self.service_account_file = service_account_file or settings.SERVICE_ACCOUNT_FILE
         self.gc = None
+        self._worksheets: Dict[str, Any] = {}
         self._open()
 
     def _open(self) -> None:
@@ -30,7 +31,25 @@ class SheetsClient:
         self.sheet = self.gc.open_by_key(self.spreadsheet_id)
 
     def worksheet(self, name: str):
-        return self.sheet.worksheet(name)
+        # cache handles: each sheet.worksheet() call is a metadata round trip
+        ws = self._worksheets.get(name)
+        if ws is None:
+            ws = self.sheet.worksheet(name)
+            self._worksheets[name] = ws
+        return ws
+
+    def refresh_metadata(self) -> Dict[str, Dict[str, Any]]:
+        """Re-read every sheet's properties (row/column counts) in one call.
+
+        Cached handles are updated in place, so ``row_count`` stays current
+        for a long-lived client. Returns the properties by sheet title.
+        """
+        meta = self.sheet.fetch_sheet_metadata(params={"fields": "sheets.properties"})
+        props = {s["properties"]["title"]: s["properties"] for s in meta.get("sheets", [])}
+        for name, ws in self._worksheets.items():
+            if name in props:
+                ws._properties.update(props[name])
+        return props
 
     def get_all_values(self, sheet_name: str) -> List[List[str]]:
         return self.worksheet(sheet_name).get_all_values()
@@ -38,3 +57,13 @@ class SheetsClient:
     def append_row(self, sheet_name: str, row: List[Any], value_input_option: str = "USER_ENTERED") -> None:
         self.worksheet(sheet_name).append_row(row, value_input_option=value_input_option)
 
+    def append_rows(self, sheet_name: str, rows: List[List[Any]], value_input_option: str = "USER_ENTERED") -> Dict:
+        """Append many rows with a single values.append call; returns the API response."""
+        return self.sheet.values_append(
+            f"'{sheet_name}'!A1",
+            params={"valueInputOption": value_input_option, "insertDataOption": "INSERT_ROWS"},
+            body={"values": rows},
+        )
+
+    def batch_update(self, requests: List[Dict]) -> Dict:
+        return self.sheet.batch_update({"requests": requests})
@@ -1,24 +1,50 @@
 """Higher-level sheet writers for change and runlog rows.
 
-These helpers use the SheetsClient append_row interface and centralize
+These helpers use the SheetsClient append interface and centralize
 row layout so the runner stays focused on orchestration.
+``BufferedSheetWriter`` batches change rows, their diff formatting and the
+runlog row into a few values.append / batchUpdate calls per run.
 """
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
+import re
+import threading
+import time
+from collections import deque
+
+from project.config.settings import settings
 from project.sheets.client import SheetsClient
 
 # sheet name constants (keep in sync with runner)
 SHEET_CHANGES = "최저가변동"
 SHEET_RUNLOG = "실행로그"
 
+# field names of the change / runlog row layouts (header labels for local storage)
+CHANGE_FIELDS = ("timestamp", "product_id", "product_name", "seller", "url", "prev_price", "curr_price",
+                 "total", "diff", "change_type", "prev_stock", "curr_stock", "ship_cost", "memo")
+RUNLOG_FIELDS = ("batch_id", "start_time", "end_time", "duration", "total", "success", "fail", "http_calls",
+                 "avg_response_ms", "err_429", "err_403", "err_timeout", "err_selector", "domain_summary", "memo")
+
+# column I (diff) of the change sheet, 0-indexed for GridRange
+DIFF_COL_INDEX = 8
+
+DIFF_FORMATS = {
+    "-": {"textFormat": {"bold": True, "foregroundColor": {"red": 0.0, "green": 0.0, "blue": 1.0}}},
+    "+": {"textFormat": {"bold": True, "foregroundColor": {"red": 1.0, "green": 0.0, "blue": 0.0}}},
+}
+
+_UPDATED_RANGE_RE = re.compile(r"!\$?[A-Z]+\$?(\d+)")
 
-def append_change_row(sc: SheetsClient, *, timestamp: str, product_id: str, product_name: str, seller: str,
-                      url: str, prev_price: Optional[int], curr_price: Optional[int], ship_cost: Optional[int],
-                      diff_str: str, change_type: str, prev_stock: str, curr_stock: str, memo: str) -> None:
+
+def build_change_row(*, timestamp: str, product_id: str, product_name: str, seller: str,
+                     url: str, prev_price: Optional[int], curr_price: Optional[int], ship_cost: Optional[int],
+                     diff_str: str, change_type: str, prev_stock: str, curr_stock: str, memo: str,
+                     row: Optional[int] = None) -> List[Any]:
+    # ``row`` (the product-sheet row) only orders merged shard output; it is not written
     shipping = ship_cost if ship_cost is not None else 0
     current_total = 0
     if curr_price is not None:
         current_total = curr_price + shipping
-    row = [
+    return [
         timestamp,
         product_id,
         product_name,
@@ -34,11 +60,10 @@ def append_change_row(sc: SheetsClient, *, timestamp: str, product_id: str, prod
         shipping,
         memo,
     ]
-    sc.append_row(SHEET_CHANGES, row, value_input_option="USER_ENTERED")
 
 
-def append_runlog(sc: SheetsClient, info: Dict[str, Any]) -> None:
-    row = [
+def build_runlog_row(info: Dict[str, Any]) -> List[Any]:
+    return [
         info.get("batch_id", ""),
         info.get("start_time", ""),
         info.get("end_time", ""),
@@ -55,4 +80,144 @@ def append_runlog(sc: SheetsClient, info: Dict[str, Any]) -> None:
         info.get("domain_summary", ""),
         info.get("memo", ""),
     ]
-    sc.append_row(SHEET_RUNLOG, row, value_input_option="USER_ENTERED")
+
+
+def append_change_row(sc: SheetsClient, **fields) -> None:
+    sc.append_row(SHEET_CHANGES, build_change_row(**fields), value_input_option="USER_ENTERED")
+
+
+def append_runlog(sc: SheetsClient, info: Dict[str, Any]) -> None:
+    sc.append_row(SHEET_RUNLOG, build_runlog_row(info), value_input_option="USER_ENTERED")
+
+
+class QuotaBudget:
+    """Sliding one-minute window of API calls; blocks once the budget is spent."""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = max(1, per_minute)
+        self._calls: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= 60.0:
+                    self._calls.popleft()
+                if len(self._calls) < self.per_minute:
+                    self._calls.append(now)
+                    return
+                time.sleep(60.0 - (now - self._calls[0]))
+
+
+class BufferedSheetWriter:
+    """Accumulates change/runlog rows and flushes them in batches.
+
+    Flushes happen when ``max_rows`` change rows are buffered, when
+    ``flush_interval_s`` has passed since the last flush, and on ``close()``;
+    with ``auto_flush`` false only ``flush()`` and ``close()`` write.
+    The I-column diff colouring is applied with one batchUpdate per flush,
+    using the row numbers reported back by values.append.
+    """
+
+    def __init__(self, sc: SheetsClient, max_rows: Optional[int] = None, flush_interval_s: Optional[float] = None,
+                 quota_per_min: Optional[int] = None, auto_flush: bool = True):
+        self.sc = sc
+        self.auto_flush = auto_flush
+        self.max_rows = max(1, max_rows or settings.SHEETS_BATCH_ROWS)
+        self.flush_interval_s = flush_interval_s if flush_interval_s is not None else settings.SHEETS_FLUSH_INTERVAL_S
+        self.quota = QuotaBudget(quota_per_min or settings.SHEETS_WRITE_QUOTA_PER_MIN)
+        self._changes: List[Tuple[List[Any], str]] = []
+        self._runlog: List[List[Any]] = []
+        self._last_flush = time.monotonic()
+        self.api_calls = 0
+        self.write_ms = 0.0
+
+    def add_change(self, **fields) -> None:
+        self._changes.append((build_change_row(**fields), fields.get("diff_str") or ""))
+        self.maybe_flush()
+
+    def add_row(self, row: List[Any]) -> None:
+        """Buffer a raw change-sheet row (e.g. the blank batch separator)."""
+        self._changes.append((row, ""))
+        self.maybe_flush()
+
+    def add_runlog(self, info: Dict[str, Any]) -> None:
+        self._runlog.append(build_runlog_row(info))
+
+    def maybe_flush(self) -> None:
+        if not self.auto_flush:
+            return
+        if len(self._changes) >= self.max_rows:
+            self.flush()
+        elif self._changes and time.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+
+    def flush(self) -> None:
+        while self._changes:
+            chunk = self._changes[:self.max_rows]
+            self._append_changes(chunk)
+            del self._changes[:len(chunk)]
+        if self._runlog:
+            self._call(self.sc.append_rows, SHEET_RUNLOG, self._runlog)
+            self._runlog = []
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _call(self, fn, *args):
+        self.quota.acquire()
+        self.api_calls += 1
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.write_ms += (time.perf_counter() - t0) * 1000.0
+
+    def _append_changes(self, chunk: List[Tuple[List[Any], str]]) -> None:
+        resp = self._call(self.sc.append_rows, SHEET_CHANGES, [row for row, _ in chunk])
+        first_row = _first_row_of(resp)
+        if first_row is None:
+            return
+        requests = []
+        sheet_id = self.sc.worksheet(SHEET_CHANGES).id
+        for offset, (_row, diff_str) in enumerate(chunk):
+            fmt = DIFF_FORMATS.get(diff_str[:1]) if diff_str else None
+            if fmt is None:
+                continue
+            row_index = first_row - 1 + offset
+            requests.append({
+                "repeatCell": {
+                    "range": {
+                        "sheetId": sheet_id,
+                        "startRowIndex": row_index,
+                        "endRowIndex": row_index + 1,
+                        "startColumnIndex": DIFF_COL_INDEX,
+                        "endColumnIndex": DIFF_COL_INDEX + 1,
+                    },
+                    "cell": {"userEnteredFormat": fmt},
+                    "fields": "userEnteredFormat.textFormat",
+                }
+            })
+        if not requests:
+            return
+        try:
+            self._call(self.sc.batch_update, requests)
+        except Exception:
+            # Formatting may not be supported; ignore
+            pass
+
+
+def _first_row_of(resp: Any) -> Optional[int]:
+    try:
+        m = _UPDATED_RANGE_RE.search(resp["updates"]["updatedRange"])
+    except (KeyError, TypeError):
+        return None
+    return int(m.group(1)) if m else None
@@ -0,0 +1,8 @@
+# storage package
+# Backends for the product list, settings rules, change log and runlog.
+from .base import Storage, get_storage
+from .local import LocalStorage
+from .memory import MemoryStorage
+from .sheets import SheetsStorage
+
+__all__ = ["Storage", "get_storage", "LocalStorage", "MemoryStorage", "SheetsStorage"]
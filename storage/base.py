@@ -0,0 +1,66 @@
+"""Storage interface used by the runner.
+
+A storage backend provides the four tables a run touches:
+
+* the product list, as a row source (``product_source(start_row)``) in the
+  product sheet's column layout (A..K, products from ``START_ROW``);
+* the settings rows the rules are loaded from (``settings_rows()``);
+* the change log and runlog, written through a sink (``change_sink()``)
+  with the ``BufferedSheetWriter`` interface - ``auto_flush=False`` makes
+  it write only on ``flush()``/``close()``, so a journaled run decides
+  when rows reach the log;
+* the change-log header (``change_header()``), which sizes the blank row
+  separating batches.
+
+``settings_revision()`` lets a long-running process skip re-parsing the
+rules while the settings are unchanged. It must change with every edit of
+the settings, without anyone having to bump it; None means "unknown,
+reload".
+
+``SheetsStorage`` is the Google Sheets backend, ``LocalStorage`` keeps the
+inputs in CSV files and the logs in SQLite, and ``MemoryStorage`` keeps
+everything in lists for tests and offline benchmarks.
+"""
+from typing import Any, List, Optional
+
+from project.config.settings import settings
+
+
+class Storage:
+    name = ""
+
+    def product_source(self, start_row: int) -> Any:
+        raise NotImplementedError
+
+    def settings_rows(self) -> List[List[str]]:
+        raise NotImplementedError
+
+    def settings_revision(self) -> Optional[str]:
+        return None
+
+    def change_sink(self, auto_flush: bool = True) -> Any:
+        raise NotImplementedError
+
+    def change_header(self) -> List[str]:
+        return []
+
+    def close(self) -> None:
+        pass
+
+
+def get_storage(name: Optional[str] = None) -> Storage:
+    """Build the backend named by ``name`` or ``settings.STORAGE_BACKEND``."""
+    name = (name or settings.STORAGE_BACKEND).lower()
+    if name == "sheets":
+        from project.storage.sheets import SheetsStorage
+
+        return SheetsStorage()
+    if name == "local":
+        from project.storage.local import LocalStorage
+
+        return LocalStorage()
+    if name == "memory":
+        from project.storage.memory import MemoryStorage
+
+        return MemoryStorage()
+    raise ValueError(f"unknown storage backend: {name}")
@@ -0,0 +1,128 @@
+"""Local-file storage backend.
+
+Inputs are CSV files in the sheets' own layout, so a "download as CSV" of
+the product and settings sheets works as-is:
+
+* ``<root>/products.csv`` - the product sheet (columns A..K);
+* ``<root>/settings.csv`` - the settings sheet.
+
+The change log and runlog are appended to ``<root>/log.sqlite3`` (tables
+``changes`` and ``runlog``, one column per field of the sheet layout) in
+batched transactions. Blank batch-separator rows are not stored.
+"""
+from typing import Any, Dict, Iterator, List, Optional
+from pathlib import Path
+import csv
+import sqlite3
+import time
+
+from project.config.settings import settings
+from project.sheets.writer import CHANGE_FIELDS, RUNLOG_FIELDS, build_change_row, build_runlog_row
+from project.storage.base import Storage
+
+
+class CsvRowSource:
+    def __init__(self, path: Path, start_row: int = 1):
+        self.path = path
+        self.start_row = start_row
+
+    def rows(self) -> Iterator[List[str]]:
+        if not self.path.exists():
+            return
+        with self.path.open(newline="", encoding="utf-8-sig") as f:
+            for row_num, row in enumerate(csv.reader(f), 1):
+                if row_num >= self.start_row:
+                    yield row
+
+
+class SqliteLogSink:
+    """Appends change/runlog rows to SQLite, ``batch_rows`` rows per transaction.
+
+    With ``auto_flush`` false rows are only written by ``flush()``/``close()``.
+    """
+
+    def __init__(self, path: Path, batch_rows: Optional[int] = None, auto_flush: bool = True):
+        self.path = path
+        self.batch_rows = max(1, batch_rows or settings.SHEETS_BATCH_ROWS)
+        self.auto_flush = auto_flush
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        for table, fields in (("changes", CHANGE_FIELDS), ("runlog", RUNLOG_FIELDS)):
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {', '.join(fields)})"
+            )
+        self._db.commit()
+        self._changes: List[List[Any]] = []
+        self._runlog: List[List[Any]] = []
+        self.write_ms = 0.0
+
+    def add_change(self, **fields) -> None:
+        self._changes.append(build_change_row(**fields))
+        if self.auto_flush and len(self._changes) >= self.batch_rows:
+            self.flush()
+
+    def add_row(self, row: List[Any]) -> None:
+        if any(cell not in ("", None) for cell in row):
+            self._changes.append(list(row)[:len(CHANGE_FIELDS)])
+
+    def add_runlog(self, info: Dict[str, Any]) -> None:
+        self._runlog.append(build_runlog_row(info))
+
+    def flush(self) -> None:
+        t0 = time.perf_counter()
+        for table, fields, rows in (("changes", CHANGE_FIELDS, self._changes),
+                                    ("runlog", RUNLOG_FIELDS, self._runlog)):
+            if rows:
+                placeholders = ", ".join("?" for _ in fields)
+                padded = [row + [""] * (len(fields) - len(row)) for row in rows]
+                self._db.executemany(f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({placeholders})", padded)
+        self._db.commit()
+        self._changes, self._runlog = [], []
+        self.write_ms += (time.perf_counter() - t0) * 1000.0
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
+
+
+class LocalStorage(Storage):
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.LOCAL_STORAGE_DIR)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.products_path = self.root / "products.csv"
+        self.settings_path = self.root / "settings.csv"
+        self.log_path = self.root / "log.sqlite3"
+
+    def product_source(self, start_row: int) -> CsvRowSource:
+        return CsvRowSource(self.products_path, start_row=start_row)
+
+    def settings_rows(self) -> List[List[str]]:
+        return list(CsvRowSource(self.settings_path).rows())
+
+    def settings_revision(self) -> Optional[str]:
+        try:
+            stat = self.settings_path.stat()
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def change_sink(self, auto_flush: bool = True) -> SqliteLogSink:
+        return SqliteLogSink(self.log_path, auto_flush=auto_flush)
+
+    def change_header(self) -> List[str]:
+        return list(CHANGE_FIELDS)
+
+    def read_log(self, table: str = "changes") -> List[List[Any]]:
+        """Rows of the ``changes`` or ``runlog`` table, oldest first."""
+        if table not in ("changes", "runlog"):
+            raise ValueError(f"unknown log table: {table}")
+        if not self.log_path.exists():
+            return []
+        db = sqlite3.connect(str(self.log_path))
+        try:
+            fields = CHANGE_FIELDS if table == "changes" else RUNLOG_FIELDS
+            return [list(row) for row in db.execute(f"SELECT {', '.join(fields)} FROM {table} ORDER BY id")]
+        finally:
+            db.close()
@@ -0,0 +1,36 @@
+"""In-memory storage backend for tests, dry runs and offline benchmarks."""
+from typing import Any, List, Optional
+import hashlib
+import json
+
+from project.pipeline.sinks import MemorySink
+from project.pipeline.sources import ListRowSource
+from project.sheets.writer import CHANGE_FIELDS
+from project.storage.base import Storage
+
+
+class MemoryStorage(Storage):
+    name = "memory"
+
+    def __init__(self, products: Optional[List[List[str]]] = None, settings_rows: Optional[List[List[str]]] = None,
+                 header: Optional[List[str]] = None):
+        self.products: List[List[str]] = products if products is not None else []
+        self.settings: List[List[str]] = settings_rows if settings_rows is not None else []
+        self.header = list(header) if header is not None else list(CHANGE_FIELDS)
+        self.changes: List[List[Any]] = []
+        self.runlog: List[List[Any]] = []
+
+    def product_source(self, start_row: int) -> ListRowSource:
+        return ListRowSource(self.products, start_row=start_row)
+
+    def settings_rows(self) -> List[List[str]]:
+        return [list(row) for row in self.settings]
+
+    def settings_revision(self) -> Optional[str]:
+        return hashlib.blake2b(json.dumps(self.settings).encode("utf-8"), digest_size=16).hexdigest()
+
+    def change_sink(self, auto_flush: bool = True) -> MemorySink:
+        return MemorySink(self.changes, self.runlog)
+
+    def change_header(self) -> List[str]:
+        return list(self.header)
@@ -0,0 +1,72 @@
+"""Google Sheets storage backend (gspread).
+
+Reads are kept to what a run needs: the product sheet is paged through
+columns E..F and I..K only and its row count comes from one metadata call
+per run (which also keeps long-lived worksheet handles current).
+
+Google Sheets has no revision for the content of one sheet (the file's
+Drive modifiedTime moves with every change-log append), so the settings
+revision is a hash of the settings sheet's values. Every run reads that
+sheet once - one values request, whose rows are handed on to
+``settings_rows()`` - and any edit changes the revision, with nothing for
+the editor to remember. What an unchanged revision saves is re-parsing
+the rules and re-reading the change-log header, which is cached until the
+revision or that sheet's column count changes.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+
+from project.pipeline.sources import PRODUCT_COLUMNS, SheetRowSource
+from project.sheets.client import SheetsClient
+from project.sheets.writer import SHEET_CHANGES, BufferedSheetWriter
+from project.storage.base import Storage
+
+# sheet name constants (keep in sync with runner)
+SHEET_PRODUCTS = "1.상품리스트"
+SHEET_SETTINGS = "설정"
+
+
+class SheetsStorage(Storage):
+    name = "sheets"
+
+    def __init__(self, sc: Optional[SheetsClient] = None):
+        self.sc = sc if sc is not None else SheetsClient()
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        # rows read by settings_revision, handed to the next settings_rows call
+        self._settings_rows: Optional[List[List[str]]] = None
+        self._revision: Optional[str] = None
+        self._header: Optional[Tuple[Any, List[str]]] = None
+
+    def product_source(self, start_row: int) -> SheetRowSource:
+        ws = self.sc.worksheet(SHEET_PRODUCTS)
+        self._meta = self.sc.refresh_metadata()
+        return SheetRowSource(ws, start_row=start_row, columns=PRODUCT_COLUMNS)
+
+    def settings_rows(self) -> List[List[str]]:
+        rows, self._settings_rows = self._settings_rows, None
+        if rows is None:
+            rows = self.sc.worksheet(SHEET_SETTINGS).get_all_values()
+        return rows
+
+    def settings_revision(self) -> Optional[str]:
+        rows = self.sc.worksheet(SHEET_SETTINGS).get_all_values()
+        self._settings_rows = rows
+        self._revision = hashlib.blake2b(json.dumps(rows).encode("utf-8"), digest_size=16).hexdigest()
+        return self._revision
+
+    def change_sink(self, auto_flush: bool = True) -> BufferedSheetWriter:
+        return BufferedSheetWriter(self.sc, auto_flush=auto_flush)
+
+    def change_header(self) -> List[str]:
+        columns = self._meta.get(SHEET_CHANGES, {}).get("gridProperties", {}).get("columnCount")
+        key = (columns, self._revision)
+        if self._header is not None and self._revision is not None and self._header[0] == key:
+            return list(self._header[1])
+        try:
+            header = self.sc.worksheet(SHEET_CHANGES).get('A1:1')
+        except Exception:
+            return []
+        row = list(header[0]) if header else []
+        self._header = (key, row)
+        return list(row)
@@ -0,0 +1,207 @@
+"""Structured product data embedded in shop pages.
+
+Many shop pages carry their product data as JSON next to the markup:
+schema.org JSON-LD (``<script type="application/ld+json">``), the Next.js
+``__NEXT_DATA__`` blob or a ``window.__PRELOADED_STATE__ = {...}`` store.
+Those blobs are cut out with a regex slice and ``json.loads`` - no DOM is
+built - and read through the rule's JSON paths, written as
+``<source>:<dotted.path>``:
+
+* ``ld:offers.price`` - every JSON-LD object on the page (lists and
+  ``@graph`` flattened); the first object that has the path wins;
+* ``next:props.pageProps.product.salePrice`` - ``__NEXT_DATA__``;
+* ``state:product.A.benefitPrice`` - ``window.__PRELOADED_STATE__``;
+* ``<NAME>:...`` - any other ``window.NAME = {...}`` assignment.
+
+Segments are object keys or list indices; a key segment applied to a list
+is tried on each item in turn, so ``offers.price`` works whether
+``offers`` is one object or a list of offers.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import json
+import re
+
+from project import parsers
+
+SOURCE_ALIASES = {"ld": "ld", "jsonld": "ld", "next": "__NEXT_DATA__", "state": "__PRELOADED_STATE__"}
+
+_LD_RE = re.compile(r"<script[^>]*application/ld\+json[^>]*>(.*?)</script", re.S | re.I)
+_NEXT_RE = re.compile(r"<script[^>]*id=[\"']__NEXT_DATA__[\"'][^>]*>(.*?)</script", re.S | re.I)
+_MISSING = object()
+_decoder = json.JSONDecoder(strict=False)
+
+_OUT_OF_STOCK = frozenset(("outofstock", "soldout", "discontinued", "false", "n"))
+_IN_STOCK = frozenset(("instock", "limitedavailability", "preorder", "presale", "onlineonly", "instoreonly",
+                       "true", "y"))
+
+
+def _loads(text: str) -> Any:
+    text = text.strip()
+    if text.startswith("<!--"):
+        text = text[4:].rstrip("->").strip()
+    try:
+        return _decoder.decode(text)
+    except ValueError:
+        return _MISSING
+
+
+def _assignment(html: str, name: str) -> Any:
+    """Decode the object literal in ``name = {...}`` (JSON syntax only)."""
+    for m in re.finditer(re.escape(name) + r"\s*=\s*", html):
+        start = m.end()
+        if start < len(html) and html[start] in "{[":
+            try:
+                return _decoder.raw_decode(html, start)[0]
+            except ValueError:
+                continue
+    return _MISSING
+
+
+def _flatten_ld(value: Any, out: List[Any]) -> None:
+    if isinstance(value, list):
+        for item in value:
+            _flatten_ld(item, out)
+    elif isinstance(value, dict):
+        out.append(value)
+        if isinstance(value.get("@graph"), list):
+            _flatten_ld(value["@graph"], out)
+
+
+def _walk(value: Any, segments: Sequence[str]) -> Any:
+    for i, segment in enumerate(segments):
+        if isinstance(value, list):
+            if segment.lstrip("-").isdigit():
+                index = int(segment)
+                value = value[index] if -len(value) <= index < len(value) else _MISSING
+            else:
+                for item in value:
+                    found = _walk(item, segments[i:])
+                    if found is not _MISSING:
+                        return found
+                return _MISSING
+        elif isinstance(value, dict):
+            value = value.get(segment, _MISSING)
+        else:
+            return _MISSING
+        if value is _MISSING or value is None:
+            return _MISSING
+    return value
+
+
+def split_path(path: str) -> Optional[tuple]:
+    """``"ld:offers.price"`` -> ``("ld", ["offers", "price"])``; None when malformed."""
+    source, sep, rest = path.strip().partition(":")
+    if not sep or not source or not rest:
+        return None
+    return SOURCE_ALIASES.get(source.lower(), source), [s for s in rest.split(".") if s]
+
+
+class StructuredData:
+    """Lazily decoded JSON sources of one page."""
+
+    def __init__(self, html: str):
+        self.html = html or ""
+        self._sources: Dict[str, List[Any]] = {}
+
+    def source(self, name: str) -> List[Any]:
+        roots = self._sources.get(name)
+        if roots is not None:
+            return roots
+        roots = []
+        if name == "ld":
+            if "ld+json" in self.html:
+                for m in _LD_RE.finditer(self.html):
+                    value = _loads(m.group(1))
+                    if value is not _MISSING:
+                        _flatten_ld(value, roots)
+        elif name in self.html:
+            m = _NEXT_RE.search(self.html) if name == "__NEXT_DATA__" else None
+            value = _loads(m.group(1)) if m else _assignment(self.html, name)
+            if value is not _MISSING:
+                roots.append(value)
+        self._sources[name] = roots
+        return roots
+
+    def get(self, paths: Iterable[str]) -> Any:
+        """Value at the first of ``paths`` that resolves, else None."""
+        for path in paths:
+            parsed = split_path(path)
+            if parsed is None:
+                continue
+            name, segments = parsed
+            for root in self.source(name):
+                value = _walk(root, segments)
+                if value is not _MISSING and value != "":
+                    return value
+        return None
+
+
+def json_price(value: Any) -> Optional[int]:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(round(value))
+    if isinstance(value, str):
+        try:
+            return int(round(float(value.replace(",", ""))))
+        except ValueError:
+            return parsers.parse_price(value)
+    return None
+
+
+def json_ship_text(value: Any) -> Optional[str]:
+    """Shipping as text ``parsers.parse_shipping`` understands (numbers are KRW)."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return f"{int(round(value)):,}원"
+    if isinstance(value, dict):
+        # schema.org OfferShippingDetails / MonetaryAmount
+        return json_ship_text(value.get("value", value.get("shippingRate")))
+    return str(value)
+
+
+def json_stock_text(value: Any) -> Optional[str]:
+    """Stock as text ``parsers.determine_stock`` understands.
+
+    Accepts schema.org availability (``https://schema.org/InStock``),
+    booleans, stock quantities and shop status codes like ``SOLD_OUT``.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "in stock" if value else "out of stock"
+    if isinstance(value, (int, float)):
+        return "in stock" if value > 0 else "out of stock"
+    text = str(value)
+    key = re.sub(r"[^a-z]", "", text.rsplit("/", 1)[-1].lower())
+    if key in _OUT_OF_STOCK:
+        return "out of stock"
+    if key in _IN_STOCK:
+        return "in stock"
+    return text
+
+
+def extract(html: str, paths: Dict[str, Sequence[str]]) -> Dict[str, Any]:
+    """Read price / ship / stock from the page's JSON through the rule's paths.
+
+    ``paths`` maps ``coupon_json``/``price_json``/``ship_json``/``stock_json``
+    to path lists. Returns only the fields that were found, as
+    ``price_val`` / ``ship_text`` / ``stock_text``.
+    """
+    data = StructuredData(html)
+    found: Dict[str, Any] = {}
+    for field in ("coupon_json", "price_json"):
+        price = json_price(data.get(paths.get(field, ())))
+        if price is not None:
+            found["price_val"] = price
+            break
+    if paths.get("ship_json"):
+        ship_text = json_ship_text(data.get(paths["ship_json"]))
+        if ship_text is not None:
+            found["ship_text"] = ship_text
+    if paths.get("stock_json"):
+        stock_text = json_stock_text(data.get(paths["stock_json"]))
+        if stock_text is not None:
+            found["stock_text"] = stock_text
+    return found
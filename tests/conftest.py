@@ -0,0 +1,59 @@
+"""Shared test setup.
+
+The package is imported as ``project`` (it normally lives in the
+``project/`` directory of the bot's repository). When it is checked out
+under another name, a ``project`` link to the checkout is put on
+``sys.path`` - and on ``PYTHONPATH``, for the mock shop and shard worker
+processes.
+
+Every test gets its own state, history, archive, cache and metrics
+locations, so nothing is written to ``.cache/`` of the working directory.
+"""
+from pathlib import Path
+import importlib.util
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+if importlib.util.find_spec("project") is None:
+    _link_dir = Path(tempfile.mkdtemp(prefix="project-tests-"))
+    (_link_dir / "project").symlink_to(ROOT, target_is_directory=True)
+    sys.path.insert(0, str(_link_dir))
+    os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [str(_link_dir), os.environ.get("PYTHONPATH")]))
+
+from project.config.settings import settings  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def state_dirs(tmp_path, monkeypatch):
+    """Point every on-disk store at ``tmp_path``."""
+    for name, value in (("STATE_DB_PATH", tmp_path / "state.sqlite3"),
+                        ("RESPONSE_CACHE_PATH", tmp_path / "responses.sqlite3"),
+                        ("HISTORY_DIR", tmp_path / "history"),
+                        ("ARCHIVE_DIR", tmp_path / "archive"),
+                        ("SHARD_DIR", tmp_path / "shards"),
+                        ("LOCAL_STORAGE_DIR", tmp_path / "data"),
+                        ("DAEMON_LOCK_PATH", tmp_path / "run.lock"),
+                        ("METRICS_DIR", "")):
+        monkeypatch.setattr(settings, name, str(value))
+    return tmp_path
+
+
+@pytest.fixture
+def fast_limiter(monkeypatch):
+    """Let the rate limiter go as fast as the mock shop answers."""
+    monkeypatch.setattr(settings, "RATE_INITIAL_RPS", 1000.0)
+    monkeypatch.setattr(settings, "RATE_MAX_RPS", 1000.0)
+
+
+@pytest.fixture(scope="session")
+def mock_shop():
+    """The bench mock shop (one loopback shop per fixture page), without injected errors."""
+    from project.bench.mockshop import MockShop, ShopOptions
+
+    with MockShop(ShopOptions(latency_ms=5.0, jitter_ms=0.0)) as shop:
+        yield shop
@@ -0,0 +1,96 @@
+import pytest
+
+from project import runner
+from project.bench.suite import build_catalogue
+from project.config.settings import settings
+from project.history import PageArchive
+from project.history import archive as archive_module
+from project.runner import run_once
+from project.storage import MemoryStorage
+
+
+def test_cache_hits_are_archived_and_rows_without_a_page_reported(mock_shop, fast_limiter, monkeypatch):
+    monkeypatch.setattr(settings, "ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "CACHE_MAX_AGE_S", 3600)
+    products, settings_rows = build_catalogue(mock_shop.shops, 30)
+    products.append(["", "", "", "", "NO-URL", "URL 없는 상품", "", "", "5000", "", ""])
+    storage = MemoryStorage(products, settings_rows)
+
+    first = run_once(storage=storage, batch_id="b1")
+    second = run_once(storage=storage, batch_id="b2")
+
+    assert "캐시재사용:30" in second["memo"]
+    archive = PageArchive()
+    for entry in (first, second):
+        pages = list(archive.pages(entry["batch_id"]))
+        assert len(pages) == 30
+        assert all(page["extracted"] for page in pages)
+        assert archive.missing(entry["batch_id"]) == [
+            {"row": len(products), "product_id": "NO-URL", "url": "", "reason": "no_url"}]
+    archive.close()
+
+
+def _entry(row):
+    return {"row": row, "product_id": f"P{row}", "product_name": "상품", "prev_price_str": "1000",
+            "prev_seller": "", "url": f"http://shop.example/p/{row}"}
+
+
+def test_prune_keeps_the_newest_batches_and_compacts_their_packs(monkeypatch):
+    import secrets
+
+    shared = "<html>같은 페이지</html>"
+    digests = {}
+    for batch in ("b1", "b2", "b3"):
+        # one archive (and so one pack) per batch, as in separate runs
+        archive = PageArchive()
+        unique = f"<html>{batch}{secrets.token_hex(20000)}</html>"
+        digests[batch] = archive.put_body(unique)
+        archive.add_page(batch, _entry(1), digests[batch], None)
+        archive.add_page(batch, _entry(2), archive.put_body(shared), None)
+        archive.add_missing(batch, _entry(3), "no_url")
+        archive.close()
+    monkeypatch.setattr(archive_module, "PRUNE_MIN_PACK_AGE_S", -60.0)
+
+    archive = PageArchive()
+    removed = archive.prune(keep_batches=2)
+
+    assert removed == {"batches": 1, "blobs": 1, "packs": 1}
+    assert list(archive.pages("b1")) == [] and archive.missing("b1") == []
+    assert [page["row"] for page in archive.pages("b3")] == [1, 2]
+    with pytest.raises(KeyError):
+        archive.get_body(digests["b1"])
+    # the shared page lived in the first batch's pack and was moved out of it
+    assert archive.get_body(archive.put_body(shared)) == shared
+    assert archive.get_body(digests["b2"]).startswith("<html>b2")
+    archive.close()
+
+
+def test_an_interrupted_batch_keeps_its_archived_pages(mock_shop, fast_limiter, monkeypatch):
+    monkeypatch.setattr(settings, "ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "JOURNAL_CHECKPOINT_ROWS", 5)
+    products, settings_rows = build_catalogue(mock_shop.shops, 30)
+    storage = MemoryStorage(products, settings_rows)
+    diff_stage = runner._diff_stage
+
+    def killed_after_12_rows(*args, **kwargs):
+        seen = []
+
+        def row_done(entry):
+            seen.append(entry)
+            args[6](entry)
+            if len(seen) == 12:
+                raise KeyboardInterrupt
+
+        yield from diff_stage(*args[:6], row_done, **kwargs)
+
+    monkeypatch.setattr(runner, "_diff_stage", killed_after_12_rows)
+    with pytest.raises(KeyboardInterrupt):
+        runner.run_once(storage=storage, batch_id="b1")
+    monkeypatch.setattr(runner, "_diff_stage", diff_stage)
+    runner.run_once(storage=storage)
+
+    archive = PageArchive()
+    assert [page["row"] for page in archive.pages("b1")] == list(range(len(products) - 29, len(products) + 1))
+    assert archive.missing("b1") == []
+    archive.close()
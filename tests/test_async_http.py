@@ -0,0 +1,65 @@
+import sys
+import time
+from urllib.parse import urlsplit
+
+import pytest
+
+from project.bench.suite import build_catalogue
+from project.config.settings import settings
+from project.runner import run_once
+from project.scraper import async_http, session
+from project.storage import MemoryStorage
+
+
+@pytest.fixture
+def backend():
+    pytest.importorskip("httpx")
+    backend = async_http.AsyncHttpBackend()
+    yield backend
+    backend.close()
+
+
+def test_hostnames_connect_through_the_dns_cache(mock_shop, backend, monkeypatch):
+    # two shop hostnames behind one address, known only to the DNS cache
+    _name, base, _rule = mock_shop.shops[0]
+    address, port = urlsplit(base).hostname, urlsplit(base).port
+    for host in ("shop-a.test", "shop-b.test"):
+        monkeypatch.setitem(session._dns_cache, (host, port), (time.monotonic() + 60.0, [address]))
+
+    pages = []
+    for host in ("shop-a.test", "shop-b.test", "shop-a.test"):
+        trace = {}
+        text, status, _headers = backend.fetch(f"http://{host}:{port}/p/1", "test", 5, 0, 0,
+                                               trace=trace).result(timeout=10)
+        assert status == 200
+        assert "final_url" not in trace
+        pages.append(text)
+
+    direct, status, _headers = backend.fetch(f"{base}/p/1", "test", 5, 0, 0).result(timeout=10)
+    assert status == 200
+    assert pages == [direct] * 3
+    assert backend.stats()["requests"] == 4
+
+
+def test_every_cached_address_is_tried(mock_shop, backend, monkeypatch):
+    _name, base, _rule = mock_shop.shops[0]
+    address, port = urlsplit(base).hostname, urlsplit(base).port
+    # nothing listens on the first address
+    monkeypatch.setitem(session._dns_cache, ("shop-a.test", port),
+                        (time.monotonic() + 60.0, ["127.255.255.254", address]))
+
+    _text, status, _headers = backend.fetch(f"http://shop-a.test:{port}/p/1", "test", 5, 0, 0).result(timeout=10)
+
+    assert status == 200
+
+
+def test_a_missing_httpx_fails_the_rows_as_backend_unavailable(mock_shop, fast_limiter, monkeypatch):
+    monkeypatch.setitem(sys.modules, "httpx", None)
+    monkeypatch.setattr(async_http, "_backend", None)
+    monkeypatch.setattr(settings, "HTTP_BACKEND", "async")
+    products, settings_rows = build_catalogue(mock_shop.shops, 12)
+
+    entry = run_once(storage=MemoryStorage(products, settings_rows), batch_id="b1")
+
+    assert entry["fail"] == 12
+    assert entry["err_selector"] == 0
@@ -0,0 +1,34 @@
+import pytest
+
+from project.scraper.canonical import RedirectMemo, canonical_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Shop.Example.COM:443/p/1?b=2&a=1#reviews", "https://shop.example.com/p/1?a=1&b=2"),
+    ("http://shop.example.com:8080", "http://shop.example.com:8080/"),
+    ("https://shop.example.com/p/1?utm_source=x&NaPm=ct%3D1&fbclid=y&id=7", "https://shop.example.com/p/1?id=7"),
+    ("https://shop.example.com/p/1?UTM_Medium=x&q=", "https://shop.example.com/p/1?q="),
+])
+def test_canonical_url(url, expected):
+    assert canonical_url(url) == expected
+
+
+def test_rule_params():
+    url = "https://shop.example.com/p/1?option=3&session=abc&utm_source=x"
+
+    assert canonical_url(url, drop_params=["session"]) == "https://shop.example.com/p/1?option=3"
+    assert canonical_url(url, keep_params=["opt*"]) == "https://shop.example.com/p/1?option=3"
+
+
+def test_unparsable_port_is_kept_as_is():
+    assert canonical_url("http://shop.example.com:99999/p") == "http://shop.example.com:99999/p"
+
+
+def test_redirect_memo_persists_and_expires():
+    memo = RedirectMemo()
+    memo.put("https://s.example/1", "https://shop.example.com/p/1")
+    memo.flush()
+    memo.close()
+
+    assert RedirectMemo().resolve("https://s.example/1") == "https://shop.example.com/p/1"
+    assert RedirectMemo(ttl_s=-1).resolve("https://s.example/1") == "https://s.example/1"
@@ -0,0 +1,62 @@
+from concurrent.futures import Future
+import random
+import threading
+import time
+
+from project.scraper.engine import FetchEngine
+
+
+def test_outcomes_come_back_in_input_order():
+    # slow and fast domains interleaved: completion order differs from input order
+    items = [(f"shop{i % 3}", i) for i in range(60)]
+    delays = {i: random.uniform(0.0, 0.01) * (3 - i % 3) for _domain, i in items}
+
+    def work(item):
+        time.sleep(delays[item[1]])
+        return item[1] * 10
+
+    engine = FetchEngine(max_concurrency=8, per_domain_concurrency=2)
+    outcomes = list(engine.run(work, iter(items), domain_fn=lambda item: item[0], gap_fn=lambda item: 0))
+
+    assert [item for item, _result, _error in outcomes] == items
+    assert [result for _item, result, _error in outcomes] == [i * 10 for _domain, i in items]
+
+
+def test_skipped_items_errors_and_futures_keep_their_place():
+    def work(item):
+        if item == 2:
+            raise ValueError("boom")
+        if item == 3:
+            future = Future()
+            threading.Timer(0.05, future.set_result, ("later",)).start()
+            return future
+        return item
+
+    engine = FetchEngine(max_concurrency=4, per_domain_concurrency=4)
+    outcomes = list(engine.run(work, range(6), domain_fn=lambda item: "shop", gap_fn=lambda item: 0,
+                               skip_fn=lambda item: item == 4))
+
+    assert [item for item, _result, _error in outcomes] == list(range(6))
+    assert [result for _item, result, _error in outcomes] == [0, 1, None, "later", None, 5]
+    assert isinstance(outcomes[2][2], ValueError)
+    assert all(error is None for i, (_item, _result, error) in enumerate(outcomes) if i != 2)
+
+
+def test_per_domain_concurrency_is_respected():
+    active, peak = {}, {}
+    lock = threading.Lock()
+
+    def work(item):
+        domain = item[0]
+        with lock:
+            active[domain] = active.get(domain, 0) + 1
+            peak[domain] = max(peak.get(domain, 0), active[domain])
+        time.sleep(0.005)
+        with lock:
+            active[domain] -= 1
+
+    engine = FetchEngine(max_concurrency=8, per_domain_concurrency=2)
+    items = [(f"shop{i % 2}", i) for i in range(40)]
+    list(engine.run(work, items, domain_fn=lambda item: item[0], gap_fn=lambda item: 0))
+
+    assert peak == {"shop0": 2, "shop1": 2}
@@ -0,0 +1,65 @@
+import pytest
+
+from project.history import HistoryStore
+from project.history.analytics import load_observations
+
+np = pytest.importorskip("numpy")
+
+
+def test_new_products_do_not_lock_the_store_until_flush():
+    # two shard processes, each seeing products the other has not flushed yet
+    first, second = HistoryStore(), HistoryStore()
+    first.add("P1", "http://a.example/1", 1.0, 1000, 0, "InStock", "ok", 12.0)
+    second.add("P2", "http://b.example/2", 2.0, 2000, None, "OutOfStock", "ok", 15.0)
+
+    assert second.flush("b1-s1") == 1
+    assert first.flush("b1-s0") == 1
+    first.close()
+    second.close()
+
+    store = HistoryStore()
+    assert [row[:4] for row in store.product_history("P1")] == [(1.0, 1000, 0, 1)]
+    assert [row[:4] for row in store.product_history("P2")] == [(2.0, 2000, -1, 0)]
+    store.close()
+
+
+def test_flushes_write_parts_that_compact_into_the_batch_segment():
+    store = HistoryStore()
+    for n in range(3):
+        store.add(f"P{n}", f"http://a.example/{n}", float(n), 1000 * (n + 1), 0, "InStock", "ok", 12.0)
+        store.flush("b1")
+    assert len(store.segment_paths()) == 3
+    assert load_observations(store)["price"].tolist() == [1000, 2000, 3000]
+
+    store.compact("b1")
+    # a resumed batch flushes into the same batch id again
+    store.add("P3", "http://a.example/3", 3.0, 4000, 0, "InStock", "ok", 12.0)
+    store.flush("b1")
+    store.compact("b1")
+
+    (path,) = store.segment_paths()
+    assert path.name == "b1.npz"
+    with np.load(path) as segment:
+        assert segment["price"].tolist() == [1000, 2000, 3000, 4000]
+    store.close()
+
+
+def test_loading_observations_closes_every_segment(monkeypatch):
+    store = HistoryStore()
+    for n in range(20):
+        store.add("P1", "http://a.example/1", float(n), 1000, 0, "InStock", "ok", 12.0)
+        store.flush(f"b{n:02d}")
+    opened = []
+    load = np.load
+
+    def tracked(*args, **kwargs):
+        opened.append(load(*args, **kwargs))
+        return opened[-1]
+
+    monkeypatch.setattr(np, "load", tracked)
+    cols = load_observations(store)
+
+    assert cols["ts"].size == 20
+    assert len(opened) == 20
+    assert all(segment.fid is None for segment in opened)
+    store.close()
@@ -0,0 +1,51 @@
+import csv
+
+import pytest
+
+from project import runner
+from project.bench.suite import build_catalogue
+from project.config.settings import settings
+from project.storage import LocalStorage
+
+
+def _storage(root, products, settings_rows):
+    storage = LocalStorage(str(root))
+    for path, rows in ((storage.products_path, products), (storage.settings_path, settings_rows)):
+        with path.open("w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(rows)
+    return storage
+
+
+def test_an_interrupted_run_resumes_without_losing_or_repeating_changes(mock_shop, fast_limiter, state_dirs,
+                                                                       monkeypatch):
+    monkeypatch.setattr(settings, "JOURNAL_CHECKPOINT_ROWS", 7)
+    monkeypatch.setattr(settings, "SHEETS_BATCH_ROWS", 3)
+    products, settings_rows = build_catalogue(mock_shop.shops, 60, change_every=2)
+    reference = _storage(state_dirs / "reference", products, settings_rows)
+    runner.run_once(storage=reference, batch_id="ref")
+
+    storage = _storage(state_dirs / "resumed", products, settings_rows)
+    diff_stage = runner._diff_stage
+
+    def killed_after_25_changes(*args, **kwargs):
+        for sent, change in enumerate(diff_stage(*args, **kwargs)):
+            if sent == 25:
+                raise KeyboardInterrupt
+            yield change
+
+    monkeypatch.setattr(runner, "_diff_stage", killed_after_25_changes)
+    with pytest.raises(KeyboardInterrupt):
+        runner.run_once(storage=storage, batch_id="b1")
+    written = len(storage.read_log())
+    assert 0 < written <= 25
+    monkeypatch.setattr(runner, "_diff_stage", diff_stage)
+
+    entry = runner.run_once(storage=storage)
+
+    assert entry["batch_id"] == "b1"
+    assert "재개:" in entry["memo"]
+    changes = [row[1:] for row in storage.read_log()]
+    expected = [row[1:] for row in reference.read_log()]
+    assert len(changes) == len(expected) > written
+    assert sorted(changes) == sorted(expected)
+    assert entry["total"] == 60
@@ -0,0 +1,25 @@
+import pytest
+
+from project.bench.parity import load_fixtures
+from project.extraction import Extractor, LxmlBackend, SelectolaxBackend, SoupBackend
+
+FIXTURES = load_fixtures()
+
+
+@pytest.mark.parametrize("backend", [LxmlBackend, SelectolaxBackend])
+@pytest.mark.parametrize("name", sorted(FIXTURES))
+def test_fast_backends_match_beautifulsoup(backend, name):
+    html, rule = FIXTURES[name]
+    expected = Extractor(SoupBackend()).extract(html, rule)
+
+    assert Extractor(backend()).extract(html, rule) == expected
+
+
+def test_fixtures_cover_prices_and_stock():
+    # parity over pages that yield nothing would prove nothing
+    reference = Extractor(SoupBackend())
+    results = [reference.extract(html, rule) for html, rule in FIXTURES.values()]
+
+    assert sum(1 for result in results if result["price_val"]) >= len(results) - 1
+    assert all(result["ship_val"] is not None for result in results)
+    assert {result["curr_stock"] for result in results} == {"InStock", "OutOfStock"}
@@ -0,0 +1,66 @@
+from functools import partial
+
+import pytest
+
+from project import parsers
+from project.extraction import Extractor, LxmlBackend, SelectolaxBackend, SoupBackend
+
+PAGE = ('<html><body><div class="box"><span class="price">12,000원</span>{middle}'
+        '<span class="coupon">9,900원</span></div>{tail}</body></html>')
+RULE = {"coupon_css": [".coupon"], "price_css": [".price"], "ship_css": [".ship"], "stock_css": [".soldout"]}
+
+
+class FakeResponse:
+    encoding = "utf-8"
+
+    def __init__(self, body: bytes, chunk: int):
+        self.chunks = [body[i:i + chunk] for i in range(0, len(body), chunk)]
+        self.served = 0
+
+    def iter_content(self, chunk_size):
+        for data in self.chunks:
+            self.served += 1
+            yield data
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("backend", [SoupBackend, LxmlBackend, SelectolaxBackend])
+def test_located_waits_for_the_coupon_price(backend):
+    extractor = Extractor(backend())
+    page = PAGE.format(middle="", tail="")
+    before_coupon = page[:page.index('<span class="coupon">')]
+
+    assert not extractor.located(before_coupon, RULE)
+    assert extractor.located(page, RULE)
+    # ship and stock are not waited for: neither selector matches this page
+    assert extractor.located(page, {"price_css": [".price"], "stock_css": [".soldout"]})
+
+
+def test_read_partial_stops_a_chunk_after_the_price():
+    extractor = Extractor(SoupBackend())
+    page = PAGE.format(middle="", tail='<p class="pad">상세 설명</p>' * 2000).encode("utf-8")
+    r = FakeResponse(page, 1024)
+    trace = {}
+
+    text = parsers.read_partial(r, 10 ** 7, partial(extractor.located, rule=RULE), trace)
+
+    assert r.served == 2 < len(r.chunks)
+    assert trace["partial"] == 1
+    assert extractor.extract(text, RULE)["price_val"] == 9900
+
+
+def test_read_partial_checks_only_when_the_body_doubles():
+    page = PAGE.format(middle='<p class="pad">상세 설명</p>' * 4000, tail="").encode("utf-8")
+    r = FakeResponse(page, 1024)
+    checks = []
+
+    def until(text):
+        checks.append(len(text))
+        return False
+
+    text = parsers.read_partial(r, 10 ** 7, until, {})
+
+    assert text.endswith("</html>")
+    assert len(checks) <= len(r.chunks).bit_length() + 1
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+
+from project.config.settings import settings
+from project.scraper.errors import FetchError
+from project.scraper.ratelimit import AdaptiveRateLimiter, parse_retry_after
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setattr(settings, "RATE_INITIAL_RPS", 4.0)
+    monkeypatch.setattr(settings, "RATE_MIN_RPS", 0.5)
+    monkeypatch.setattr(settings, "RATE_MAX_RPS", 100.0)
+    monkeypatch.setattr(settings, "RATE_INCREASE_RPS", 1.0)
+    monkeypatch.setattr(settings, "RATE_BREAKER_FAILURES", 3)
+    monkeypatch.setattr(settings, "RATE_BREAKER_COOLDOWN_S", 0.05)
+    limiter = AdaptiveRateLimiter()
+    yield limiter
+    limiter.close()
+
+
+def test_slow_start_then_additive_increase_and_halving(limiter):
+    limiter.on_success("shop")
+    assert limiter.rates()["shop"] == pytest.approx(5.0)
+
+    limiter.on_throttle("shop", 429, {"Retry-After": "0"})
+    assert limiter.rates()["shop"] == pytest.approx(2.5)
+
+    limiter.on_success("shop")
+    assert limiter.rates()["shop"] == pytest.approx(3.5)
+
+
+def test_other_answers_do_not_raise_the_rate(limiter):
+    limiter.on_response("shop")
+    limiter.on_response("shop")
+
+    assert limiter.rates()["shop"] == pytest.approx(4.0)
+
+
+def test_gap_only_seeds_unknown_domains_and_rates_are_remembered(limiter):
+    limiter.seed("shop", gap_ms=500)
+    assert limiter.rates()["shop"] == pytest.approx(2.0)
+    limiter.on_success("shop")
+    limiter.save()
+
+    again = AdaptiveRateLimiter()
+    again.seed("shop", gap_ms=500)
+    assert again.rates()["shop"] == pytest.approx(2.5)
+    again.close()
+
+
+def test_retry_after_blocks_the_domain(limiter):
+    limiter.on_throttle("shop", 503, {"Retry-After": "30"})
+
+    assert limiter.delay("shop") > 29
+    assert limiter.try_acquire("shop") > 29
+
+
+def test_breaker_opens_after_repeated_failures_and_one_probe_closes_it(limiter):
+    for _ in range(3):
+        limiter.on_failure("shop")
+    assert limiter.is_open("shop")
+    with pytest.raises(FetchError) as raised:
+        limiter.try_acquire("shop")
+    assert raised.value.kind == "circuit_open"
+
+    time.sleep(0.06)
+    limiter.acquire("shop")
+    # only the probe goes through until it is answered
+    with pytest.raises(FetchError):
+        limiter.try_acquire("shop")
+    limiter.on_success("shop")
+    assert not limiter.is_open("shop")
+
+
+def test_a_failed_probe_opens_the_breaker_again(limiter):
+    for _ in range(3):
+        limiter.on_failure("shop")
+    time.sleep(0.06)
+    limiter.acquire("shop")
+    limiter.on_failure("shop")
+
+    assert limiter.is_open("shop")
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", now=1445412480.0) == 30.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_the_probe_waits_out_a_block_that_outlasts_the_cooldown(limiter):
+    limiter.on_throttle("shop", 503, {"Retry-After": "0.2"})
+    for _ in range(2):
+        limiter.on_failure("shop")
+    assert limiter.is_open("shop")
+    time.sleep(0.06)
+
+    assert limiter.try_acquire("shop") > 0
+    # still waiting for the block, not lost to a probe that was never sent
+    assert limiter.try_acquire("shop") > 0
+    limiter.acquire("shop")
+    with pytest.raises(FetchError):
+        limiter.try_acquire("shop")
@@ -0,0 +1,36 @@
+import pytest
+
+from project import runner
+from project.bench.suite import build_catalogue
+from project.config.settings import settings
+from project.history import PageArchive
+from project.storage import MemoryStorage
+
+
+def test_a_failed_run_still_closes_and_flushes_its_resources(mock_shop, fast_limiter, monkeypatch):
+    monkeypatch.setattr(settings, "ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "JOURNAL_ENABLED", False)
+    products, settings_rows = build_catalogue(mock_shop.shops, 20, change_every=1)
+    closed = []
+    close = runner.RunResources.close
+
+    def tracked_close(resources):
+        closed.append(resources)
+        close(resources)
+
+    def broken_after_10_changes(*args, **kwargs):
+        for sent, change in enumerate(diff_stage(*args, **kwargs)):
+            if sent == 10:
+                raise RuntimeError("sheet write failed")
+            yield change
+
+    diff_stage = runner._diff_stage
+    monkeypatch.setattr(runner.RunResources, "close", tracked_close)
+    monkeypatch.setattr(runner, "_diff_stage", broken_after_10_changes)
+    with pytest.raises(RuntimeError):
+        runner.run_once(storage=MemoryStorage(products, settings_rows), batch_id="b1")
+
+    assert len(closed) == 1
+    archive = PageArchive()
+    assert len(list(archive.pages("b1"))) >= 10
+    archive.close()
@@ -0,0 +1,55 @@
+import sqlite3
+from functools import partial
+
+import pytest
+
+from project.bench.suite import build_catalogue
+from project.config.settings import settings
+from project.jobs.shards import merge_results, run_shard, run_sharded
+from project.runner import run_once
+from project.storage import MemoryStorage
+
+
+def test_sharded_run_shares_the_state_databases(mock_shop, fast_limiter, state_dirs, monkeypatch):
+    # every shard process writes history, fingerprints, learned rates and redirects to the same files
+    monkeypatch.setattr(settings, "HISTORY_ENABLED", True)
+    monkeypatch.setattr(settings, "FINGERPRINT_ENABLED", True)
+    products, settings_rows = build_catalogue(mock_shop.shops, 120)
+
+    entry = run_sharded(4, storage_factory=partial(MemoryStorage, products, settings_rows))
+
+    assert entry["total"] == 120
+    assert entry["fail"] == 0
+    assert entry["memo"].endswith("샤드:4")
+    db = sqlite3.connect(str(state_dirs / "history" / "history.sqlite3"))
+    observations, products_seen = db.execute(
+        "SELECT COUNT(*), COUNT(DISTINCT pid) FROM observations WHERE batch_id LIKE ?", (entry["batch_id"] + "-s%",)
+    ).fetchone()
+    assert (observations, products_seen) == (120, 120)
+
+
+def test_merged_shards_match_a_single_run(mock_shop, fast_limiter):
+    products, settings_rows = build_catalogue(mock_shop.shops, 60, change_every=3)
+    single = MemoryStorage(products, settings_rows)
+    entry = run_once(storage=single, batch_id="whole")
+
+    results = [run_shard(index, 3, "split", storage_factory=partial(MemoryStorage, products, settings_rows))
+               for index in range(3)]
+    changes, merged, _metrics = merge_results(list(reversed(results)))
+
+    assert changes
+
+    assert [fields["product_id"] for fields in changes] == [row[1] for row in single.changes if any(row)]
+    assert [fields["row"] for fields in changes] == sorted(fields["row"] for fields in changes)
+    for name in ("total", "success", "fail", "price_changes", "stock_changes"):
+        assert merged["counts"][name] == entry["counts"][name]
+    assert merged["batch_id"] == "split"
+
+
+def test_merge_refuses_mixed_batches():
+    results = [{"batch_id": "a", "changes": [], "runlog": {}}, {"batch_id": "b", "changes": [], "runlog": {}}]
+
+    with pytest.raises(ValueError):
+        merge_results(results)
+    with pytest.raises(ValueError):
+        merge_results([])
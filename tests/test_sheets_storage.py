@@ -0,0 +1,41 @@
+from project.runner import RunResources
+from project.storage.sheets import SHEET_SETTINGS, SheetsStorage
+
+
+class FakeWorksheet:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def get_all_values(self):
+        self.client.reads.append(self.name)
+        return [list(row) for row in self.client.sheets[self.name]]
+
+
+class FakeClient:
+    def __init__(self, sheets):
+        self.sheets = sheets
+        self.reads = []
+
+    def worksheet(self, name):
+        return FakeWorksheet(self, name)
+
+
+SETTINGS = [["도메인", "판매처", "price_css"], ["shop.example", "shop", ".price"]]
+
+
+def test_rules_are_parsed_again_after_any_settings_edit():
+    client = FakeClient({SHEET_SETTINGS: [list(row) for row in SETTINGS]})
+    resources = RunResources(SheetsStorage(client))
+
+    resources.rules()
+    resources.rules()
+    assert resources.rules_loads == 1
+    # one read of the settings sheet per run, shared by the revision and the rules
+    assert client.reads == [SHEET_SETTINGS] * 2
+
+    client.sheets[SHEET_SETTINGS][1][2] = ".sale-price"
+    resources.rules()
+    assert resources.rules_loads == 2
+    assert client.reads == [SHEET_SETTINGS] * 3
+    resources.close()
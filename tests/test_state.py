@@ -0,0 +1,67 @@
+import pytest
+
+from project import runner
+from project.bench.suite import build_catalogue
+from project.config.settings import settings
+from project.jobs.state import ProductState, ProductStateStore, product_key, select_due
+from project.storage import MemoryStorage
+
+HOUR = 3600.0
+
+
+def test_a_product_that_always_changes_gets_the_shortest_interval_at_once():
+    state = ProductState("P1")
+    state.record(0.0, changed=True, error=None)
+
+    assert state.interval_s() == pytest.approx(settings.INCREMENTAL_MIN_INTERVAL_MIN * 60.0)
+
+
+def test_a_product_that_never_changes_gets_the_longest_interval():
+    state = ProductState("P1")
+    for check in range(3):
+        state.record(check * HOUR, changed=False, error=None)
+
+    assert state.interval_s() == pytest.approx(settings.INCREMENTAL_MAX_INTERVAL_MIN * 60.0)
+
+
+def test_hourly_runs_recheck_an_hourly_product_every_run():
+    # runs start a few seconds early or late; every one of them must pick the product up
+    state = ProductState("P1")
+    starts = [0.0, HOUR - 4, 2 * HOUR + 3, 3 * HOUR - 1, 4 * HOUR + 2]
+    checked = []
+    for start in starts:
+        picked, _due = select_due(["P1"], {"P1": state}, now=start)
+        if picked:
+            checked.append(start)
+            state.record(start, changed=True, error=None)
+
+    assert checked == starts
+
+
+def test_states_are_saved_at_journal_checkpoints(mock_shop, fast_limiter, monkeypatch):
+    monkeypatch.setattr(settings, "JOURNAL_CHECKPOINT_ROWS", 5)
+    products, settings_rows = build_catalogue(mock_shop.shops, 30)
+    storage = MemoryStorage(products, settings_rows)
+    diff_stage = runner._diff_stage
+
+    def killed_after_12_rows(*args, **kwargs):
+        done = args[6]
+        seen = []
+
+        def row_done(entry):
+            seen.append(entry)
+            done(entry)
+            if len(seen) == 12:
+                raise KeyboardInterrupt
+
+        yield from diff_stage(*args[:6], row_done, **kwargs)
+
+    monkeypatch.setattr(runner, "_diff_stage", killed_after_12_rows)
+    with pytest.raises(KeyboardInterrupt):
+        runner.run_once(incremental=True, storage=storage, batch_id="b1")
+
+    urls = {row[4]: row[10] for row in products if row[4]}
+    store = ProductStateStore()
+    states = store.load(product_key(pid, url) for pid, url in urls.items())
+    store.close()
+    assert sum(1 for state in states.values() if state.last_checked is not None) >= 10